@@ -0,0 +1,12 @@
+"""
+Benchmarks de los hot paths del backend.
+
+Se ejecutan desde ``backend/`` (mismos imports planos que la app), p.ej.::
+
+    python -m benchmarks.bench_tracking_ingest --points 100000
+
+``bench_hot_paths`` es la suite de regresión (dataset de ``synthetic``,
+resultados en JSON por commit para comparar con ``--compare``)::
+
+    python -m benchmarks.bench_hot_paths --compare benchmarks/results/<commit>-sqlite.json
+"""
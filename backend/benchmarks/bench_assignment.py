@@ -0,0 +1,71 @@
+"""
+Asignación de POIs para una cohorte: motor en bloque (catálogo en memoria +
+INSERTs multi-fila, aleatorio y "spread") vs la implementación anterior con
+una consulta ``ORDER BY random()`` por categoría y usuario.
+
+    python -m benchmarks.bench_assignment --users 10000 --pois 20000
+"""
+import argparse
+import time
+
+from benchmarks.common import bootstrap, seed_pois, seed_users
+
+RULES = {"park": 3, "food": 2, "culture": 2, "health": 1, "shop": 1, "transport": 1}
+
+
+def legacy_assign(db, user_id, rules):
+    """Implementación original de services/assignment.py (una consulta por categoría)."""
+    from sqlalchemy import func
+    from models import POI, UserPOIAssignment
+
+    for category, needed in rules.items():
+        candidates = (
+            db.query(POI.id)
+            .filter(POI.category == category)
+            .order_by(func.random())
+            .limit(needed)
+            .all()
+        )
+        for (poi_id,) in candidates:
+            db.add(UserPOIAssignment(user_id=user_id, poi_id=poi_id))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--legacy-users", type=int, default=200, help="usuarios para medir la ruta anterior")
+    parser.add_argument("--pois", type=int, default=20000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database = bootstrap(args.database_url)
+    from services.assignment import assign_pois_for_users
+    from services.poi_catalog import poi_catalog
+
+    db = database.SessionLocal()
+    seed_pois(db, args.pois)
+    t0 = time.perf_counter()
+    poi_catalog.refresh(db)
+    print(f"📚 catálogo: {args.pois} POIs cargados en {time.perf_counter() - t0:.3f}s")
+
+    legacy_ids = seed_users(db, args.legacy_users)
+    t0 = time.perf_counter()
+    for user_id in legacy_ids:
+        legacy_assign(db, user_id, RULES)
+    legacy = (time.perf_counter() - t0) / args.legacy_users
+    print(f"  legacy (ORDER BY random)  {legacy * 1000:8.3f} ms/usuario  -> ~{legacy * args.users:8.2f}s para {args.users}")
+
+    for spread in (False, True):
+        user_ids = seed_users(db, args.users)
+        t0 = time.perf_counter()
+        assign_pois_for_users(db, [(u, RULES) for u in user_ids], spread=spread)
+        db.commit()
+        elapsed = time.perf_counter() - t0
+        name = "bulk spread" if spread else "bulk random"
+        print(f"  {name:<25} {elapsed / args.users * 1000:8.3f} ms/usuario  -> {elapsed:8.2f}s para {args.users}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Costo de arranque de un worker: tiempo de ``import main`` y RSS máximo, medidos
+en un proceso nuevo con ``python -X importtime``. Falla (exit 1) si se excede el
+presupuesto de ``cold_start_budget.json`` o si se importa algún módulo pesado
+prohibido (el stack geoespacial debe cargarse solo bajo demanda).
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --runs 5 --budget benchmarks/cold_start_budget.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+from benchmarks.common import BACKEND_DIR
+
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cold_start_budget.json")
+
+CHILD = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import main
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_seconds": elapsed, "max_rss_mb": rss_kb / 1024, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["importtime"] = parse_importtime(proc.stderr)
+    return result
+
+
+def parse_importtime(stderr):
+    """
+    Líneas ``import time: self | cumulative | <indentación>paquete`` -> lista de
+    ``{"name", "level", "self_us", "cumulative_us"}``. La indentación (2
+    espacios por nivel) marca el anidamiento: nivel 0 es ``main`` y lo que
+    importa el propio proceso, nivel 1 lo que importa ``main``, etc.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, raw_name = line.replace("import time:", "|").split("|")
+        name = raw_name.strip()
+        level = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        entries.append({"name": name, "level": level, "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return entries
+
+
+def slowest_by_level(entries, depth: int, top: int):
+    """
+    {nivel: [(cumulative_us, paquete), ...]} con los ``top`` más costosos de los
+    niveles 1..``depth`` (el 0 es ``main`` entero más el arranque del intérprete).
+    """
+    levels = {}
+    for e in entries:
+        if 1 <= e["level"] <= depth:
+            levels.setdefault(e["level"], []).append((e["cumulative_us"], e["name"]))
+    return {level: sorted(items, reverse=True)[:top] for level, items in sorted(levels.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", default=DEFAULT_BUDGET)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2, help="niveles de anidamiento a desglosar")
+    args = parser.parse_args()
+
+    with open(args.budget, encoding="utf-8") as f:
+        budget = json.load(f)
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_seconds = median(r["import_seconds"] for r in runs)
+    rss_mb = median(r["max_rss_mb"] for r in runs)
+    loaded = set(runs[-1]["modules"])
+
+    print(f"⏱️  import main: {import_seconds:.3f}s (presupuesto {budget['import_seconds']}s)")
+    print(f"🧠 RSS máx: {rss_mb:.1f} MB (presupuesto {budget['max_rss_mb']} MB)")
+    entries = runs[-1]["importtime"]
+    for level, items in slowest_by_level(entries, args.depth, args.top).items():
+        print(f"📦 Nivel {level}, más costosos (cumulative):")
+        for us, name in items:
+            print(f"   {us / 1000:9.1f} ms  {name}")
+    print("🐢 Más costosos por sí mismos (self, cualquier nivel):")
+    for e in sorted(entries, key=lambda e: e["self_us"], reverse=True)[: args.top]:
+        print(f"   {e['self_us'] / 1000:9.1f} ms  {e['name']} (nivel {e['level']})")
+
+    failures = []
+    if import_seconds > budget["import_seconds"]:
+        failures.append(f"import main tomó {import_seconds:.3f}s")
+    if rss_mb > budget["max_rss_mb"]:
+        failures.append(f"RSS {rss_mb:.1f} MB")
+    heavy = sorted(m for m in budget.get("forbidden_modules", []) if m in loaded)
+    if heavy:
+        failures.append(f"módulos pesados importados al arrancar: {', '.join(heavy)}")
+
+    if failures:
+        print("❌ Presupuesto de arranque excedido: " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
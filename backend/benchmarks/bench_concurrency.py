@@ -0,0 +1,126 @@
+"""
+Throughput de las rutas calientes (/users/join, /tracking/batch, /surveys/)
+con 50/200/500 clientes concurrentes contra un backend corriendo (p.ej. el de
+docker-compose). Cada cliente hace requests en loop durante ``--duration``
+segundos; se reporta requests/s y latencias p50/p95/p99 por ruta.
+
+    docker compose up -d
+    python -m benchmarks.bench_concurrency --url http://localhost:8080 --clients 50 200 500
+
+Para comparar contra la versión síncrona, correr el mismo comando sobre el
+commit anterior. Con ``--no-surveys`` se omite /surveys/ (crea filas reales).
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.common import percentile
+
+
+def _point():
+    return -73.05 + random.random() * 0.05, -36.83 + random.random() * 0.05
+
+
+async def _join(client, profile, run_id, stats):
+    r = await client.post("/users/join", json={"username": f"bench-{run_id}-{uuid.uuid4().hex[:10]}", "profile": profile})
+    r.raise_for_status()
+    stats.setdefault("user_ids", []).append(r.json()["id"])
+
+
+async def _tracking(client, user_ids, batch_size):
+    now = datetime.now(timezone.utc).isoformat()
+    points = []
+    for _ in range(batch_size):
+        lon, lat = _point()
+        points.append({"user_id": random.choice(user_ids), "lon": lon, "lat": lat, "timestamp": now})
+    r = await client.post("/tracking/batch", json={"points": points})
+    r.raise_for_status()
+
+
+async def _survey(client, user_ids):
+    lon, lat = _point()
+    r = await client.post("/surveys/", data={
+        "user_id": str(random.choice(user_ids)),
+        "description": "benchmark",
+        "category": "other",
+        "wkt_point": f"POINT({lon} {lat})",
+    })
+    r.raise_for_status()
+
+
+async def run_level(url, n_clients, duration, profile, batch_size, surveys, user_ids):
+    import httpx
+
+    run_id = uuid.uuid4().hex[:6]
+    routes = ["join", "tracking"] + (["survey"] if surveys else [])
+    latencies = {name: [] for name in routes}
+    errors = {name: 0 for name in routes}
+    shared = {"user_ids": list(user_ids)}
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=n_clients, max_keepalive_connections=n_clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                # Mezcla aproximada de un taller: mucho tracking, algunos joins y encuestas
+                name = random.choices(routes, weights=[1, 8, 1][:len(routes)])[0]
+                t0 = time.perf_counter()
+                try:
+                    if name == "join":
+                        await _join(client, profile, run_id, shared)
+                    elif name == "tracking":
+                        await _tracking(client, shared["user_ids"], batch_size)
+                    else:
+                        await _survey(client, shared["user_ids"])
+                    latencies[name].append(time.perf_counter() - t0)
+                except Exception:
+                    errors[name] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(n_clients)))
+        elapsed = time.perf_counter() - t0
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n👥 {n_clients} clientes: {total / elapsed:,.0f} req/s ({total} ok, {sum(errors.values())} errores en {elapsed:.1f}s)")
+    for name in routes:
+        lat = sorted(latencies[name])
+        if not lat:
+            print(f"  {name:<9} sin respuestas ({errors[name]} errores)")
+            continue
+        print(
+            f"  {name:<9} {len(lat) / elapsed:9,.0f} req/s"
+            f"  p50 {percentile(lat, 50) * 1000:7.1f} ms"
+            f"  p95 {percentile(lat, 95) * 1000:7.1f} ms"
+            f"  p99 {percentile(lat, 99) * 1000:7.1f} ms"
+            f"  errores {errors[name]}"
+        )
+
+
+async def main_async(args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+        # Unos usuarios iniciales para tracking/encuestas
+        seed = {}
+        await asyncio.gather(*(_join(client, args.profile, "seed", seed) for _ in range(20)))
+    for n in args.clients:
+        await run_level(args.url, n, args.duration, args.profile, args.batch_size, not args.no_surveys, seed["user_ids"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos por nivel de concurrencia")
+    parser.add_argument("--profile", default="student", help="perfil existente para /users/join")
+    parser.add_argument("--batch-size", type=int, default=10, help="puntos por /tracking/batch")
+    parser.add_argument("--no-surveys", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Latencia de serialización GeoJSON por request: ruta GeoPandas original
+(GeoDataFrame -> to_json() -> string re-codificado por FastAPI) vs el
+encoder de ``services.geojson`` construyendo features desde tuplas.
+
+    python -m benchmarks.bench_geojson --sizes 10 1000 100000
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timezone
+
+from benchmarks.common import measure
+
+PROPERTIES = ("timestamp", "user_id")
+
+
+def make_rows(n):
+    now = datetime.now(timezone.utc)
+    return [
+        (i, -73.05 + random.random() * 0.05, -36.83 + random.random() * 0.05, now, random.randint(1, 500))
+        for i in range(n)
+    ]
+
+
+def geopandas_path(rows):
+    import geopandas as gpd
+
+    gdf = gpd.GeoDataFrame(
+        {
+            "id": [r[0] for r in rows],
+            "timestamp": [r[3].isoformat() for r in rows],
+            "user_id": [r[4] for r in rows],
+        },
+        geometry=gpd.points_from_xy([r[1] for r in rows], [r[2] for r in rows]),
+        crs="EPSG:4326",
+    )
+    # FastAPI volvía a codificar el string retornado
+    return json.dumps(gdf.to_json()).encode()
+
+
+def encoder_path(rows):
+    from services.geojson import feature_collection_bytes, point_features
+
+    return feature_collection_bytes(point_features(rows, PROPERTIES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        rows = make_rows(n)
+        print(f"📊 {n} features")
+        for name, fn in (("geopandas", geopandas_path), ("encoder", encoder_path)):
+            t = measure(lambda: fn(rows), repeat=args.repeat)
+            print(f"  {name:<10} median {t['median'] * 1000:10.2f} ms  (min {t['min'] * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latencia de consultas "POIs cerca de mí": índice de grilla en memoria
+(``services.spatial_index``) vs escaneo vectorizado de todos los POIs.
+
+    python -m benchmarks.bench_nearby --pois 100000 --queries 2000 --radius 500 --k 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.spatial_index import GridIndex
+
+
+def brute_force(lon, lat, ids, qlon, qlat, radius_m, k):
+    kx = 111_320.0 * np.cos(np.radians(lat.mean()))
+    dx = (lon - qlon) * kx
+    dy = (lat - qlat) * 110_540.0
+    dist = np.sqrt(dx * dx + dy * dy)
+    inside = np.flatnonzero(dist <= radius_m)
+    order = inside[np.argsort(dist[inside], kind="stable")][:k]
+    return ids[order], dist[order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pois", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--radius", type=float, default=500.0)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lon = -73.10 + rng.random(args.pois) * 0.12
+    lat = -36.86 + rng.random(args.pois) * 0.10
+    ids = np.arange(1, args.pois + 1, dtype=np.int64)
+    queries = np.column_stack([-73.10 + rng.random(args.queries) * 0.12, -36.86 + rng.random(args.queries) * 0.10])
+
+    t0 = time.perf_counter()
+    index = GridIndex(ids, lon, lat)
+    print(f"🏗️  índice de {args.pois} POIs construido en {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    t0 = time.perf_counter()
+    for qlon, qlat in queries:
+        index.query(qlon, qlat, args.radius, args.k)
+    grid = (time.perf_counter() - t0) / args.queries
+
+    t0 = time.perf_counter()
+    for qlon, qlat in queries:
+        brute_force(lon, lat, ids, qlon, qlat, args.radius, args.k)
+    brute = (time.perf_counter() - t0) / args.queries
+
+    # Ambos caminos deben devolver lo mismo
+    qlon, qlat = queries[0]
+    pos, _ = index.query(qlon, qlat, args.radius, args.k)
+    expected, _ = brute_force(lon, lat, ids, qlon, qlat, args.radius, args.k)
+    assert set(ids[pos].tolist()) == set(expected.tolist())
+
+    print(f"  grid index   {grid * 1e6:9.1f} µs/consulta")
+    print(f"  brute force  {brute * 1e6:9.1f} µs/consulta  ({brute / grid:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
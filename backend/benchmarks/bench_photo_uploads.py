@@ -0,0 +1,93 @@
+"""
+Latencia de POST /surveys/ con foto y atraso del event loop mientras el pool
+sube las fotos. Envía ``--surveys`` encuestas con una imagen de ``--photo-kb``
+KB desde ``--clients`` clientes concurrentes, luego espera a que todas queden
+``uploaded``/``failed`` y muestra ``/health/loop`` antes y después.
+
+    PHOTO_STORAGE=local PHOTO_LOCAL_UPLOAD_DELAY_SECONDS=1 uvicorn main:app --port 8080
+    python -m benchmarks.bench_photo_uploads --url http://localhost:8080 --surveys 200 --clients 50
+
+Con la versión anterior (subida síncrona dentro del request) el p99 del loop
+crece con cada subida; con el pool debe mantenerse en pocos ms.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+
+from benchmarks.common import percentile
+
+
+async def main_async(args):
+    import httpx
+
+    photo = b"\xff\xd8\xff\xe0" + os.urandom(args.photo_kb * 1024)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        r = await client.post("/users/join", json={"username": f"bench-photo-{uuid.uuid4().hex[:8]}", "profile": args.profile})
+        r.raise_for_status()
+        user_id = r.json()["id"]
+        print("⏱️ loop antes:", (await client.get("/health/loop")).json())
+
+        latencies, survey_ids = [], []
+        sem = asyncio.Semaphore(args.clients)
+
+        async def send():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(
+                    "/surveys/",
+                    data={
+                        "user_id": str(user_id),
+                        "description": "benchmark",
+                        "category": "other",
+                        "wkt_point": f"POINT({-73.05 + random.random() * 0.05} {-36.83 + random.random() * 0.05})",
+                    },
+                    files={"photo": ("bench.jpg", photo, "image/jpeg")},
+                )
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code == 200:
+                    survey_ids.append(r.json()["id"])
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(send() for _ in range(args.surveys)))
+        elapsed = time.perf_counter() - t0
+        latencies.sort()
+        print(
+            f"📤 {len(survey_ids)}/{args.surveys} encuestas en {elapsed:.2f}s ({len(survey_ids) / elapsed:,.1f} req/s)"
+            f"  p50 {percentile(latencies, 50) * 1000:.1f} ms  p95 {percentile(latencies, 95) * 1000:.1f} ms"
+            f"  p99 {percentile(latencies, 99) * 1000:.1f} ms"
+        )
+
+        # Esperar a que el pool termine
+        t_wait = time.perf_counter()
+        while time.perf_counter() - t_wait < args.timeout:
+            metrics = (await client.get("/surveys/photos/metrics")).json()
+            if metrics["queue_depth"] == 0 and metrics["in_progress"] == 0:
+                break
+            await asyncio.sleep(0.5)
+        statuses = await asyncio.gather(*(client.get(f"/surveys/{sid}/photo") for sid in survey_ids))
+        counts = {}
+        for r in statuses:
+            status = r.json()["photo_status"]
+            counts[status] = counts.get(status, 0) + 1
+        print(f"📷 fotos: {counts} (pipeline drenado en {time.perf_counter() - t0:.1f}s)")
+        print("📊 pool:", metrics)
+        print("⏱️ loop después:", (await client.get("/health/loop")).json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--surveys", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--photo-kb", type=int, default=500)
+    parser.add_argument("--profile", default="student")
+    parser.add_argument("--timeout", type=float, default=300.0, help="segundos máximos esperando al pool")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Costo de simplificar trayectorias (``services.trajectory``) por millón de
+puntos, reducción de puntos y tamaño del GeoJSON: fixes crudos (un Point por
+fix) vs ``mode=trajectory`` (un LineString simplificado por usuario).
+
+    python -m benchmarks.bench_trajectory --points 1000000 --users 200 --tolerance 0 2 5 20
+
+No usa base de datos: las trayectorias son caminatas aleatorias sintéticas con
+fixes cada ~1 s (ruido GPS de unos metros, pausas y giros).
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+def synthetic_tracks(n_points: int, n_users: int, seed: int = 0):
+    """Lista de ``(user_id, lon, lat)`` por usuario, tipo peatón/bicicleta en Concepción."""
+    rng = np.random.default_rng(seed)
+    per_user = np.full(n_users, n_points // n_users)
+    per_user[: n_points % n_users] += 1
+    tracks = []
+    for user_id, n in enumerate(per_user, start=1):
+        heading = np.cumsum(rng.normal(0, 0.15, n))                # giros suaves
+        speed = np.where(rng.random(n) < 0.1, 0.0, rng.uniform(1, 5, n))  # m/s, con pausas
+        x = np.cumsum(speed * np.cos(heading)) + rng.normal(0, 3, n)      # ruido GPS ~3 m
+        y = np.cumsum(speed * np.sin(heading)) + rng.normal(0, 3, n)
+        lat = -36.82 + y / 111_320
+        lon = -73.05 + x / (111_320 * np.cos(np.radians(-36.82)))
+        tracks.append((user_id, lon, lat))
+    return tracks
+
+
+def geojson_bytes(features) -> int:
+    from services.geojson import stream_feature_collection
+
+    return sum(len(chunk) for chunk in stream_feature_collection(features))
+
+
+def rows_for(tracks, start):
+    for user_id, lon, lat in tracks:
+        for i, (x, y) in enumerate(zip(lon.tolist(), lat.tolist())):
+            yield user_id, x, y, start + timedelta(seconds=i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tolerance", type=float, nargs="+", default=[0.0, 2.0, 5.0, 20.0])
+    parser.add_argument("--skip-geojson", action="store_true", help="no medir tamaños de payload (más rápido)")
+    args = parser.parse_args()
+
+    from services.geojson import point_features
+    from services.trajectory import simplify, trajectory_features
+
+    tracks = synthetic_tracks(args.points, args.users)
+    scale = 1_000_000 / args.points
+    print(f"📊 {args.points:,} puntos, {args.users} usuarios (~{args.points // args.users:,} fixes por trayectoria)")
+
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    raw_size = None
+    if not args.skip_geojson:
+        raw_rows = ((i, lon, lat, ts, uid) for i, (uid, lon, lat, ts) in enumerate(rows_for(tracks, start)))
+        raw_size = geojson_bytes(point_features(raw_rows, ("timestamp", "user_id")))
+        print(f"  puntos crudos            GeoJSON {raw_size / 1e6:8.1f} MB")
+
+    for tol in args.tolerance:
+        t0 = time.perf_counter()
+        kept = sum(len(simplify(lon, lat, tol)) for _, lon, lat in tracks)
+        elapsed = time.perf_counter() - t0
+        line = (
+            f"  tolerance {tol:5.1f} m  {elapsed * scale:7.3f} s/millón"
+            f"  {kept:>10,} puntos ({kept / args.points:6.1%})"
+        )
+        if raw_size is not None:
+            size = geojson_bytes(trajectory_features(rows_for(tracks, start), tol))
+            line += f"  GeoJSON {size / 1e6:8.2f} MB ({raw_size / size:6.1f}x menor)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
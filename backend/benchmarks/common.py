@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'pois_bench.sqlite')}"
+
+# Los módulos del backend usan imports planos (``import models``)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def bootstrap(database_url: str = None):
+    """
+    Prepara el entorno del benchmark: apunta ``database.py`` a ``database_url``
+    (por defecto un SQLite temporal) antes de importarlo y crea las tablas.
+    Retorna el módulo ``database`` ya configurado.
+    """
+    url = database_url or os.getenv("BENCH_DATABASE_URL", DEFAULT_DATABASE_URL)
+    os.environ["POSTGRES_HOST"] = url
+
+    import database
+    import models  # noqa: F401  (registra las tablas en Base.metadata)
+
+    from services.tracking_partitions import create_schema
+
+    # Igual que ``init_db``: en Postgres user_tracking queda particionada
+    create_schema(database.engine, database.Base.metadata)
+    return database
+
+
+def seed_users(db, n_users: int) -> List[int]:
+    """Crea un perfil y ``n_users`` usuarios de prueba; retorna sus ids."""
+    import models
+
+    profile = db.query(models.Profile).filter_by(name="bench").first()
+    if not profile:
+        profile = models.Profile(name="bench", description="benchmark", rules={})
+        db.add(profile)
+        db.flush()
+    users = [models.User(username=f"bench_{time.time_ns()}_{i}", profile_id=profile.id) for i in range(n_users)]
+    db.add_all(users)
+    db.commit()
+    return [u.id for u in users]
+
+
+def seed_pois(db, n_pois: int, categories=("park", "food", "culture", "health", "shop", "transport")) -> None:
+    """Crea ``n_pois`` POIs puntuales repartidos en el área de Concepción."""
+    import random
+    import models
+    from services.geometry import point_wkb
+
+    rows = []
+    for i in range(n_pois):
+        lon, lat = -73.10 + random.random() * 0.12, -36.86 + random.random() * 0.10
+        rows.append({
+            "name": f"poi_{i}", "category": categories[i % len(categories)],
+            "lon": lon, "lat": lat, "wkb_geometry": point_wkb(lon, lat),
+        })
+    db.execute(models.POI.__table__.insert(), rows)
+    db.commit()
+
+
+def measure(fn: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """Ejecuta ``fn`` ``repeat`` veces y retorna tiempos (segundos)."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"min": min(samples), "median": median(samples), "max": max(samples)}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
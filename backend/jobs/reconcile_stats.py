@@ -0,0 +1,47 @@
+"""
+Reconciliación de los rollups de ``/results/stats`` (``stats_daily`` y
+``stats_survey_user_days``) con las tablas base (correr a diario, p.ej. cron).
+
+Los contadores se escriben en la misma transacción que los datos, así que no
+deberían desviarse; este job repara lo que no pasa por la app (borrados o
+cargas a mano, restauraciones) recalculando los últimos ``--days`` días.
+``--all`` recalcula todo el historial: con retención activa
+(``jobs.tracking_retention``) los puntos ya archivados dejan de contarse.
+
+    cd backend && python -m jobs.reconcile_stats --days 2
+    cd backend && python -m jobs.reconcile_stats --all
+"""
+import argparse
+import os
+from datetime import timedelta
+
+from database import SessionLocal
+from services.stats import get_stats, rebuild_stats, today
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=int(os.getenv("STATS_RECONCILE_DAYS", "2")),
+                        help="días a recalcular, contando hoy")
+    parser.add_argument("--all", action="store_true", help="recalcular todo el historial (deja de contar el tracking ya archivado)")
+    args = parser.parse_args()
+
+    since = None if args.all else today() - timedelta(days=max(1, args.days) - 1)
+    db = SessionLocal()
+    try:
+        before = get_stats(db, since)
+        rebuild_stats(db, since)
+        db.commit()
+        after = get_stats(db, since)
+    finally:
+        db.close()
+
+    scope = "todo el historial" if since is None else f"desde {since}"
+    drift = {k: (before[k], after[k]) for k in ("total_surveys", "total_tracking_points") if before[k] != after[k]}
+    if drift:
+        print(f"⚠️ Rollups corregidos ({scope}): " + ", ".join(f"{k} {a} -> {b}" for k, (a, b) in drift.items()))
+    print(f"✅ Estadísticas reconciliadas ({scope})")
+
+
+if __name__ == "__main__":
+    main()
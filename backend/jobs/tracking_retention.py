@@ -0,0 +1,46 @@
+"""
+Job de mantenimiento de ``user_tracking`` particionada (correr a diario, p.ej. cron):
+
+1. Crea las particiones del periodo actual y los siguientes (y mueve a ellas lo
+   que haya caído en la partición default).
+2. Exporta a Parquet y elimina las particiones más viejas que la retención.
+
+    cd backend && python -m jobs.tracking_retention --retention-days 90 --archive-dir /data/archive
+
+Los totales de /results/stats no cambian: salen de ``stats_daily``.
+"""
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+
+from database import engine
+from services.tracking_partitions import (
+    apply_retention, ensure_upcoming, is_partitioned, list_partitions, period_step,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=int(os.getenv("TRACKING_RETENTION_DAYS", "90")))
+    parser.add_argument("--archive-dir", default=os.getenv("TRACKING_ARCHIVE_DIR", "archive"))
+    parser.add_argument("--dry-run", action="store_true", help="sólo listar lo que se archivaría")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        cutoff = datetime.now(timezone.utc).date() - timedelta(days=args.retention_days)
+        with engine.connect() as conn:
+            if not is_partitioned(conn):
+                print("ℹ️ user_tracking no está particionada")
+                return
+            for name, start in list_partitions(conn):
+                expired = start + period_step() <= cutoff
+                print(f"  {name}  {'→ archivar' if expired else 'se conserva'}")
+        return
+
+    ensure_upcoming(engine)
+    archived = apply_retention(engine, args.retention_days, args.archive_dir)
+    print(f"✅ Retención aplicada: {len(archived)} particiones archivadas")
+
+
+if __name__ == "__main__":
+    main()
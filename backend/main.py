@@ -1,12 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine
+from fastapi.staticfiles import StaticFiles
+from database import Base, engine, dispose_async_engine
+import migrations
 from routes import users, profiles, pois, surveys, tracking, results
+from services.ingest_queue import tracking_queue, WRITE_BEHIND_ENABLED
+from services.tracking_partitions import create_schema, ensure_upcoming
+from services.photo_uploads import photo_pool
+from services.response_cache import results_cache
+from services.loop_monitor import loop_monitor
+from services.metrics import METRICS_ENABLED, PROMETHEUS_MEDIA_TYPE, MetricsMiddleware, metrics
+from services.storage import LOCAL_MEDIA_DIR, get_storage, storage_kind
 import os
 
-# Crear tablas
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="POIs Treasure Backend",
     version="1.0.0",
@@ -34,6 +41,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas Prometheus (agregado al final = middleware más externo: mide también CORS)
+if METRICS_ENABLED:
+    metrics.instrument_engines()
+    app.add_middleware(MetricsMiddleware)
+    metrics.register_stats(
+        "tracking_ingest", tracking_queue.stats,
+        gauges={
+            "running": "1 si el hilo write-behind está corriendo.",
+            "queue_depth": "Puntos de tracking en el buffer, esperando flush.",
+            "max_queue": "Capacidad del buffer (sobre ella, 503).",
+            "retry_backoff_seconds": "Backoff actual tras un fallo de conexión (0 si la base responde).",
+            "last_queue_wait_seconds": "Espera en el buffer del chunk más antiguo del último flush.",
+        },
+        counters={
+            "flushed_points": "Puntos de tracking escritos.",
+            "dropped_points": "Puntos descartados (rechazados por la base o perdidos al detener).",
+            "rejected_points": "Puntos rechazados con el buffer lleno (503).",
+            "retried_flushes": "Flushes reencolados por base no disponible.",
+            "flush_count": "Group commits ejecutados.",
+        },
+    )
+    metrics.register_stats(
+        "results_cache", results_cache.stats,
+        gauges={
+            "entries": "Entradas en el caché de /results (backend en memoria).",
+            "bytes": "Bytes en el caché de /results (backend en memoria).",
+        },
+        counters={
+            "hits": "Respuestas de /results servidas desde el caché.",
+            "misses": "Respuestas de /results calculadas (no estaban en el caché).",
+        },
+    )
+    metrics.register_stats(
+        "photo_upload", photo_pool.stats,
+        gauges={
+            "running": "1 si los workers de subida están corriendo.",
+            "queue_depth": "Fotos en cola esperando subida.",
+            "max_queue": "Capacidad de la cola de fotos (sobre ella, 503).",
+            "in_progress": "Subidas en curso.",
+        },
+        counters={
+            "uploaded": "Fotos subidas.",
+            "failed": "Fotos que agotaron los reintentos (quedan en el spool).",
+            "retries": "Reintentos de subida.",
+            "rejected": "Fotos rechazadas con la cola llena.",
+            "thumbnail_errors": "Miniaturas que no se pudieron generar.",
+        },
+    )
+
+@app.on_event("startup")
+def init_db():
+    # Crear tablas al arrancar (no al importar): importar la app no toca la DB
+    if os.getenv("DB_CREATE_ALL", "1") == "1":
+        create_schema(engine, Base.metadata)
+    # Migraciones pendientes de bases existentes (WKT -> lon/lat, particiones, ...)
+    if os.getenv("DB_MIGRATE", "1") == "1":
+        migrations.run(engine)
+    # Particiones de tracking para el periodo actual y los próximos (sólo Postgres particionado)
+    ensure_upcoming(engine)
+
+@app.on_event("startup")
+def start_tracking_queue():
+    if WRITE_BEHIND_ENABLED:
+        tracking_queue.start()
+
+@app.on_event("shutdown")
+def stop_tracking_queue():
+    # Flush de todo lo pendiente para no perder puntos al reiniciar
+    tracking_queue.stop()
+
+@app.on_event("startup")
+def start_photo_pool():
+    # Sin backend de fotos configurado la app no arranca (importar main no lo exige)
+    if get_storage().name == "local":
+        os.makedirs(LOCAL_MEDIA_DIR, exist_ok=True)
+    photo_pool.start()
+
+@app.on_event("shutdown")
+def stop_photo_pool():
+    # Lo que no alcanzó a subirse queda en el spool y se retoma al reiniciar
+    photo_pool.stop()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
 @app.get("/health")
 async def health_check():
     return {
@@ -42,6 +143,16 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/health/loop")
+async def loop_lag():
+    """Atraso del event loop (ms): sube si algún handler bloquea el loop."""
+    return loop_monitor.stats()
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Latencia, tamaño de respuesta y queries SQL por ruta, más cola de ingesta, caché y fotos, en formato Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 @app.get("/")
 async def root():
     return {
@@ -55,4 +166,9 @@ app.include_router(profiles.router)
 app.include_router(pois.router)
 app.include_router(surveys.router)
 app.include_router(tracking.router)
-app.include_router(results.router)  # ⭐ Nueva ruta
\ No newline at end of file
+app.include_router(results.router)  # ⭐ Nueva ruta
+
+# Fotos del storage local (disco; también sustituto offline de Cloudinary)
+# (según la configuración, sin construir el backend: importar main no tiene efectos)
+if storage_kind() == "local":
+    app.mount("/media", StaticFiles(directory=LOCAL_MEDIA_DIR, check_dir=False), name="media")
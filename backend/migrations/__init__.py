@@ -0,0 +1,64 @@
+"""
+Migraciones de esquema para bases existentes (las tablas nuevas las crea
+``Base.metadata.create_all``). Cada módulo expone ``upgrade(conn)`` y se aplica
+una sola vez, registrándose en ``schema_migrations``. La app las corre al
+arrancar, después de crear las tablas (``DB_MIGRATE=0`` lo desactiva); también
+se pueden correr a mano::
+
+    cd backend && python -m migrations
+
+Son sólo para Postgres (en SQLite ``create_all`` ya deja el esquema actual).
+Un advisory lock serializa a los workers que arrancan a la vez.
+"""
+import importlib
+from sqlalchemy import inspect, text
+
+MIGRATIONS = [
+    "m0001_numeric_coordinates",
+    "m0002_stats_rollups",
+    "m0003_photo_status",
+    "m0004_photo_thumbnails",
+    "m0005_partition_user_tracking",
+    "m0006_poi_source_key",
+    "m0007_poi_updated_at",
+]
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    insp = inspect(conn)
+    if not insp.has_table(table):
+        return False
+    return any(c["name"] == column for c in insp.get_columns(table))
+
+
+def run(engine) -> None:
+    if engine.dialect.name != "postgresql":
+        return  # SQLite (dev/benchmarks): create_all ya deja el esquema actual
+    with engine.connect() as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(hashtext('schema_migrations'))"))
+        lock_conn.commit()
+        try:
+            _apply_pending(engine)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('schema_migrations'))"))
+            lock_conn.commit()
+
+
+def _apply_pending(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " name VARCHAR(120) PRIMARY KEY,"
+            " applied_at TIMESTAMP WITH TIME ZONE DEFAULT now())"
+        ))
+        applied = {r[0] for r in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    for name in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"🔧 Aplicando migración {name}...")
+        module = importlib.import_module(f"migrations.{name}")
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
+        print(f"✅ {name} aplicada")
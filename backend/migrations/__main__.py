@@ -0,0 +1,5 @@
+from database import engine
+from migrations import run
+
+if __name__ == "__main__":
+    run(engine)
@@ -0,0 +1,99 @@
+"""
+WKT en texto -> coordenadas numéricas.
+
+- ``user_tracking`` / ``survey_reports``: ``wkt_point`` -> ``lon``/``lat`` (double precision).
+  El backfill se hace en SQL; las filas con WKT ilegible (que los endpoints ya
+  descartaban) se mueven intactas a ``<tabla>_wkt_quarantine`` para revisarlas
+  a mano, no se borran.
+- ``pois``: ``wkt_geometry`` -> ``lon``/``lat`` (punto representativo) + ``wkb_geometry``.
+
+Las columnas WKT no se eliminan aquí: quedan nullable (la app ya no las
+escribe) para poder comparar o revertir. Se pueden borrar a mano una vez
+validada la conversión.
+"""
+from sqlalchemy import text
+
+from migrations import has_column
+from services.geometry import geometry_from_wkt
+
+POINT_TABLES = ("user_tracking", "survey_reports")
+
+BACKFILL_POINTS = r"""
+UPDATE {table}
+SET lon = CAST(split_part(m.coords, ' ', 1) AS double precision),
+    lat = CAST(split_part(m.coords, ' ', 2) AS double precision)
+FROM (
+    SELECT id,
+           regexp_replace(btrim(substring(wkt_point from '\(([^)]*)\)')), '\s+', ' ', 'g') AS coords
+    FROM {table}
+    WHERE wkt_point ~* '^\s*POINT\s*\(\s*[-+0-9.eE]+\s+[-+0-9.eE]+\s*\)\s*$'
+) AS m
+WHERE {table}.id = m.id
+"""
+
+
+def _quarantine(conn, table: str) -> int:
+    """Mueve las filas sin coordenadas (con su ``wkt_point`` original) a una tabla aparte."""
+    if not conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table} WHERE lon IS NULL OR lat IS NULL)")).scalar():
+        return 0
+    quarantine = f"{table}_wkt_quarantine"
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {quarantine} AS TABLE {table} WITH NO DATA"))
+    return conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table} WHERE lon IS NULL OR lat IS NULL RETURNING *) "
+        f"INSERT INTO {quarantine} SELECT * FROM moved"
+    )).rowcount
+
+
+def _migrate_point_table(conn, table: str) -> None:
+    if not has_column(conn, table, "wkt_point"):
+        return
+    conn.execute(text(
+        f"ALTER TABLE {table} "
+        "ADD COLUMN IF NOT EXISTS lon double precision, "
+        "ADD COLUMN IF NOT EXISTS lat double precision"
+    ))
+    updated = conn.execute(text(BACKFILL_POINTS.format(table=table))).rowcount
+    quarantined = _quarantine(conn, table)
+    print(f"   {table}: {updated} filas convertidas, {quarantined} movidas a {table}_wkt_quarantine (WKT ilegible)")
+    conn.execute(text(
+        f"ALTER TABLE {table} "
+        "ALTER COLUMN lon SET NOT NULL, "
+        "ALTER COLUMN lat SET NOT NULL, "
+        "ALTER COLUMN wkt_point DROP NOT NULL"
+    ))
+
+
+def _migrate_pois(conn) -> None:
+    if not has_column(conn, "pois", "wkt_geometry"):
+        return
+    conn.execute(text(
+        "ALTER TABLE pois "
+        "ADD COLUMN IF NOT EXISTS lon double precision, "
+        "ADD COLUMN IF NOT EXISTS lat double precision, "
+        "ADD COLUMN IF NOT EXISTS wkb_geometry bytea"
+    ))
+    # Geometrías generales (polígonos) necesitan shapely; el catálogo es chico.
+    # Un WKT ilegible aborta la migración: los POIs tienen asignaciones colgando.
+    params = []
+    for poi_id, wkt_value in conn.execute(text("SELECT id, wkt_geometry FROM pois")):
+        lon, lat, wkb = geometry_from_wkt(wkt_value)
+        params.append({"id": poi_id, "lon": lon, "lat": lat, "wkb": wkb})
+    if params:
+        conn.execute(
+            text("UPDATE pois SET lon = :lon, lat = :lat, wkb_geometry = :wkb WHERE id = :id"),
+            params,
+        )
+    print(f"   pois: {len(params)} geometrías convertidas")
+    conn.execute(text(
+        "ALTER TABLE pois "
+        "ALTER COLUMN lon SET NOT NULL, "
+        "ALTER COLUMN lat SET NOT NULL, "
+        "ALTER COLUMN wkb_geometry SET NOT NULL, "
+        "ALTER COLUMN wkt_geometry DROP NOT NULL"
+    ))
+
+
+def upgrade(conn) -> None:
+    for table in POINT_TABLES:
+        _migrate_point_table(conn, table)
+    _migrate_pois(conn)
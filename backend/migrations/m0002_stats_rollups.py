@@ -0,0 +1,18 @@
+"""
+Rollups diarios para ``/results/stats`` (``stats_daily`` y
+``stats_survey_user_days``): crea las tablas si faltan y las recalcula desde
+las tablas base. A partir de aquí los endpoints de escritura los mantienen.
+"""
+from sqlalchemy.orm import Session
+
+from models import DailyStat, SurveyUserDay
+from services.stats import rebuild_stats
+
+
+def upgrade(conn) -> None:
+    DailyStat.__table__.create(conn, checkfirst=True)
+    SurveyUserDay.__table__.create(conn, checkfirst=True)
+    with Session(bind=conn) as db:
+        rebuild_stats(db)
+        db.flush()
+    print("   estadísticas diarias recalculadas")
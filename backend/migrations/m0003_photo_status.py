@@ -0,0 +1,18 @@
+"""
+Estado de la subida de fotos en segundo plano: ``survey_reports.photo_status``
+y ``photo_error``. Las encuestas existentes con foto quedan como ``uploaded``.
+"""
+from sqlalchemy import text
+
+from migrations import has_column
+
+
+def upgrade(conn) -> None:
+    if not has_column(conn, "survey_reports", "photo_status"):
+        conn.execute(text("ALTER TABLE survey_reports ADD COLUMN photo_status VARCHAR(20)"))
+    if not has_column(conn, "survey_reports", "photo_error"):
+        conn.execute(text("ALTER TABLE survey_reports ADD COLUMN photo_error TEXT"))
+    conn.execute(text(
+        "UPDATE survey_reports SET photo_status = 'uploaded' "
+        "WHERE photo_url IS NOT NULL AND photo_status IS NULL"
+    ))
@@ -0,0 +1,12 @@
+"""
+Miniaturas de fotos de encuestas: ``survey_reports.photo_thumbnail_url``.
+Las fotos existentes quedan sin miniatura (el dashboard usa la original).
+"""
+from sqlalchemy import text
+
+from migrations import has_column
+
+
+def upgrade(conn) -> None:
+    if not has_column(conn, "survey_reports", "photo_thumbnail_url"):
+        conn.execute(text("ALTER TABLE survey_reports ADD COLUMN photo_thumbnail_url TEXT"))
@@ -0,0 +1,44 @@
+"""
+``user_tracking`` -> tabla particionada por rango de ``timestamp`` (sólo Postgres).
+
+Se renombra la tabla actual, se crea la tabla padre particionada con sus
+índices y la partición default, se crean las particiones que cubren los datos
+existentes (más las próximas) y se copian las filas conservando los ids.
+La clave primaria pasa a ser ``(id, timestamp)``: Postgres exige que incluya
+la columna de particionado.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from services.tracking_partitions import (
+    PARTITIONS_AHEAD, create_partitioned_table, ensure_partitions, is_partitioned, period_step,
+)
+
+
+def upgrade(conn) -> None:
+    if conn.dialect.name != "postgresql" or is_partitioned(conn):
+        return
+
+    conn.execute(text("ALTER TABLE user_tracking RENAME TO user_tracking_legacy"))
+    conn.execute(text("ALTER TABLE user_tracking_legacy RENAME CONSTRAINT user_tracking_pkey TO user_tracking_legacy_pkey"))
+    conn.execute(text("DROP INDEX IF EXISTS idx_user_tracking_user_time"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_tracking_user_id"))
+    # La secuencia de ids se conserva: pasa a ser de la tabla nueva
+    conn.execute(text("ALTER SEQUENCE IF EXISTS user_tracking_id_seq OWNED BY NONE"))
+
+    create_partitioned_table(conn)
+
+    first, last = conn.execute(text('SELECT min("timestamp"), max("timestamp") FROM user_tracking_legacy')).one()
+    today = datetime.now(timezone.utc).date()
+    if first is not None:
+        ensure_partitions(conn, first.astimezone(timezone.utc).date(), last.astimezone(timezone.utc).date())
+    ensure_partitions(conn, today, today + period_step() * PARTITIONS_AHEAD)
+
+    copied = conn.execute(text(
+        'INSERT INTO user_tracking (id, user_id, lon, lat, "timestamp") '
+        'SELECT id, user_id, lon, lat, "timestamp" FROM user_tracking_legacy'
+    )).rowcount
+    conn.execute(text("SELECT setval('user_tracking_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM user_tracking), false)"))
+    conn.execute(text("DROP TABLE user_tracking_legacy"))
+    print(f"   user_tracking particionada: {copied} filas copiadas")
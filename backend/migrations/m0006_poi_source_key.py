@@ -0,0 +1,15 @@
+"""
+Clave de origen de los POIs: ``pois.source_key`` (única) para que
+``data_processing/populate_pois.py`` haga upsert en vez de duplicar el
+catálogo. Los POIs existentes quedan sin clave; el loader los adopta en la
+próxima carga si coinciden exactamente con una fila del archivo.
+"""
+from sqlalchemy import text
+
+from migrations import has_column
+
+
+def upgrade(conn) -> None:
+    if not has_column(conn, "pois", "source_key"):
+        conn.execute(text("ALTER TABLE pois ADD COLUMN source_key VARCHAR(64)"))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_pois_source_key ON pois (source_key)"))
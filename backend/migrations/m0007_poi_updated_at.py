@@ -0,0 +1,16 @@
+"""
+Marca de modificación de los POIs: ``pois.updated_at``, que el upsert de
+``data_processing/populate_pois.py`` avanza en cada fila que cambia. El
+catálogo en memoria (``poi_catalog``) la usa para detectar recargas que no
+cambian ni la cantidad ni los ids. Las filas existentes quedan con la hora de
+la migración.
+"""
+from sqlalchemy import text
+
+from migrations import has_column
+
+
+def upgrade(conn) -> None:
+    if not has_column(conn, "pois", "updated_at"):
+        # now() es estable: Postgres 11+ no reescribe la tabla
+        conn.execute(text("ALTER TABLE pois ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()"))
@@ -1,11 +1,13 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, Index
+    Column, Integer, String, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, Index, JSON,
+    Double, LargeBinary, BigInteger, Date, PrimaryKeyConstraint
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
+from services.geometry import point_wkt, wkb_geometry_type, WKB_POINT_TYPE
 import uuid
 
 # --- Profiles ---
@@ -15,7 +17,8 @@ class Profile(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False, unique=True, index=True)
     description = Column(Text, nullable=True)
-    rules = Column(JSONB, default=dict, nullable=False)
+    # JSONB en Postgres, JSON genérico en otras bases (p.ej. SQLite para benchmarks)
+    rules = Column(JSON().with_variant(JSONB(), "postgresql"), default=dict, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     users = relationship("User", back_populates="profile")
@@ -47,13 +50,29 @@ class POI(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(120), nullable=False)
     category = Column(String(50), index=True, nullable=False)
-    wkt_geometry = Column(Text, nullable=False)
+    # Punto representativo (el centroide en POIs poligonales) + geometría completa en WKB
+    lon = Column(Double, nullable=False)
+    lat = Column(Double, nullable=False)
+    wkb_geometry = Column(LargeBinary, nullable=False)
+    # Clave estable del origen (p.ej. id OSM) para que recargar el catálogo sea idempotente
+    source_key = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Lo avanza el upsert de ``populate_pois.py`` al cambiar una fila (fingerprint del catálogo)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     assignments = relationship("UserPOIAssignment", back_populates="poi", cascade="all, delete-orphan")
 
+    @property
+    def wkt_geometry(self) -> str:
+        """WKT para compatibilidad con clientes antiguos (no se almacena)."""
+        if wkb_geometry_type(self.wkb_geometry) == WKB_POINT_TYPE:
+            return point_wkt(self.lon, self.lat)
+        from shapely import wkb
+        return wkb.loads(self.wkb_geometry).wkt
+
 
 Index("idx_pois_category", POI.category)
+Index("uq_pois_source_key", POI.source_key, unique=True)
 
 
 # --- Asignaciones usuario<->POI ---
@@ -85,9 +104,17 @@ class SurveyReport(Base):
     description = Column(Text, nullable=True)
     option = Column(String(80), nullable=False)
     photo_url = Column(Text, nullable=True)
-    wkt_point = Column(Text, nullable=False)
+    photo_thumbnail_url = Column(Text, nullable=True)
+    photo_status = Column(String(20), nullable=True)   # None (sin foto) | pending | uploaded | failed
+    photo_error = Column(Text, nullable=True)
+    lon = Column(Double, nullable=False)
+    lat = Column(Double, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    @property
+    def wkt_point(self) -> str:
+        return point_wkt(self.lon, self.lat)
+
 
 # --- Tracking pasivo ---
 class UserTracking(Base):
@@ -95,8 +122,35 @@ class UserTracking(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
-    wkt_point = Column(Text, nullable=False)
+    lon = Column(Double, nullable=False)
+    lat = Column(Double, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
-Index("idx_user_tracking_user_time", UserTracking.user_id, UserTracking.timestamp)
\ No newline at end of file
+Index("idx_user_tracking_user_time", UserTracking.user_id, UserTracking.timestamp)
+
+
+# --- Estadísticas agregadas por día (mantenidas en cada escritura) ---
+class DailyStat(Base):
+    __tablename__ = "stats_daily"
+
+    day = Column(Date, nullable=False)
+    metric = Column(String(40), nullable=False)       # surveys | tracking_points | users_joined | surveys_by_category
+    dimension = Column(String(80), nullable=False, default="")  # p.ej. la categoría
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("day", "metric", "dimension", name="pk_stats_daily"),
+    )
+
+
+class SurveyUserDay(Base):
+    """Usuarios que enviaron al menos una encuesta cada día (para COUNT DISTINCT por rango)."""
+    __tablename__ = "stats_survey_user_days"
+
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("day", "user_id", name="pk_stats_survey_user_days"),
+    )
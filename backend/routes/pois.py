@@ -1,10 +1,99 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Optional
 from sqlalchemy.orm import Session
 from database import get_db
-import models, schemas
+import schemas
+from services.geometry import parse_bbox
+from services.poi_catalog import poi_catalog
+from services.poi_listing import get_listing
+from services.spatial_index import poi_spatial_index
 
 router = APIRouter(prefix="/pois", tags=["POIs"])
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @router.get("/", response_model=list[schemas.POIOut])
-def list_pois(db: Session = Depends(get_db)):
-    return db.query(models.POI).all()
+def list_pois(
+    request: Request,
+    category: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    after_id: Optional[int] = Query(None, description="Cursor: id del último POI de la página anterior"),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    """
+    Lista POIs ordenados por id. Sin parámetros devuelve el catálogo completo
+    (payload precalculado en memoria). Soporta filtros por ``category`` y
+    ``bbox`` y paginación por keyset (``after_id`` + ``limit``; el cursor de la
+    página siguiente viene en el header ``Link``). Responde 304 si el cliente
+    envía un ``If-None-Match`` con el ETag vigente.
+    """
+    try:
+        bounds = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    listing = get_listing(db, poi_catalog.get(db))
+    etag = listing.etag(category, bounds, after_id, limit)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if category is None and bounds is None and after_id is None and limit is None:
+        return Response(listing.full_payload, media_type="application/json", headers=headers)
+
+    payload, next_after = listing.select(after_id, limit, category, bounds)
+    if next_after is not None:
+        next_url = request.url.include_query_params(after_id=next_after)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(payload, media_type="application/json", headers=headers)
+
+
+@router.get("/nearby", response_model=list[schemas.POINearbyOut])
+def nearby_pois(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, le=50000, description="Radio en metros"),
+    k: int = Query(20, ge=1, le=500),
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Los ``k`` POIs más cercanos a (lat, lon) dentro de ``radius`` metros,
+    opcionalmente de una ``category``. Se resuelve con un índice de grilla en
+    memoria sobre el catálogo, sin consultar la tabla de POIs.
+    """
+    snapshot = poi_catalog.get(db)
+    positions, distances = poi_spatial_index.nearby(snapshot, lon, lat, radius, k, category)
+    return [
+        schemas.POINearbyOut(
+            id=int(snapshot.ids[i]),
+            name=snapshot.names[i],
+            category=snapshot.categories[i],
+            lon=float(snapshot.lon[i]),
+            lat=float(snapshot.lat[i]),
+            distance_m=round(float(d), 1),
+        )
+        for i, d in zip(positions.tolist(), distances.tolist())
+    ]
+
+
+@router.post("/catalog/refresh")
+def refresh_catalog(db: Session = Depends(get_db)):
+    """
+    Recarga el catálogo en memoria (POIs por categoría + perfiles). Útil justo
+    después de correr populate_pois.py/populate_profiles.py; si no se llama, el
+    cambio se detecta solo en a lo más POI_CATALOG_CHECK_SECONDS.
+    """
+    snapshot = poi_catalog.refresh(db)
+    return {
+        "ok": True,
+        "version": snapshot.version,
+        "categories": {c: len(ids) for c, ids in snapshot.ids_by_category.items()},
+        "profiles": len(snapshot.profiles_by_name),
+    }
@@ -1,225 +1,355 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from database import get_db
+from database import get_db, stream_query
 from datetime import datetime, timedelta
 from typing import Optional
+from services.columnar import ASSIGNMENT_COLUMNS, FORMATS, SURVEY_COLUMNS, TRACKING_COLUMNS, stream_columnar
+from services.geojson import GEOJSON_MEDIA_TYPE, point_features, stream_feature_collection
+from services.geometry import parse_bbox
+from services.heatmap import aggregate_grid, cell_size_for_zoom
+from services.mvt import MVT_MEDIA_TYPE
+from services.tiles import LAYERS, render_tile, tile_cache
+from services.trajectory import trajectory_features
+from services import data_version, stats
+from services.response_cache import results_cache
 import models
-import geopandas as gpd
-from shapely import wkt
 
 router = APIRouter(prefix="/results", tags=["Results"])
 
 
+SURVEY_PROPERTIES = ("title", "description", "category", "photo_url", "thumbnail_url", "created_at", "user_id")
+TRACKING_PROPERTIES = ("timestamp", "user_id")
+
+
 @router.get("/surveys/geojson")
 def get_surveys_geojson(
+    request: Request,
     category: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
 ):
     """
     Retorna todas las encuestas en formato GeoJSON con filtros opcionales.
+    La respuesta se genera en streaming (memoria constante) y se cachea hasta
+    la próxima encuesta.
     """
-    query = db.query(models.SurveyReport)
-    
-    # Aplicar filtros
-    if category:
-        query = query.filter(models.SurveyReport.option == category)
-    
-    if start_date:
-        query = query.filter(models.SurveyReport.created_at >= start_date)
-    
-    if end_date:
-        query = query.filter(models.SurveyReport.created_at <= end_date)
-    
-    surveys = query.order_by(models.SurveyReport.created_at.desc()).all()
-    
-    if not surveys:
-        return {"type": "FeatureCollection", "features": []}
-    
-    # Crear GeoDataFrame
-    geometries = []
-    ids = []
-    titles = []
-    descriptions = []
-    categories = []
-    photo_urls = []
-    created_ats = []
-    user_ids = []
-    
-    for survey in surveys:
-        try:
-            geom = wkt.loads(survey.wkt_point) if survey.wkt_point else None
-        except:
-            geom = None
+    def build_query(db: Session):
+        query = db.query(
+            models.SurveyReport.id,
+            models.SurveyReport.lon,
+            models.SurveyReport.lat,
+            models.SurveyReport.title,
+            func.coalesce(models.SurveyReport.description, ""),
+            models.SurveyReport.option,
+            func.coalesce(models.SurveyReport.photo_url, ""),
+            # El dashboard muestra la miniatura; sin ella, la foto original
+            func.coalesce(models.SurveyReport.photo_thumbnail_url, models.SurveyReport.photo_url, ""),
+            models.SurveyReport.created_at,
+            models.SurveyReport.user_id,
+        )
+        
+        # Aplicar filtros
+        if category:
+            query = query.filter(models.SurveyReport.option == category)
         
-        geometries.append(geom)
-        ids.append(survey.id)
-        titles.append(survey.title)
-        descriptions.append(survey.description or "")
-        categories.append(survey.option)
-        photo_urls.append(survey.photo_url or "")
-        created_ats.append(survey.created_at.isoformat() if survey.created_at else "")
-        user_ids.append(survey.user_id)
+        if start_date:
+            query = query.filter(models.SurveyReport.created_at >= start_date)
+        
+        if end_date:
+            query = query.filter(models.SurveyReport.created_at <= end_date)
+        
+        return query.order_by(models.SurveyReport.created_at.desc())
     
-    gdf = gpd.GeoDataFrame(
-        {
-            "id": ids,
-            "title": titles,
-            "description": descriptions,
-            "category": categories,
-            "photo_url": photo_urls,
-            "created_at": created_ats,
-            "user_id": user_ids,
-        },
-        geometry=geometries,
-        crs="EPSG:4326"
+    return results_cache.streaming_response(
+        request,
+        (data_version.SURVEYS,),
+        lambda: stream_feature_collection(point_features(stream_query(build_query), SURVEY_PROPERTIES)),
+        GEOJSON_MEDIA_TYPE,
     )
-    
-    return gdf.to_json()
 
 
 @router.get("/tracking/geojson")
 def get_tracking_geojson(
+    request: Request,
     user_id: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db)
+    mode: str = Query("points", pattern="^(points|trajectory)$"),
+    tolerance: float = Query(5.0, ge=0, le=10000),
 ):
     """
     Retorna puntos de tracking en formato GeoJSON con filtros opcionales.
+    La respuesta se genera en streaming (memoria constante) y se cachea hasta
+    el próximo lote de tracking.
+
+    ``mode=trajectory`` agrupa los fixes por usuario en orden temporal (índice
+    ``idx_user_tracking_user_time``) y retorna un LineString por usuario,
+    simplificado con ``tolerance`` metros (Douglas-Peucker; 0 = sin simplificar).
     """
-    query = db.query(models.UserTracking)
-    
-    if user_id:
-        query = query.filter(models.UserTracking.user_id == user_id)
-    
-    if start_date:
-        query = query.filter(models.UserTracking.timestamp >= start_date)
-    
-    if end_date:
-        query = query.filter(models.UserTracking.timestamp <= end_date)
-    
-    points = query.order_by(models.UserTracking.timestamp).all()
-    
-    if not points:
-        return {"type": "FeatureCollection", "features": []}
-    
-    geometries = []
-    ids = []
-    timestamps = []
-    user_ids = []
-    
-    for point in points:
-        try:
-            geom = wkt.loads(point.wkt_point) if point.wkt_point else None
-        except:
-            geom = None
+    columns = {
+        "points": (
+            models.UserTracking.id,
+            models.UserTracking.lon,
+            models.UserTracking.lat,
+            models.UserTracking.timestamp,
+            models.UserTracking.user_id,
+        ),
+        "trajectory": (
+            models.UserTracking.user_id,
+            models.UserTracking.lon,
+            models.UserTracking.lat,
+            models.UserTracking.timestamp,
+        ),
+    }[mode]
+
+    def build_query(db: Session):
+        query = db.query(*columns)
+        
+        if user_id:
+            query = query.filter(models.UserTracking.user_id == user_id)
         
-        geometries.append(geom)
-        ids.append(point.id)
-        timestamps.append(point.timestamp.isoformat() if point.timestamp else "")
-        user_ids.append(point.user_id)
+        if start_date:
+            query = query.filter(models.UserTracking.timestamp >= start_date)
+        
+        if end_date:
+            query = query.filter(models.UserTracking.timestamp <= end_date)
+        
+        if mode == "trajectory":
+            return query.order_by(models.UserTracking.user_id, models.UserTracking.timestamp)
+        return query.order_by(models.UserTracking.timestamp)
     
-    gdf = gpd.GeoDataFrame(
-        {
-            "id": ids,
-            "timestamp": timestamps,
-            "user_id": user_ids,
-        },
-        geometry=geometries,
-        crs="EPSG:4326"
+    def produce():
+        rows = stream_query(build_query)
+        if mode == "trajectory":
+            return stream_feature_collection(trajectory_features(rows, tolerance))
+        return stream_feature_collection(point_features(rows, TRACKING_PROPERTIES))
+
+    return results_cache.streaming_response(request, (data_version.TRACKING,), produce, GEOJSON_MEDIA_TYPE)
+
+
+# dataset -> (columnas, consulta, columna de tiempo, de categoría, generaciones que la invalidan)
+EXPORTS = {
+    "tracking": (
+        TRACKING_COLUMNS,
+        (
+            models.UserTracking.id,
+            models.UserTracking.user_id,
+            models.UserTracking.lon,
+            models.UserTracking.lat,
+            models.UserTracking.timestamp,
+        ),
+        models.UserTracking.timestamp,
+        None,
+        (data_version.TRACKING,),
+    ),
+    "surveys": (
+        SURVEY_COLUMNS,
+        (
+            models.SurveyReport.id,
+            models.SurveyReport.user_id,
+            models.SurveyReport.lon,
+            models.SurveyReport.lat,
+            models.SurveyReport.title,
+            models.SurveyReport.description,
+            models.SurveyReport.option,
+            models.SurveyReport.photo_url,
+            models.SurveyReport.photo_thumbnail_url,
+            models.SurveyReport.created_at,
+        ),
+        models.SurveyReport.created_at,
+        models.SurveyReport.option,
+        (data_version.SURVEYS,),
+    ),
+    "assignments": (
+        ASSIGNMENT_COLUMNS,
+        (
+            models.UserPOIAssignment.id,
+            models.UserPOIAssignment.user_id,
+            models.POI.id,
+            models.POI.name,
+            models.POI.category,
+            models.POI.lon,
+            models.POI.lat,
+            models.UserPOIAssignment.assigned_at,
+            models.UserPOIAssignment.visited,
+            models.UserPOIAssignment.visited_at,
+        ),
+        models.UserPOIAssignment.assigned_at,
+        models.POI.category,
+        (data_version.ASSIGNMENTS,),
+    ),
+}
+
+
+@router.get("/export/{dataset}.{fmt}")
+def export_dataset(
+    request: Request,
+    dataset: str,
+    fmt: str,
+    user_id: Optional[int] = None,
+    category: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """
+    Exporta ``tracking``, ``surveys`` o ``assignments`` como Parquet
+    (``.parquet``) o stream Arrow IPC (``.arrow``) para pandas/polars/DuckDB,
+    con los mismos filtros que los endpoints GeoJSON (``category`` es la
+    categoría de la encuesta o del POI asignado). Se lee y se escribe por
+    record batches, así que la memoria no depende del tamaño de la tabla.
+    """
+    if dataset not in EXPORTS or fmt not in FORMATS:
+        raise HTTPException(status_code=404, detail=f"Exportación '{dataset}.{fmt}' no existe")
+    columns, selected, time_col, category_col, generations = EXPORTS[dataset]
+    user_col = selected[1]
+
+    def build_query(db: Session):
+        query = db.query(*selected)
+        if dataset == "assignments":
+            query = query.select_from(models.UserPOIAssignment).join(
+                models.POI, models.POI.id == models.UserPOIAssignment.poi_id
+            )
+        if user_id:
+            query = query.filter(user_col == user_id)
+        if category and category_col is not None:
+            query = query.filter(category_col == category)
+        if start_date:
+            query = query.filter(time_col >= start_date)
+        if end_date:
+            query = query.filter(time_col <= end_date)
+        return query.order_by(time_col)
+
+    return results_cache.streaming_response(
+        request,
+        generations,
+        lambda: stream_columnar(stream_query(build_query, yield_per=10_000), columns, fmt),
+        FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{fmt}"'},
     )
-    
-    return gdf.to_json()
+
+
+@router.get("/surveys/{survey_id}/thumbnail")
+def get_survey_thumbnail(survey_id: int, db: Session = Depends(get_db)):
+    """Redirige a la miniatura de la foto de una encuesta (o a la foto original si aún no hay miniatura)."""
+    row = (
+        db.query(models.SurveyReport.photo_thumbnail_url, models.SurveyReport.photo_url)
+        .filter(models.SurveyReport.id == survey_id)
+        .first()
+    )
+    url = row and (row.photo_thumbnail_url or row.photo_url)
+    if not url:
+        raise HTTPException(status_code=404, detail="La encuesta no tiene foto")
+    return RedirectResponse(url, headers={"Cache-Control": "public, max-age=86400"})
 
 
 @router.get("/stats")
 def get_statistics(
+    request: Request,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Retorna estadísticas generales del proyecto.
+
+    Se responde desde los rollups diarios (``services/stats``), que se
+    actualizan en cada escritura: sumar buckets por día en vez de contar las
+    tablas completas. Los filtros de fecha son por día (inclusive) y también
+    aplican al desglose por categoría y a los usuarios con encuestas.
     """
-    # Filtros de fecha
-    survey_query = db.query(models.SurveyReport)
-    tracking_query = db.query(models.UserTracking)
-    
-    if start_date:
-        survey_query = survey_query.filter(models.SurveyReport.created_at >= start_date)
-        tracking_query = tracking_query.filter(models.UserTracking.timestamp >= start_date)
-    
-    if end_date:
-        survey_query = survey_query.filter(models.SurveyReport.created_at <= end_date)
-        tracking_query = tracking_query.filter(models.UserTracking.timestamp <= end_date)
-    
-    # Contar encuestas por categoría
-    category_stats = (
-        db.query(
-            models.SurveyReport.option,
-            func.count(models.SurveyReport.id).label('count')
-        )
-        .group_by(models.SurveyReport.option)
-        .all()
-    )
-    
-    # Total de encuestas
-    total_surveys = survey_query.count()
-    
-    # Total de puntos de tracking
-    total_tracking_points = tracking_query.count()
-    
-    # Usuarios únicos
-    unique_users = db.query(func.count(func.distinct(models.User.id))).scalar()
-    
-    # Usuarios con encuestas
-    users_with_surveys = (
-        db.query(func.count(func.distinct(models.SurveyReport.user_id)))
-        .scalar()
+    try:
+        start = stats.parse_day(start_date)
+        end = stats.parse_day(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date/end_date deben ser fechas ISO (YYYY-MM-DD)")
+
+    return results_cache.json_response(
+        request,
+        (data_version.SURVEYS, data_version.TRACKING, data_version.USERS),
+        lambda: stats.get_stats(db, start, end),
     )
-    
-    return {
-        "total_surveys": total_surveys,
-        "total_tracking_points": total_tracking_points,
-        "unique_users": unique_users,
-        "users_with_surveys": users_with_surveys,
-        "surveys_by_category": [
-            {"category": cat, "count": count}
-            for cat, count in category_stats
-        ]
-    }
 
 
 @router.get("/heatmap")
 def get_heatmap_data(
-    type: str = Query("surveys", regex="^(surveys|tracking)$"),
+    request: Request,
+    type: str = Query("surveys", pattern="^(surveys|tracking)$"),
     category: Optional[str] = None,
+    zoom: int = Query(13, ge=0, le=22),
+    cell_px: int = Query(16, ge=1, le=256),
+    bbox: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    max_cells: int = Query(20000, ge=1, le=100000),
     db: Session = Depends(get_db)
 ):
     """
-    Retorna datos para generar un heatmap.
-    Retorna array de [longitude, latitude, weight]
+    Retorna datos para generar un heatmap agregados en celdas de grilla.
+    Retorna array de [longitude, latitude, weight] donde weight es el número
+    real de puntos en la celda. El tamaño de celda sigue a ``zoom``
+    (~``cell_px`` píxeles en pantalla), así que la respuesta depende del número
+    de celdas y no del de puntos. ``bbox`` ("min_lon,min_lat,max_lon,max_lat")
+    y el rango de fechas se aplican antes de agregar.
     """
+    try:
+        bounds = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filters = []
     if type == "surveys":
-        query = db.query(models.SurveyReport)
+        table = models.SurveyReport
+        time_col = models.SurveyReport.created_at
         if category:
-            query = query.filter(models.SurveyReport.option == category)
-        items = query.all()
-        wkt_field = "wkt_point"
+            filters.append(models.SurveyReport.option == category)
     else:  # tracking
-        items = db.query(models.UserTracking).all()
-        wkt_field = "wkt_point"
+        table = models.UserTracking
+        time_col = models.UserTracking.timestamp
     
-    points = []
-    for item in items:
-        try:
-            geom = wkt.loads(getattr(item, wkt_field))
-            # [lng, lat, weight]
-            points.append([geom.x, geom.y, 1])
-        except:
-            continue
+    if start_date:
+        filters.append(time_col >= start_date)
+    if end_date:
+        filters.append(time_col <= end_date)
     
-    return {"points": points}
\ No newline at end of file
+    cell = cell_size_for_zoom(zoom, cell_px)
+    generation = data_version.SURVEYS if type == "surveys" else data_version.TRACKING
+
+    def compute():
+        points, total = aggregate_grid(db, table.lon, table.lat, filters, cell, max_cells, bounds)
+        return {
+            "points": points,
+            "zoom": zoom,
+            "cell_size": cell,
+            "cells": len(points),
+            "total": total,
+        }
+
+    return results_cache.json_response(request, (generation,), compute)
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+def get_tile(layer: str, z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """
+    Mapbox Vector Tile con los features de ``layer`` (tracking | surveys) dentro del tile.
+    En zooms bajos los puntos vienen agregados (propiedad ``count``).
+    """
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Capa '{layer}' no existe")
+    if not (0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Coordenadas de tile inválidas")
+    
+    return Response(render_tile(db, layer, z, x, y), media_type=MVT_MEDIA_TYPE)
+
+
+@router.get("/cache")
+def get_results_cache_stats():
+    """Métricas del caché de respuestas de /results (hits/misses por endpoint)."""
+    return results_cache.stats()
+
+
+@router.get("/tiles/cache")
+def get_tile_cache_stats():
+    """Estado del caché de tiles (entradas, bytes, hits/misses)."""
+    return tile_cache.stats()
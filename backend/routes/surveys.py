@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 import models
 from typing import Optional
-from services.storage import upload_survey_photo
+from services.storage import MAX_PHOTO_BYTES, PhotoTooLarge, discard_spooled, spool_photo, spool_path_for
+from services.photo_uploads import PENDING, PhotoJob, photo_pool
+from services.geometry import parse_point_wkt
+from services import data_version, stats
 
 router = APIRouter(prefix="/surveys", tags=["Surveys"])
 
@@ -14,15 +18,19 @@ async def create_survey(
     category: str = Form(...),
     wkt_point: str = Form(...),
     photo: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint para recibir encuestas de movilidad con ubicación GPS.
     Acepta FormData para manejar foto opcional.
+    La sesión es async: esperar a Postgres no bloquea el event loop.
+    La foto no se sube aquí: se guarda en el spool y la encuesta se responde de
+    inmediato con ``photo_status="pending"``; el pool de ``photo_uploads`` la
+    sube y completa ``photo_url`` (ver ``GET /surveys/{id}/photo``).
     """
     
     # Validar que el usuario existe
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"Usuario {user_id} no encontrado")
     
@@ -41,14 +49,28 @@ async def create_survey(
             detail=f"Categoría inválida. Use: {', '.join(valid_categories)}"
         )
     
-    # Subir foto a Cloudinary si existe
-    photo_url = None
-    if photo:
+    # El punto llega en WKT por compatibilidad; se guarda como lon/lat numéricos
+    try:
+        lon, lat = parse_point_wkt(wkt_point)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="wkt_point inválido, use 'POINT(lon lat)'")
+    
+    # Guardar la foto en el spool (la subida a Cloudinary ocurre en segundo plano)
+    spooled = None
+    if photo and photo.filename:
+        if not photo_pool.has_capacity():
+            raise HTTPException(
+                status_code=503,
+                detail="Cola de subida de fotos llena, reintente más tarde",
+                headers={"Retry-After": "10"},
+            )
         print(f"📷 Procesando foto: {photo.filename} ({photo.content_type})")
-        photo_url = await upload_survey_photo(photo, user_id)
-        
-        if not photo_url:
-            print("⚠️ No se pudo subir la foto, continuando sin ella")
+        try:
+            spooled = await spool_photo(photo, MAX_PHOTO_BYTES)
+        except PhotoTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        if not spooled:
+            print("⚠️ Formato de foto no permitido, continuando sin ella")
     
     # Crear registro en la base de datos
     survey = models.SurveyReport(
@@ -56,25 +78,68 @@ async def create_survey(
         title=f"{category.replace('_', ' ').title()} observation",
         description=description,
         option=category,
-        wkt_point=wkt_point,
-        photo_url=photo_url
+        lon=lon,
+        lat=lat,
+        photo_status=PENDING if spooled else None,
     )
     
     db.add(survey)
-    db.commit()
-    db.refresh(survey)
+    try:
+        await db.run_sync(stats.record_survey, user_id, category)  # rollups diarios, misma transacción
+        await db.commit()  # expire_on_commit=False: survey.id queda disponible sin refresh
+    except BaseException:
+        # Sin encuesta no hay a quién asociar la foto: el ``incoming-*`` no se recupera al arrancar
+        if spooled:
+            discard_spooled(spooled)
+        raise
+    data_version.bump(data_version.SURVEYS)
+    
+    if spooled and not photo_pool.submit(PhotoJob(survey.id, user_id, spool_path_for(survey.id, user_id, spooled))):
+        # Otro request llenó la cola entre el chequeo y ahora: el archivo queda
+        # en el spool y se re-encola al próximo arranque del pool
+        print(f"⚠️ Cola de fotos llena; la foto de la encuesta {survey.id} queda en el spool")
     
-    print(f"✅ Encuesta guardada: ID={survey.id}, User={user_id}, Photo={'Sí' if photo_url else 'No'}")
+    print(f"✅ Encuesta guardada: ID={survey.id}, User={user_id}, Photo={'Pendiente' if spooled else 'No'}")
     
     return {
         "ok": True,
         "id": survey.id,
         "message": "Survey submitted successfully",
-        "photo_uploaded": photo_url is not None,
-        "photo_url": photo_url
+        "photo_status": survey.photo_status,
+        "photo_url": None
     }
 
 
+@router.get("/{survey_id}/photo")
+def get_photo_status(survey_id: int, db: Session = Depends(get_db)):
+    """Estado de la subida en segundo plano de la foto de una encuesta."""
+    row = (
+        db.query(
+            models.SurveyReport.photo_status,
+            models.SurveyReport.photo_url,
+            models.SurveyReport.photo_thumbnail_url,
+            models.SurveyReport.photo_error,
+        )
+        .filter(models.SurveyReport.id == survey_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Encuesta {survey_id} no encontrada")
+    return {
+        "id": survey_id,
+        "photo_status": row.photo_status,
+        "photo_url": row.photo_url,
+        "thumbnail_url": row.photo_thumbnail_url,
+        "error": row.photo_error,
+    }
+
+
+@router.get("/photos/metrics")
+def photo_upload_metrics():
+    """Cola, subidas en curso, reintentos y latencias del pool de fotos."""
+    return photo_pool.stats()
+
+
 @router.get("/user/{user_id}")
 def get_user_surveys(user_id: int, db: Session = Depends(get_db)):
     """
@@ -1,14 +1,47 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-import models, schemas
+from fastapi import APIRouter, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal
+from services.tracking_ingest import store_tracking, tracking_rows
+from services.ingest_queue import tracking_queue, WRITE_BEHIND_ENABLED
+import schemas
 
 router = APIRouter(prefix="/tracking", tags=["Tracking"])
 
-@router.post("/batch")
-def ingest_batch(body: schemas.TrackBatch, db: Session = Depends(get_db)):
-    for p in body.points:
-        db.add(models.UserTracking(user_id=p.user_id, wkt_point=p.wkt_point))
-        # si quieres usar timestamp del cliente, cámbialo aquí
-    db.commit()
-    return {"ok": True, "count": len(body.points)}
+
+def _store_now(rows) -> int:
+    db = SessionLocal()
+    try:
+        return store_tracking(db, rows)
+    finally:
+        db.close()
+
+
+@router.post("/batch", status_code=202)
+async def ingest_batch(body: schemas.TrackBatch, response: Response):
+    """
+    Recibe un batch de puntos y lo deja en el buffer de ingesta (write-behind):
+    responde 202 sin tocar la DB y un hilo de fondo los escribe en group commits.
+    Con TRACKING_WRITE_BEHIND=0 se escribe en el request y responde 200.
+    """
+    rows = tracking_rows(body.points)
+
+    if not WRITE_BEHIND_ENABLED:
+        # Inserción en bloque + detección de visitas, en una transacción. Engine
+        # síncrono en el threadpool (no asyncpg): así el COPY de psycopg sigue aplicando
+        await run_in_threadpool(_store_now, rows)
+        response.status_code = 200
+        return {"ok": True, "count": len(rows)}
+
+    if not tracking_queue.submit(rows):
+        raise HTTPException(
+            status_code=503,
+            detail="Tracking buffer lleno, reintente más tarde",
+            headers={"Retry-After": "5"},
+        )
+    return {"ok": True, "count": len(rows), "queued": True}
+
+
+@router.get("/queue/metrics")
+def queue_metrics():
+    """Profundidad del buffer y latencias de flush del ingestor de tracking."""
+    return tracking_queue.stats()
@@ -1,63 +1,73 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 import schemas, models
-import random
-import geopandas as gpd
-from shapely import wkt
+from services.poi_catalog import poi_catalog
+from services.visit_detection import assigned_poi_index
+from services.assignment import SPREAD_DEFAULT, assign_pois_for_users, insert_assignments, plan_assignments
+from services.geojson import GeoJSONResponse, feature_collection_bytes, point_geometry, wkb_to_geometry
+from services.geometry import wkb_geometry_type, WKB_POINT_TYPE
+from services import data_version, stats
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.post("/join", response_model=schemas.UserResponse)
-def join_user(data: schemas.UserJoinRequest, db: Session = Depends(get_db)):
+async def join_user(data: schemas.UserJoinRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint llamado desde el frontend cuando el usuario entra vía QR:
     - Recibe: {username: "pepe", profile: "student"}
     - Si el usuario ya existe, lo devuelve.
     - Si no existe, lo crea y le asigna POIs aleatorios según las reglas de su perfil.
+    Usa el engine async: mientras espera a Postgres el event loop sigue atendiendo.
     """
-    # 🔎 Buscar si ya existe el usuario
-    user = db.query(models.User).filter(models.User.username == data.username).first()
-    if user:
+    # 🔎 Buscar si ya existe el usuario (con el nombre del perfil en la misma consulta)
+    existing = (await db.execute(
+        select(models.User.id, models.User.username, models.User.uuid, models.Profile.name)
+        .join(models.Profile, models.Profile.id == models.User.profile_id)
+        .where(models.User.username == data.username)
+    )).first()
+    if existing:
         # Si ya existe devolvemos sus asignaciones
-        assigned = (
-            db.query(models.UserPOIAssignment.poi_id)
-            .filter(models.UserPOIAssignment.user_id == user.id)
-            .all()
-        )
-        assigned_pois = [a.poi_id for a in assigned]
+        assigned_pois = list((await db.execute(
+            select(models.UserPOIAssignment.poi_id)
+            .where(models.UserPOIAssignment.user_id == existing.id)
+        )).scalars())
         return schemas.UserResponse(
-            id=user.id,
-            username=user.username,
-            profile=user.profile.name,
-            uuid=user.uuid,                   # ✅
+            id=existing.id,
+            username=existing.username,
+            profile=existing.name,
+            uuid=existing.uuid,                   # ✅
             assigned_pois=assigned_pois,
         )
 
-    # 🔎 Buscar el perfil por nombre
-    profile = db.query(models.Profile).filter(models.Profile.name == data.profile).first()
+    # 🔎 Buscar el perfil por nombre en el catálogo en memoria
+    catalog = await poi_catalog.get_async()
+    profile = catalog.profiles_by_name.get(data.profile)
+    if not profile:
+        # Puede ser un perfil recién cargado: recargamos una vez antes de fallar
+        catalog = await poi_catalog.refresh_async()
+        profile = catalog.profiles_by_name.get(data.profile)
     if not profile:
         raise HTTPException(status_code=404, detail=f"Perfil '{data.profile}' no encontrado")
 
     # ➕ Crear usuario
-    user = models.User(username=data.username, profile=profile)
+    user = models.User(username=data.username, profile_id=profile.id)
     db.add(user)
-    db.flush()  # obtiene user.id antes de commitear
-
-    # 🎲 Asignar POIs aleatorios según reglas
-    assigned_pois = []
-    rules = profile.rules or {}
-    for category, count in rules.items():
-        if count > 0:
-            pois = db.query(models.POI).filter(models.POI.category == category).all()
-            if pois:
-                sample = random.sample(pois, min(count, len(pois)))
-                for poi in sample:
-                    db.add(models.UserPOIAssignment(user_id=user.id, poi_id=poi.id))
-                    assigned_pois.append(poi.id)
+    await db.flush()  # obtiene user.id antes de commitear
 
-    db.commit()
+    # 🎲 Asignar POIs aleatorios según reglas (muestreo O(k) sobre el catálogo)
+    assigned_pois = plan_assignments(catalog, profile.rules, spread=SPREAD_DEFAULT)
+
+    def write_assignments(session: Session):
+        # Un solo INSERT multi-fila para todas las asignaciones + rollup diario
+        insert_assignments(session, ((user.id, poi_id) for poi_id in assigned_pois))
+        stats.record_users_joined(session, 1)
+
+    await db.run_sync(write_assignments)
+    await db.commit()
+    data_version.bump(data_version.USERS, data_version.ASSIGNMENTS)
 
     return schemas.UserResponse(
         id=user.id,
@@ -68,6 +78,65 @@ def join_user(data: schemas.UserJoinRequest, db: Session = Depends(get_db)):
     )
 
 
+@router.post("/bulk_join", response_model=list[schemas.UserResponse])
+def bulk_join_users(data: schemas.BulkJoinRequest, db: Session = Depends(get_db)):
+    """
+    Pre-registra una cohorte completa de un perfil:
+    - Los usernames que ya existen se devuelven tal cual (sin reasignar).
+    - Los nuevos se crean y reciben POIs en bloque (un muestreo en memoria y
+      INSERTs multi-fila para todos), opcionalmente repartidos en el espacio.
+    """
+    catalog = poi_catalog.get(db)
+    profile = catalog.profiles_by_name.get(data.profile)
+    if not profile:
+        raise HTTPException(status_code=404, detail=f"Perfil '{data.profile}' no encontrado")
+
+    usernames = list(dict.fromkeys(data.usernames))  # sin duplicados, mismo orden
+    existing = {
+        u.username: u
+        for u in db.query(models.User.id, models.User.username, models.User.uuid, models.Profile.name)
+        .join(models.Profile, models.Profile.id == models.User.profile_id)
+        .filter(models.User.username.in_(usernames))
+    }
+
+    new_users = [models.User(username=name, profile_id=profile.id) for name in usernames if name not in existing]
+    db.add_all(new_users)
+    db.flush()  # ids de todos los usuarios nuevos
+
+    spread = SPREAD_DEFAULT if data.spread is None else data.spread
+    plan = assign_pois_for_users(db, [(u.id, profile.rules) for u in new_users], spread=spread)
+
+    assigned_existing: dict = {}
+    if existing:
+        rows = (
+            db.query(models.UserPOIAssignment.user_id, models.UserPOIAssignment.poi_id)
+            .filter(models.UserPOIAssignment.user_id.in_([u.id for u in existing.values()]))
+        )
+        for user_id, poi_id in rows:
+            assigned_existing.setdefault(user_id, []).append(poi_id)
+
+    stats.record_users_joined(db, len(new_users))
+    db.commit()
+    if new_users:
+        data_version.bump(data_version.USERS, data_version.ASSIGNMENTS)
+
+    by_name = {u.username: (u.id, u.uuid, profile.name, plan[u.id]) for u in new_users}
+    by_name.update({
+        name: (u.id, u.uuid, u.name, assigned_existing.get(u.id, []))
+        for name, u in existing.items()
+    })
+    return [
+        schemas.UserResponse(
+            id=user_id,
+            username=name,
+            profile=profile_name,
+            uuid=uuid,
+            assigned_pois=assigned,
+        )
+        for name, (user_id, uuid, profile_name, assigned) in ((n, by_name[n]) for n in usernames)
+    ]
+
+
 @router.get("/{user_id}/assignments", response_model=list[schemas.AssignmentOut])
 def get_assignments(user_id: int, db: Session = Depends(get_db)):
     """
@@ -90,57 +159,50 @@ def get_assignments(user_id: int, db: Session = Depends(get_db)):
     ]
 
 
-@router.get("/{user_id}/assignments_geojson")
+@router.get("/{user_id}/assignments_geojson", response_class=GeoJSONResponse)
 def get_assignments_geojson(user_id: int, db: Session = Depends(get_db)):
     """
     Devuelve todos los POIs asignados a un usuario en formato GeoJSON.
     """
-    # Obtenemos la info unida de asignaciones y POIs
+    # Obtenemos solo las columnas necesarias de asignaciones y POIs
     rows = (
-        db.query(models.UserPOIAssignment, models.POI)
+        db.query(
+            models.POI.id,
+            models.POI.lon,
+            models.POI.lat,
+            models.POI.wkb_geometry,
+            models.POI.name,
+            models.POI.category,
+            models.UserPOIAssignment.visited,
+            models.UserPOIAssignment.visited_at,
+        )
+        .select_from(models.UserPOIAssignment)
         .join(models.POI, models.POI.id == models.UserPOIAssignment.poi_id)
         .filter(models.UserPOIAssignment.user_id == user_id)
         .all()
     )
 
-    if not rows:
-        return {"type": "FeatureCollection", "features": []}
-
-    # Creamos listas para las columnas del GeoDataFrame
-    geometries = []
-    ids = []
-    names = []
-    categories = []
-    visited = []
-    visited_at = []
-
-    for ua, poi in rows:
-        try:
-            geom = wkt.loads(poi.wkt_geometry) if poi.wkt_geometry else None
-        except Exception:
-            geom = None
-
-        geometries.append(geom)
-        ids.append(poi.id)
-        names.append(poi.name)
-        categories.append(poi.category)
-        visited.append(ua.visited)
-        visited_at.append(ua.visited_at.isoformat() if ua.visited_at else None)
-
-    gdf = gpd.GeoDataFrame(
+    features = (
         {
-            "id": ids,
-            "name": names,
-            "category": categories,
-            "visited": visited,
-            "visited_at": visited_at,
-        },
-        geometry=geometries,
-        crs="EPSG:4326"  # asegúrate que tus coordenadas estén en lon/lat
+            "id": poi_id,
+            "type": "Feature",
+            "properties": {
+                "id": poi_id,
+                "name": name,
+                "category": category,
+                "visited": visited,
+                "visited_at": visited_at,
+            },
+            # Los POIs son puntos casi siempre: evitamos decodificar el WKB
+            "geometry": (
+                point_geometry(lon, lat)
+                if wkb_geometry_type(wkb) == WKB_POINT_TYPE
+                else wkb_to_geometry(wkb)
+            ),
+        }
+        for poi_id, lon, lat, wkb, name, category, visited, visited_at in rows
     )
-
-    # Usamos to_json para obtener un GeoJSON válido
-    return gdf.to_json()
+    return GeoJSONResponse(feature_collection_bytes(features))
 
 
 @router.post("/{user_id}/visit")
@@ -159,4 +221,7 @@ def mark_visit(user_id: int, body: schemas.VisitMarkIn, db: Session = Depends(ge
     ua.visited = body.visited
     ua.visited_at = func.now() if body.visited else None
     db.commit()
+    data_version.bump(data_version.ASSIGNMENTS)
+    # El detector automático de visitas cachea los POIs pendientes del usuario
+    assigned_poi_index.invalidate(user_id)
     return {"ok": True}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Dict, List, Optional
+from services.geometry import parse_point_wkt
 
 # ---- Profiles ----
 class ProfileCreate(BaseModel):
@@ -24,6 +25,11 @@ class UserJoinRequest(BaseModel):
     username: str
     profile: str  # nombre exacto del profile ("student", "elderly", etc.)
 
+class BulkJoinRequest(BaseModel):
+    profile: str
+    usernames: List[str] = Field(..., min_length=1, max_length=20000)
+    spread: Optional[bool] = None  # POIs repartidos en el espacio (default: ASSIGNMENT_SPREAD)
+
 class UserOut(BaseModel):
     id: int
     username: str
@@ -49,6 +55,14 @@ class POIOut(BaseModel):
     wkt_geometry: str
     class Config: from_attributes = True
 
+class POINearbyOut(BaseModel):
+    id: int
+    name: str
+    category: str
+    lon: float
+    lat: float
+    distance_m: float
+
 # ---- Assignments ----
 class AssignmentOut(BaseModel):
     poi: POIOut
@@ -71,8 +85,19 @@ class SurveyCreate(BaseModel):
 # ---- Tracking ----
 class TrackPoint(BaseModel):
     user_id: int
-    wkt_point: str
+    wkt_point: Optional[str] = None  # compatibilidad: "POINT(lon lat)"
+    lon: Optional[float] = None
+    lat: Optional[float] = None
     timestamp: Optional[str] = None  # client clock opcional
 
+    @model_validator(mode="after")
+    def resolve_coordinates(self):
+        # Se acepta WKT o lon/lat directos; se almacenan siempre como números
+        if self.lon is None or self.lat is None:
+            if not self.wkt_point:
+                raise ValueError("Se requiere wkt_point o lon/lat")
+            self.lon, self.lat = parse_point_wkt(self.wkt_point)
+        return self
+
 class TrackBatch(BaseModel):
     points: List[TrackPoint]
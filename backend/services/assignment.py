@@ -1,36 +1,91 @@
+import os
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Dict
-from models import POI, UserPOIAssignment, Profile
 
-def assign_pois_for_user(db: Session, user_id: int, rules: Dict[str, int]) -> None:
-    """Asigna POIs aleatoriamente por categoría según las reglas del profile.
-       Idempotente: no duplica si ya existe (uconstraint)."""
-    for category, needed in rules.items():
-        if needed <= 0:
+from models import POI, UserPOIAssignment
+from services.poi_catalog import CatalogSnapshot, poi_catalog
+from services.visit_detection import assigned_poi_index
+
+# Muestreo repartido en el espacio por defecto (se puede pedir por request)
+SPREAD_DEFAULT = os.getenv("ASSIGNMENT_SPREAD", "0") == "1"
+
+
+def plan_assignments(
+    catalog: CatalogSnapshot,
+    rules: Dict[str, int],
+    spread: bool = False,
+    exclude: Optional[Set[int]] = None,
+    rng: random.Random = random,
+) -> List[int]:
+    """
+    Elige POIs según las reglas ``{categoría: cantidad}`` del perfil, sin tocar
+    la base de datos. ``spread=True`` reparte los POIs entre celdas de la grilla
+    precalculada del catálogo. ``exclude`` son POIs que el usuario ya tiene.
+    """
+    picked: List[int] = []
+    sampler = catalog.sample_spread if spread else catalog.sample
+    for category, count in rules.items():
+        if count <= 0:
             continue
-        # POIs ya asignados de esa categoría
-        existing_ids = {
-            r.poi_id for r in db.query(UserPOIAssignment)
-                                 .join(POI, POI.id == UserPOIAssignment.poi_id)
-                                 .filter(UserPOIAssignment.user_id == user_id,
-                                         POI.category == category)
-        }
-
-        # Tomar más si faltan
-        missing = max(0, needed - len(existing_ids))
-        if missing == 0:
+        if not exclude:
+            picked.extend(sampler(category, count, rng))
             continue
+        # Pedimos de más para compensar los ya asignados y filtramos
+        candidates = sampler(category, count + len(exclude), rng)
+        picked.extend([c for c in candidates if c not in exclude][:count])
+    return picked
+
 
-        # Sample aleatorio en DB
-        candidates = (
-            db.query(POI.id)
-              .filter(POI.category == category, ~POI.id.in_(existing_ids))
-              .order_by(func.random())
-              .limit(missing)
-              .all()
-        )
-        for (poi_id,) in candidates:
-            db.add(UserPOIAssignment(user_id=user_id, poi_id=poi_id))
+def insert_assignments(db: Session, pairs: Iterable[Tuple[int, int]]) -> int:
+    """
+    Inserta pares ``(user_id, poi_id)`` con un solo ``INSERT`` ejecutado como
+    executemany: SQLAlchemy lo agrupa en sentencias multi-fila ("insertmanyvalues"),
+    una sola para un usuario y lotes acotados para cohortes. No hace commit.
+    """
+    values = [{"user_id": user_id, "poi_id": poi_id} for user_id, poi_id in pairs]
+    if values:
+        db.execute(insert(UserPOIAssignment), values)
+        # El detector de visitas debe ver las asignaciones nuevas
+        assigned_poi_index.invalidate(*{v["user_id"] for v in values})
+    return len(values)
+
+
+def assign_pois_for_users(
+    db: Session,
+    users: Sequence[Tuple[int, Dict[str, int]]],
+    spread: bool = SPREAD_DEFAULT,
+    rng: random.Random = random,
+) -> Dict[int, List[int]]:
+    """
+    Asigna POIs a muchos usuarios nuevos a la vez (p.ej. pre-registro de una
+    cohorte): el muestreo se hace en memoria sobre el catálogo y las
+    asignaciones se escriben con INSERTs multi-fila. No hace commit.
+    """
+    catalog = poi_catalog.get(db)
+    plan = {user_id: plan_assignments(catalog, rules, spread, rng=rng) for user_id, rules in users}
+    insert_assignments(db, ((u, p) for u, pois in plan.items() for p in pois))
+    return plan
+
+
+def assign_pois_for_user(db: Session, user_id: int, rules: Dict[str, int], spread: bool = SPREAD_DEFAULT) -> List[int]:
+    """Asigna POIs aleatoriamente por categoría según las reglas del profile.
+       Idempotente: solo completa lo que falta por categoría (uconstraint)."""
+    existing = (
+        db.query(UserPOIAssignment.poi_id, POI.category)
+        .join(POI, POI.id == UserPOIAssignment.poi_id)
+        .filter(UserPOIAssignment.user_id == user_id)
+        .all()
+    )
+    have: Dict[str, int] = {}
+    for _, category in existing:
+        have[category] = have.get(category, 0) + 1
+    missing = {c: n - have.get(c, 0) for c, n in rules.items() if n - have.get(c, 0) > 0}
 
+    catalog = poi_catalog.get(db)
+    new_ids = plan_assignments(catalog, missing, spread, exclude={poi_id for poi_id, _ in existing})
+    insert_assignments(db, ((user_id, poi_id) for poi_id in new_ids))
     db.commit()
+    return new_ids
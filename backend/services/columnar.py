@@ -0,0 +1,132 @@
+"""
+Exportación columnar (Parquet / Arrow IPC) para análisis.
+
+Las filas se leen con cursor del lado del servidor (``stream_query``), se
+agrupan en record batches de ``batch_rows`` filas y cada batch se escribe y se
+envía apenas está listo: la memoria depende del tamaño del batch, no de la
+tabla. pyarrow se importa recién al exportar.
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List, Sequence
+
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = {"parquet": PARQUET_MEDIA_TYPE, "arrow": ARROW_STREAM_MEDIA_TYPE}
+BATCH_ROWS = 50_000
+
+# (columna, tipo) en el orden de las filas de cada consulta de exportación
+TRACKING_COLUMNS = (
+    ("id", "int64"),
+    ("user_id", "int64"),
+    ("lon", "float64"),
+    ("lat", "float64"),
+    ("timestamp", "timestamp"),
+)
+SURVEY_COLUMNS = (
+    ("id", "int64"),
+    ("user_id", "int64"),
+    ("lon", "float64"),
+    ("lat", "float64"),
+    ("title", "string"),
+    ("description", "string"),
+    ("category", "string"),
+    ("photo_url", "string"),
+    ("thumbnail_url", "string"),
+    ("created_at", "timestamp"),
+)
+ASSIGNMENT_COLUMNS = (
+    ("id", "int64"),
+    ("user_id", "int64"),
+    ("poi_id", "int64"),
+    ("poi_name", "string"),
+    ("category", "string"),
+    ("lon", "float64"),
+    ("lat", "float64"),
+    ("assigned_at", "timestamp"),
+    ("visited", "bool"),
+    ("visited_at", "timestamp"),
+)
+
+
+def arrow_schema(columns: Sequence[tuple]):
+    import pyarrow as pa
+
+    types = {
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def to_record_batch(rows: Sequence[Sequence], schema):
+    """Filas (tuplas) -> ``RecordBatch`` columna a columna."""
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.record_batch(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def record_batches(rows: Iterable[Sequence], schema, batch_rows: int = BATCH_ROWS) -> Iterator:
+    """Agrupa un iterador de filas en record batches de hasta ``batch_rows`` filas."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_rows))
+        if not chunk:
+            return
+        yield to_record_batch(chunk, schema)
+
+
+class _Sink:
+    """Archivo de sólo escritura que acumula lo escrito hasta que se drena."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def stream_columnar(rows: Iterable[Sequence], columns: Sequence[tuple], fmt: str, batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    """
+    Serializa ``rows`` como Parquet (un row group por batch, zstd) o como
+    stream Arrow IPC y produce los bytes a medida que se escribe cada batch.
+    Sin filas se produce igual un archivo válido con el esquema.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns)
+    sink = _Sink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(out, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+    try:
+        for batch in record_batches(rows, schema, batch_rows):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,52 @@
+import threading
+from typing import Dict, Tuple
+
+# Tablas cuyo contenido invalida cachés derivados
+TRACKING = "user_tracking"
+SURVEYS = "survey_reports"
+USERS = "users"
+ASSIGNMENTS = "user_poi_assignments"
+
+_lock = threading.Lock()
+_generations: Dict[str, int] = {}
+
+# Con varios workers las generaciones deben ser compartidas (ver ``use_shared``)
+_shared = None
+_SHARED_PREFIX = "data_version:"
+
+
+def use_shared(client) -> None:
+    """
+    Guarda las generaciones en un cliente tipo redis (``incr``/``mget``) para
+    que una escritura en un worker invalide los cachés de todos los demás.
+    """
+    global _shared
+    _shared = client
+
+
+def bump(*tables: str) -> None:
+    """Marca que llegaron datos nuevos a ``tables``: los cachés con la generación anterior quedan obsoletos."""
+    with _lock:
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+    if _shared is not None:
+        try:
+            for table in tables:
+                _shared.incr(_SHARED_PREFIX + table)
+        except Exception as e:  # la escritura ya está commiteada; no la hacemos fallar
+            print(f"⚠️ No se pudo publicar la generación de {tables}: {e}")
+
+
+def current(table: str) -> int:
+    return snapshot(table)[0]
+
+
+def snapshot(*tables: str) -> Tuple[int, ...]:
+    """Generaciones actuales de ``tables`` (una sola ida al backend compartido)."""
+    if _shared is not None:
+        try:
+            values = _shared.mget([_SHARED_PREFIX + t for t in tables])
+            return tuple(int(v or 0) for v in values)
+        except Exception as e:
+            print(f"⚠️ Backend de generaciones no disponible, usando contador local: {e}")
+    return tuple(_generations.get(t, 0) for t in tables)
@@ -0,0 +1,137 @@
+import struct
+from typing import Iterable, Iterator, List, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:  # orjson es opcional: json estándar como respaldo
+    import json
+    from datetime import date
+
+    def _default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        raise TypeError(f"{type(value).__name__} no es serializable")
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+FEATURE_COLLECTION_HEAD = b'{"type":"FeatureCollection","features":['
+FEATURE_COLLECTION_TAIL = b"]}"
+
+
+class GeoJSONResponse(Response):
+    """Respuesta con bytes GeoJSON ya serializados (sin re-encode de FastAPI)."""
+    media_type = GEOJSON_MEDIA_TYPE
+
+
+# ---- Geometrías ----
+def point_geometry(lon: float, lat: float) -> dict:
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+_WKB_TYPES = {
+    1: "Point", 2: "LineString", 3: "Polygon",
+    4: "MultiPoint", 5: "MultiLineString", 6: "MultiPolygon",
+}
+
+
+def _read_wkb(buf: bytes, offset: int):
+    endian = "<" if buf[offset] == 1 else ">"
+    raw = struct.unpack_from(f"{endian}I", buf, offset + 1)[0]
+    offset += 5
+    # Dimensiones extra (Z/M) en variante EWKB (flags) o ISO (1000/2000/3000)
+    dims = 2 + bool(raw & 0x80000000) + bool(raw & 0x40000000)
+    if raw & 0x20000000:  # EWKB con SRID embebido
+        offset += 4
+    gtype = raw & 0x0FFFFFFF
+    dims += (0, 1, 1, 2)[gtype // 1000] if gtype >= 1000 else 0
+    gtype %= 1000
+
+    def coords(n, off):
+        values = struct.unpack_from(f"{endian}{n * dims}d", buf, off)
+        return [list(values[i:i + 2]) for i in range(0, n * dims, dims)], off + n * dims * 8
+
+    def count(off):
+        return struct.unpack_from(f"{endian}I", buf, off)[0], off + 4
+
+    if gtype == 1:
+        pts, offset = coords(1, offset)
+        return {"type": "Point", "coordinates": pts[0]}, offset
+    if gtype == 2:
+        n, offset = count(offset)
+        pts, offset = coords(n, offset)
+        return {"type": "LineString", "coordinates": pts}, offset
+    if gtype == 3:
+        n_rings, offset = count(offset)
+        rings = []
+        for _ in range(n_rings):
+            n, offset = count(offset)
+            ring, offset = coords(n, offset)
+            rings.append(ring)
+        return {"type": "Polygon", "coordinates": rings}, offset
+    if gtype in (4, 5, 6):
+        n, offset = count(offset)
+        parts = []
+        for _ in range(n):
+            part, offset = _read_wkb(buf, offset)
+            parts.append(part["coordinates"])
+        return {"type": _WKB_TYPES[gtype], "coordinates": parts}, offset
+    raise ValueError(f"Tipo WKB no soportado: {gtype}")
+
+
+def wkb_to_geometry(value: bytes) -> dict:
+    """WKB (puntos, líneas, polígonos y sus Multi*) -> geometría GeoJSON, sin shapely."""
+    return _read_wkb(bytes(value), 0)[0]
+
+
+# ---- Features desde filas ----
+def point_features(rows: Iterable[Sequence], property_names: Sequence[str]) -> Iterator[dict]:
+    """
+    Construye features directamente desde tuplas ``(id, lon, lat, *props)``.
+    ``property_names`` nombra las columnas a partir de la cuarta; el id también
+    se incluye en ``properties`` como hacía la salida de GeoPandas.
+    """
+    for row in rows:
+        props = dict(zip(property_names, row[3:]))
+        props["id"] = row[0]
+        yield {
+            "id": row[0],
+            "type": "Feature",
+            "properties": props,
+            "geometry": {"type": "Point", "coordinates": [row[1], row[2]]},
+        }
+
+
+# ---- Serialización ----
+def feature_collection_bytes(features: Iterable[dict]) -> bytes:
+    return FEATURE_COLLECTION_HEAD + b",".join(map(dumps, features)) + FEATURE_COLLECTION_TAIL
+
+
+def stream_feature_collection(features: Iterable[dict], chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Serializa un FeatureCollection de forma incremental: nunca mantiene más de
+    ``chunk_bytes`` en memoria, sin importar cuántos features haya.
+    """
+    parts: List[bytes] = [FEATURE_COLLECTION_HEAD]
+    size = 0
+    first = True
+    for feature in features:
+        if not first:
+            parts.append(b",")
+        first = False
+        encoded = dumps(feature)
+        parts.append(encoded)
+        size += len(encoded)
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts.clear()
+            size = 0
+    parts.append(FEATURE_COLLECTION_TAIL)
+    yield b"".join(parts)
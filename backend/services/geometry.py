@@ -0,0 +1,72 @@
+import re
+import struct
+from typing import Tuple
+
+# POINT(lon lat) / POINT (lon lat), con o sin espacios extra
+_POINT_RE = re.compile(
+    r"^\s*POINT\s*\(\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s+"
+    r"([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*\)\s*$",
+    re.IGNORECASE,
+)
+
+WKB_POINT_TYPE = 1
+
+
+def parse_point_wkt(value: str) -> Tuple[float, float]:
+    """
+    Lee un ``POINT(lon lat)`` en WKT sin pasar por shapely.
+    Lanza ``ValueError`` si el texto no es un punto 2D válido.
+    """
+    m = _POINT_RE.match(value or "")
+    if not m:
+        raise ValueError(f"WKT POINT inválido: {value!r}")
+    return float(m.group(1)), float(m.group(2))
+
+
+def point_wkt(lon: float, lat: float) -> str:
+    """Formatea un punto como WKT (solo para compatibilidad en respuestas)."""
+    return f"POINT ({lon!r} {lat!r})"
+
+
+def point_wkb(lon: float, lat: float) -> bytes:
+    """WKB little-endian de un punto 2D."""
+    return struct.pack("<BIdd", 1, WKB_POINT_TYPE, lon, lat)
+
+
+def wkb_geometry_type(value: bytes) -> int:
+    """Tipo de geometría (1=Point, 3=Polygon, ...) leído del header WKB."""
+    byte_order = "<" if value[0] == 1 else ">"
+    return struct.unpack_from(f"{byte_order}I", value, 1)[0] & 0xFF
+
+
+def geometry_from_wkt(value: str) -> Tuple[float, float, bytes]:
+    """
+    Convierte WKT de entrada en ``(lon, lat, wkb)``. Los puntos se resuelven sin
+    shapely; para otras geometrías (POIs poligonales) ``lon/lat`` es un punto
+    representativo y shapely se importa recién aquí.
+    """
+    try:
+        lon, lat = parse_point_wkt(value)
+        return lon, lat, point_wkb(lon, lat)
+    except ValueError:
+        pass
+
+    from shapely import wkt as shapely_wkt
+
+    geom = shapely_wkt.loads(value)
+    rep = geom.representative_point()
+    return rep.x, rep.y, geom.wkb
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """
+    Lee un bbox ``"min_lon,min_lat,max_lon,max_lat"``.
+    Lanza ``ValueError`` si no tiene 4 números o si está invertido.
+    """
+    parts = [p.strip() for p in (value or "").split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox debe ser 'min_lon,min_lat,max_lon,max_lat'")
+    min_lon, min_lat, max_lon, max_lat = (float(p) for p in parts)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox invertido: min debe ser <= max")
+    return min_lon, min_lat, max_lon, max_lat
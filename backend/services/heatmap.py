@@ -0,0 +1,54 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+TILE_SIZE_PX = 256
+
+
+def cell_size_for_zoom(zoom: int, cell_px: int) -> float:
+    """
+    Tamaño de celda en grados para que cada celda ocupe ~``cell_px`` píxeles
+    en un mapa web (tiles de 256 px) al nivel de ``zoom``.
+    """
+    return 360.0 / (2 ** zoom) * cell_px / TILE_SIZE_PX
+
+
+def aggregate_grid(
+    db: Session,
+    lon_col,
+    lat_col,
+    filters: list,
+    cell: float,
+    max_cells: int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+) -> Tuple[List[list], int]:
+    """
+    Agrega puntos en una grilla regular con ``GROUP BY`` sobre coordenadas
+    ajustadas (``floor(coord / cell)``) directamente en la base de datos.
+    Los filtros (bbox, fechas, categoría) se aplican antes de agregar.
+
+    Retorna ``([[lng_centro, lat_centro, count], ...], total_puntos)`` con las
+    ``max_cells`` celdas más densas primero; ``total_puntos`` cuenta todos los
+    puntos filtrados, también los de celdas que quedaron fuera del límite.
+    """
+    ix = func.floor(lon_col / cell).label("ix")
+    iy = func.floor(lat_col / cell).label("iy")
+    count = func.count().label("count")
+
+    filters = list(filters)
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        filters += [
+            lon_col >= min_lon, lon_col <= max_lon,
+            lat_col >= min_lat, lat_col <= max_lat,
+        ]
+    rows = db.query(ix, iy, count).filter(*filters).group_by(ix, iy).order_by(count.desc()).limit(max_cells).all()
+
+    half = cell / 2
+    cells = [[cx * cell + half, cy * cell + half, n] for cx, cy, n in rows]
+    if len(rows) < max_cells:
+        total = sum(n for _, _, n in rows)  # no se cortó ninguna celda: la suma ya es el total
+    else:
+        total = db.query(func.count(lon_col)).filter(*filters).scalar()
+    return cells, total
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from services.tracking_ingest import store_tracking
+
+# Por nombre de clase (jerarquía PEP 249): el COPY usa el cursor DBAPI directo y sus
+# errores llegan sin envolver (psycopg2/psycopg), el resto envuelto por SQLAlchemy.
+# Errores del dato en sí (para el log; cualquier error no transitorio descarta el chunk)
+PERMANENT_ERRORS = {"IntegrityError", "DataError"}
+# Base caída, failover, pool agotado: los puntos vuelven a la cola y se reintenta con backoff
+TRANSIENT_ERRORS = {"OperationalError", "InterfaceError", "DisconnectionError", "TimeoutError"}
+
+
+def _error_classes(error: Exception) -> set:
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+def _is_permanent(error: Exception) -> bool:
+    return bool(_error_classes(error) & PERMANENT_ERRORS)
+
+
+def _is_transient(error: Exception) -> bool:
+    return bool(_error_classes(error) & TRANSIENT_ERRORS) or getattr(error, "connection_invalidated", False)
+
+
+class TrackingIngestQueue:
+    """
+    Buffer en proceso para el tracking (write-behind).
+
+    Los requests solo validan y encolan; un hilo de fondo drena los puntos de
+    todos los clientes y los escribe en *group commits*: se hace flush cuando el
+    buffer alcanza ``max_batch`` puntos o cuando el chunk más antiguo cumple
+    ``max_delay`` segundos. ``stop()`` drena todo lo pendiente antes de salir.
+
+    Si la base no responde (caída corta, failover) los chunks vuelven al frente
+    de la cola y se reintenta con backoff exponencial hasta ``max_backoff``;
+    mientras tanto el buffer se llena y ``submit`` empieza a rechazar (503).
+    Sólo los errores de conexión se reintentan: un chunk que falla por otra
+    causa (dato rechazado, bug) se descarta y se cuenta en ``dropped_points``.
+    Los contadores diarios de tracking (``stats_daily``) se escriben en la
+    misma transacción de cada group commit: un solo upsert por flush, desde un
+    único hilo, sin contadores que vivan sólo en memoria.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch: int = 5000,
+        max_delay: float = 1.0,
+        max_queue: int = 200_000,
+        max_backoff: float = 30.0,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._chunks: Deque[Tuple[float, List[dict]]] = deque()
+        self._depth = 0
+        self._stopping = False
+        self._stop_deadline = float("inf")
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+        # Métricas
+        self.flush_count = 0
+        self.flushed_points = 0
+        self.dropped_points = 0
+        self.rejected_points = 0
+        self.retried_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+        self.last_queue_wait_seconds = 0.0
+
+    # ---- Productores (requests) ----
+    def submit(self, rows: List[dict]) -> bool:
+        """Encola filas de tracking. Retorna ``False`` si el buffer está lleno."""
+        if not rows:
+            return True
+        with self._cond:
+            if self._depth + len(rows) > self.max_queue:
+                self.rejected_points += len(rows)
+                return False
+            self._chunks.append((time.monotonic(), rows))
+            self._depth += len(rows)
+            self._cond.notify()
+        return True
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- Ciclo de vida ----
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._stop_deadline = float("inf")
+        self._thread = threading.Thread(target=self._run, name="tracking-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """
+        Detiene el hilo de fondo haciendo flush de todo lo que quede en el buffer.
+        Con la base caída se reintenta hasta ``timeout``; lo que quede se reporta perdido.
+        """
+        with self._cond:
+            self._stopping = True
+            self._stop_deadline = time.monotonic() + timeout
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout + 1.0)
+            self._thread = None
+        # Si el hilo nunca arrancó, vaciamos aquí (un intento por grupo: ya no hay tiempo para backoff)
+        while self._chunks:
+            with self._cond:
+                chunks = self._take()
+            if not self._flush(chunks):
+                with self._cond:
+                    lost = self._take_all()
+                self.dropped_points += lost
+                print(f"❌ {lost} puntos de tracking sin escribir al detener (base no disponible)")
+                return
+
+    # ---- Consumidor ----
+    def _take(self) -> List[Tuple[float, List[dict]]]:
+        """Saca chunks completos hasta juntar ``max_batch`` puntos (llamar con el lock tomado)."""
+        taken, total = [], 0
+        while self._chunks and (not taken or total + len(self._chunks[0][1]) <= self.max_batch):
+            arrived, rows = self._chunks.popleft()
+            taken.append((arrived, rows))
+            total += len(rows)
+        self._depth -= total
+        return taken
+
+    def _take_all(self) -> int:
+        total = self._depth
+        self._chunks.clear()
+        self._depth = 0
+        return total
+
+    def _requeue(self, chunks: List[Tuple[float, List[dict]]], error: Exception) -> None:
+        """Devuelve chunks al frente de la cola, en su orden original (aunque excedan ``max_queue``)."""
+        with self._cond:
+            for arrived, rows in reversed(chunks):
+                self._chunks.appendleft((arrived, rows))
+                self._depth += len(rows)
+            self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 0.5)
+            self._retry_at = time.monotonic() + self._backoff
+        self.retried_flushes += 1
+        points = sum(len(rows) for _, rows in chunks)
+        print(f"⚠️ Base no disponible para el tracking ({error}); {points} puntos reencolados, reintento en {self._backoff:.1f}s")
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if now < self._retry_at:
+                        # Backoff tras un fallo de conexión: los submit no lo acortan
+                        if self._stopping and self._retry_at > self._stop_deadline:
+                            return  # stop() reporta lo que quedó
+                        self._cond.wait(self._retry_at - now)
+                        continue
+                    if self._stopping or self._depth >= self.max_batch:
+                        break
+                    if self._chunks:
+                        remaining = self._chunks[0][0] + self.max_delay - now
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                chunks = self._take()
+                stopping = self._stopping
+            if chunks:
+                self._flush(chunks)
+            elif stopping:
+                return
+
+    def _write(self, rows: List[dict]) -> None:
+        db = self.session_factory()
+        try:
+            store_tracking(db, rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, chunks: List[Tuple[float, List[dict]]]) -> bool:
+        """Escribe un grupo de chunks. Retorna ``False`` si la base no respondió y hubo que reencolar."""
+        started = time.monotonic()
+        rows = [r for _, chunk in chunks for r in chunk]
+        ok = True
+        try:
+            self._write(rows)
+            written = len(rows)
+        except Exception as e:
+            written = 0
+            if _is_transient(e):
+                self._requeue(chunks, e)
+                ok = False
+            else:
+                # Un chunk inválido (p.ej. user_id inexistente) no debe tumbar el grupo:
+                # reintentamos chunk por chunk y descartamos solo los que la base rechaza.
+                print(f"⚠️ Group commit de tracking falló ({e}); reintentando por chunk")
+                for i, (_, chunk) in enumerate(chunks):
+                    try:
+                        self._write(chunk)
+                        written += len(chunk)
+                    except Exception as chunk_error:
+                        if _is_transient(chunk_error):
+                            self._requeue(chunks[i:], chunk_error)
+                            ok = False
+                            break
+                        # Dato inválido o bug (ProgrammingError, TypeError...): reintentar
+                        # no lo arregla y bloquearía todo lo que viene detrás
+                        self.dropped_points += len(chunk)
+                        kind = "rechazados por la base" if _is_permanent(chunk_error) else "por error no recuperable"
+                        print(f"❌ Descartando {len(chunk)} puntos de tracking {kind}: {chunk_error!r}")
+        if ok:
+            self._backoff = 0.0
+
+        elapsed = time.monotonic() - started
+        self.flush_count += 1
+        self.flushed_points += written
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.total_flush_seconds += elapsed
+        self.last_queue_wait_seconds = started - chunks[0][0]
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._depth,
+            "max_queue": self.max_queue,
+            "flush_count": self.flush_count,
+            "flushed_points": self.flushed_points,
+            "dropped_points": self.dropped_points,
+            "rejected_points": self.rejected_points,
+            "retried_flushes": self.retried_flushes,
+            "retry_backoff_seconds": self._backoff,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / self.flush_count if self.flush_count else 0.0,
+            "last_queue_wait_seconds": self.last_queue_wait_seconds,
+        }
+
+
+def _build_queue() -> TrackingIngestQueue:
+    from database import SessionLocal
+
+    return TrackingIngestQueue(
+        SessionLocal,
+        max_batch=int(os.getenv("TRACKING_FLUSH_MAX_POINTS", "5000")),
+        max_delay=float(os.getenv("TRACKING_FLUSH_INTERVAL_SECONDS", "1.0")),
+        max_queue=int(os.getenv("TRACKING_QUEUE_MAX_POINTS", "200000")),
+        max_backoff=float(os.getenv("TRACKING_RETRY_MAX_BACKOFF_SECONDS", "30")),
+    )
+
+
+WRITE_BEHIND_ENABLED = os.getenv("TRACKING_WRITE_BEHIND", "1") == "1"
+tracking_queue = _build_queue()
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class LoopLagMonitor:
+    """
+    Mide cuánto se atrasa el event loop: una tarea duerme ``interval`` segundos
+    y registra cuánto tardó de más en despertar. Si un handler bloquea el loop
+    (E/S síncrona, CPU), el atraso aparece aquí. Guarda las últimas ``window``
+    muestras.
+    """
+
+    def __init__(self, interval: float = 0.05, window: int = 1200):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - t0 - self.interval)
+            self._samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0}
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+
+        return {
+            "samples": len(samples),
+            "window_seconds": round(len(samples) * self.interval, 1),
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": pct(50),
+            "p99_ms": pct(99),
+            "window_max_ms": samples[-1] * 1000,
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,263 @@
+"""
+Métricas de requests y de base de datos en formato de texto Prometheus
+(``GET /metrics``), sin dependencias externas.
+
+- ``MetricsMiddleware`` (ASGI puro) registra por ruta (el template, p.ej.
+  ``/users/{user_id}/assignments``, así la cardinalidad es acotada) el
+  histograma de latencia, el tamaño de la respuesta y los requests por status,
+  más los requests en curso.
+- Los eventos ``before/after_cursor_execute`` de SQLAlchemy cuentan queries y
+  tiempo de DB. Se atribuyen al request en curso con un ``ContextVar`` (que
+  Starlette copia a los hilos de las rutas síncronas y al streaming); lo que
+  corre fuera de un request (ingesta write-behind, fotos, jobs) va a las
+  métricas ``background``. El COPY de tracking usa el cursor DBAPI directo y
+  no pasa por estos eventos.
+- ``register_stats`` expone como gauges/counters el ``stats()`` de componentes
+  en proceso (cola de ingesta, caché de ``/results``, pool de fotos), leído
+  recién al renderizar.
+
+El costo por request es un par de ``perf_counter`` y unos incrementos bajo un
+lock; el render sólo ocurre cuando Prometheus consulta ``/metrics``.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """Histograma de buckets fijos (no es thread-safe: lo protege el lock de ``Metrics``)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> List[str]:
+        out = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            out.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+class RouteMetrics:
+    __slots__ = ("statuses", "latency", "size", "db_queries", "db_seconds", "queries_per_request")
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.queries_per_request = Histogram(QUERY_BUCKETS)
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+class RequestDB:
+    """Acumulador de queries del request en curso."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestDB]] = ContextVar("metrics_request_db", default=None)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.background_queries = 0
+        self.background_db_seconds = 0.0
+        self._instrumented = False
+        self._stats: List[Tuple[str, Callable[[], dict], Dict[str, str], Dict[str, str]]] = []
+
+    # ---- Componentes ----
+    def register_stats(
+        self,
+        prefix: str,
+        stats_fn: Callable[[], dict],
+        gauges: Dict[str, str] = None,
+        counters: Dict[str, str] = None,
+    ) -> None:
+        """
+        Publica claves de ``stats_fn()`` como ``<prefix>_<clave>`` (gauges) y
+        ``<prefix>_<clave>_total`` (counters); el valor es la descripción
+        (``# HELP``). Las claves ausentes o ``None`` se omiten.
+        """
+        self._stats.append((prefix, stats_fn, gauges or {}, counters or {}))
+
+    def _render_stats(self) -> List[str]:
+        lines = []
+        for prefix, stats_fn, gauges, counters in self._stats:
+            try:
+                values = stats_fn()
+            except Exception as e:
+                print(f"⚠️ Métricas de {prefix} no disponibles: {e}")
+                continue
+            for keys, kind, suffix in ((gauges, "gauge", ""), (counters, "counter", "_total")):
+                for key, help_text in keys.items():
+                    value = values.get(key)
+                    if value is None:
+                        continue
+                    name = f"{prefix}_{key}{suffix}"
+                    lines.append(f"# HELP {name} {help_text}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{name} {float(value):g}")
+        return lines
+
+    # ---- SQLAlchemy ----
+    def instrument_engines(self) -> None:
+        """Escucha a nivel de clase ``Engine``: cubre el engine síncrono, el ``sync_engine`` del async y los de los jobs."""
+        if self._instrumented:
+            return
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        self._instrumented = True
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        current = _current_request.get()
+        if current is not None:
+            current.queries += 1
+            current.seconds += elapsed
+        else:
+            with self._lock:
+                self.background_queries += 1
+                self.background_db_seconds += elapsed
+
+    # ---- Requests ----
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int, db: RequestDB) -> None:
+        key = (method, route)
+        with self._lock:
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = RouteMetrics()
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.latency.observe(seconds)
+            metrics.size.observe(size)
+            metrics.queries_per_request.observe(db.queries)
+            metrics.db_queries += db.queries
+            metrics.db_seconds += db.seconds
+
+    def render(self) -> str:
+        """Exposición en formato de texto Prometheus 0.0.4."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                "# HELP http_requests_in_flight Requests HTTP en curso.",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Requests HTTP por ruta y status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route), m in routes:
+                for status, n in sorted(m.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {n}')
+
+            sections = (
+                ("http_request_duration_seconds", "Latencia de los requests HTTP (hasta el último byte).", "latency"),
+                ("http_response_size_bytes", "Tamaño del cuerpo de las respuestas.", "size"),
+                ("db_queries_per_request", "Queries SQL ejecutadas por request.", "queries_per_request"),
+            )
+            for name, help_text, attr in sections:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), m in routes:
+                    lines.extend(getattr(m, attr).lines(name, f'method="{method}",route="{_label(route)}"'))
+
+            lines.append("# HELP db_queries_total Queries SQL ejecutadas, por ruta (background: fuera de un request).")
+            lines.append("# TYPE db_queries_total counter")
+            for (method, route), m in routes:
+                lines.append(f'db_queries_total{{method="{method}",route="{_label(route)}"}} {m.db_queries}')
+            lines.append(f'db_queries_total{{method="",route="background"}} {self.background_queries}')
+            lines.append("# HELP db_query_seconds_total Tiempo total en queries SQL, por ruta.")
+            lines.append("# TYPE db_query_seconds_total counter")
+            for (method, route), m in routes:
+                lines.append(f'db_query_seconds_total{{method="{method}",route="{_label(route)}"}} {m.db_seconds:.6f}')
+            lines.append(f'db_query_seconds_total{{method="",route="background"}} {self.background_db_seconds:.6f}')
+        # Fuera del lock: los stats() toman sus propios locks
+        lines.extend(self._render_stats())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia hasta el último byte enviado (incluye respuestas en streaming)."""
+
+    def __init__(self, app, registry: "Metrics" = None):
+        self.app = app
+        self.metrics = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        db = RequestDB()
+        token = _current_request.set(db)
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        # in_flight sólo se toca desde el event loop: no necesita lock
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            self.metrics.in_flight -= 1
+            _current_request.reset(token)
+            # El router deja la ruta resuelta en el scope; sin ella (404) no usamos el path crudo
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            self.metrics.observe(scope["method"], route, status, time.perf_counter() - started, size, db)
+
+
+metrics = Metrics()
@@ -0,0 +1,116 @@
+"""
+Encoder mínimo de Mapbox Vector Tiles (spec v2) para capas de puntos, sin
+dependencias: protobuf escrito a mano (varints + campos length-delimited).
+"""
+import math
+import struct
+from typing import Dict, Iterable, List, Tuple
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+DEFAULT_EXTENT = 4096
+
+_GEOM_POINT = 1
+_CMD_MOVE_TO_ONE = (1 & 0x7) | (1 << 3)
+
+
+# ---- Tile math (Web Mercator, esquema XYZ) ----
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """``(min_lon, min_lat, max_lon, max_lat)`` del tile."""
+    n = 2 ** z
+
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def project(lon: float, lat: float, z: int, x: int, y: int, extent: int = DEFAULT_EXTENT) -> Tuple[int, int]:
+    """lon/lat -> coordenadas enteras dentro del tile (0..extent)."""
+    n = 2 ** z
+    lat_rad = math.radians(max(min(lat, 85.0511), -85.0511))
+    wx = (lon + 180.0) / 360.0 * n
+    wy = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return int(round((wx - x) * extent)), int(round((wy - y) * extent))
+
+
+# ---- Protobuf ----
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _key(field, 0) + _varint(value)
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _value(v) -> bytes:
+    if isinstance(v, bool):
+        return _uint_field(7, int(v))
+    if isinstance(v, int):
+        return _uint_field(4, v & 0xFFFFFFFFFFFFFFFF) if v < 0 else _uint_field(5, v)
+    if isinstance(v, float):
+        return _key(3, 1) + struct.pack("<d", v)
+    return _bytes_field(1, str(v).encode())
+
+
+def encode_layer(
+    name: str,
+    features: Iterable[Tuple[int, int, int, Dict]],
+    extent: int = DEFAULT_EXTENT,
+) -> bytes:
+    """
+    Codifica una capa de puntos. ``features`` son tuplas
+    ``(id, px, py, properties)`` con coordenadas ya proyectadas al tile.
+    """
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, object], int] = {}
+    encoded: List[bytes] = []
+
+    for fid, px, py, props in features:
+        tags = []
+        for k, v in props.items():
+            if v is None:
+                continue
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v), v), len(values)))
+        body = _uint_field(1, fid) if fid is not None and fid >= 0 else b""
+        if tags:
+            body += _packed(2, tags)
+        body += _uint_field(3, _GEOM_POINT)
+        body += _packed(4, (_CMD_MOVE_TO_ONE, _zigzag(px), _zigzag(py)))
+        encoded.append(_bytes_field(2, body))
+
+    layer = _uint_field(15, 2) + _bytes_field(1, name.encode())
+    layer += b"".join(encoded)
+    layer += b"".join(_bytes_field(3, k.encode()) for k in keys)
+    layer += b"".join(_bytes_field(4, _value(v)) for _, v in values)
+    layer += _uint_field(5, extent)
+    return layer
+
+
+def encode_tile(layers: Iterable[bytes]) -> bytes:
+    """Une capas ya codificadas en un tile."""
+    return b"".join(_bytes_field(3, layer) for layer in layers)
@@ -0,0 +1,332 @@
+import fcntl
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models import SurveyReport
+from services import data_version
+from services.storage import SPOOL_DIR, SPOOL_OWNER, get_storage, photo_key, spool_name
+
+# Estados de ``SurveyReport.photo_status``
+PENDING = "pending"
+UPLOADED = "uploaded"
+FAILED = "failed"
+
+# ``<survey_id>-<user_id>.<dueño>.<ext>`` (sin dueño: archivos de versiones anteriores)
+_SPOOL_NAME = re.compile(r"^(\d+)-(\d+)(?:\.([0-9a-f]{12}))?(\.\w+)$")
+
+
+def _owner_lock_path(owner: str) -> str:
+    return os.path.join(SPOOL_DIR, f".owner-{owner}.lock")
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Un dueño vive mientras su proceso tenga tomado (flock) su archivo de lock."""
+    if owner is None:
+        return False
+    try:
+        fd = os.open(_owner_lock_path(owner), os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+@dataclass
+class PhotoJob:
+    survey_id: int
+    user_id: int
+    path: str
+    attempts: int = 0
+    key: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class PhotoUploadPool:
+    """
+    Pool acotado de hilos que sube las fotos de encuestas fuera del request.
+
+    ``create_survey`` guarda la encuesta con ``photo_status="pending"`` y encola
+    el archivo del spool; un worker lo sube al ``StorageBackend``, genera la
+    miniatura, escribe ``photo_url``/``photo_thumbnail_url`` y marca ``uploaded``. Los errores se reintentan con backoff exponencial hasta
+    ``max_attempts`` y luego quedan como ``failed`` (con ``photo_error``).
+    Los archivos siguen en el spool hasta subirse (también los ``failed``): al
+    arrancar se re-encolan los que quedaron de una ejecución anterior. Cada
+    archivo lleva en el nombre su proceso dueño, que mantiene un ``flock``
+    mientras corre; con varios workers sobre el mismo spool, sólo se recuperan
+    archivos de dueños muertos y cada uno se reclama con un ``rename`` atómico,
+    así que un solo worker lo sube.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        storage_factory: Callable = get_storage,
+        workers: int = 4,
+        max_queue: int = 200,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+    ):
+        self.session_factory = session_factory
+        self.storage_factory = storage_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+        self._queue: "queue.Queue[PhotoJob]" = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._metrics_lock = threading.Lock()
+        self._owner_fd: Optional[int] = None
+
+        # Métricas
+        self.in_progress = 0
+        self.attempts = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+        self.thumbnail_errors = 0
+        self.total_thumbnail_seconds = 0.0
+        self.total_upload_seconds = 0.0
+        self.max_upload_seconds = 0.0
+        self.last_queue_wait_seconds = 0.0
+
+    # ---- Productores (requests) ----
+    def has_capacity(self) -> bool:
+        return not self._queue.full()
+
+    def submit(self, job: PhotoJob) -> bool:
+        """Encola una subida. Retorna ``False`` si la cola está llena."""
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            with self._metrics_lock:
+                self.rejected += 1
+            return False
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    # ---- Ciclo de vida ----
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"photo-upload-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+        self._hold_owner_lock()
+        self._recover_spool()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Detiene los workers sin drenar la cola: lo pendiente sigue en el spool
+        (``photo_status="pending"``) y se retoma al próximo arranque.
+        """
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        if self._owner_fd is not None:
+            # Sin lock, el próximo worker que arranque reclama lo que quedó
+            try:
+                os.remove(_owner_lock_path(SPOOL_OWNER))
+            except OSError:
+                pass
+            os.close(self._owner_fd)
+            self._owner_fd = None
+
+    def _hold_owner_lock(self) -> None:
+        if self._owner_fd is not None:
+            return
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        self._owner_fd = os.open(_owner_lock_path(SPOOL_OWNER), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._owner_fd, fcntl.LOCK_EX)
+
+    def _recover_spool(self) -> None:
+        if not os.path.isdir(SPOOL_DIR):
+            return
+        recovered = 0
+        alive = {SPOOL_OWNER: True}
+        for name in sorted(os.listdir(SPOOL_DIR)):
+            match = _SPOOL_NAME.match(name)
+            if not match:
+                continue
+            survey_id, user_id, owner, ext = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+            if owner not in alive:
+                alive[owner] = _owner_alive(owner)
+            if alive[owner]:
+                continue  # lo sube (o ya lo intentó) el worker que lo recibió
+            path = os.path.join(SPOOL_DIR, spool_name(survey_id, user_id, ext))
+            try:
+                os.rename(os.path.join(SPOOL_DIR, name), path)
+            except FileNotFoundError:
+                continue  # otro worker lo reclamó primero
+            if self.submit(PhotoJob(survey_id, user_id, path)):
+                recovered += 1
+        for owner, is_alive in alive.items():
+            if owner and not is_alive:
+                try:
+                    os.remove(_owner_lock_path(owner))
+                except OSError:
+                    pass
+        if recovered:
+            print(f"📷 {recovered} fotos pendientes re-encoladas desde el spool")
+
+    # ---- Workers ----
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job: PhotoJob) -> None:
+        started = time.monotonic()
+        with self._metrics_lock:
+            self.in_progress += 1
+            self.attempts += 1
+            self.last_queue_wait_seconds = started - job.enqueued_at
+        try:
+            storage = self.storage_factory()
+            job.key = job.key or photo_key(job.user_id)
+            url = storage.put(job.path, job.key)
+        except Exception as e:
+            job.attempts += 1
+            if job.attempts < self.max_attempts:
+                delay = self.retry_backoff * 2 ** (job.attempts - 1)
+                print(f"⚠️ Subida de foto de encuesta {job.survey_id} falló ({e}); reintento {job.attempts} en {delay:.1f}s")
+                with self._metrics_lock:
+                    self.retries += 1
+                self._retry_later(job, delay)
+            else:
+                print(f"❌ Foto de encuesta {job.survey_id} descartada tras {job.attempts} intentos: {e}")
+                self._finish(job, FAILED, error=str(e)[:500])
+                with self._metrics_lock:
+                    self.failed += 1
+            return
+        finally:
+            elapsed = time.monotonic() - started
+            with self._metrics_lock:
+                self.in_progress -= 1
+                self.total_upload_seconds += elapsed
+                self.max_upload_seconds = max(self.max_upload_seconds, elapsed)
+
+        thumbnail_url = self._thumbnail(storage, job, url)
+        self._finish(job, UPLOADED, url=url, thumbnail_url=thumbnail_url)
+        with self._metrics_lock:
+            self.uploaded += 1
+
+    def _thumbnail(self, storage, job: PhotoJob, url: str) -> Optional[str]:
+        """Sin miniatura el dashboard usa la foto completa: un error aquí no falla la subida."""
+        started = time.monotonic()
+        try:
+            return storage.thumbnail(job.path, job.key, url)
+        except Exception as e:
+            print(f"⚠️ No se pudo generar la miniatura de la encuesta {job.survey_id}: {e}")
+            with self._metrics_lock:
+                self.thumbnail_errors += 1
+            return None
+        finally:
+            with self._metrics_lock:
+                self.total_thumbnail_seconds += time.monotonic() - started
+
+    def _retry_later(self, job: PhotoJob, delay: float) -> None:
+        def requeue():
+            if self._stopping.is_set():
+                return  # queda en el spool para el próximo arranque
+            job.enqueued_at = time.monotonic()
+            self._queue.put(job)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def _finish(
+        self,
+        job: PhotoJob,
+        status: str,
+        url: Optional[str] = None,
+        thumbnail_url: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(SurveyReport)
+                .where(SurveyReport.id == job.survey_id)
+                .values(photo_url=url, photo_thumbnail_url=thumbnail_url, photo_status=status, photo_error=error)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # El archivo se conserva: se reintenta completo al próximo arranque
+            print(f"❌ No se pudo actualizar la encuesta {job.survey_id}: {e}")
+            return
+        finally:
+            db.close()
+        if status != UPLOADED:
+            return  # ``failed``: el archivo queda en el spool y se reintenta al próximo arranque
+        data_version.bump(data_version.SURVEYS)  # photo_url aparece en /results
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "storage": self.storage_factory().name,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "in_progress": self.in_progress,
+            "attempts": self.attempts,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "avg_upload_seconds": self.total_upload_seconds / self.attempts if self.attempts else 0.0,
+            "max_upload_seconds": self.max_upload_seconds,
+            "thumbnail_errors": self.thumbnail_errors,
+            "avg_thumbnail_seconds": self.total_thumbnail_seconds / self.uploaded if self.uploaded else 0.0,
+            "last_queue_wait_seconds": self.last_queue_wait_seconds,
+        }
+
+
+def _build_pool() -> PhotoUploadPool:
+    from database import SessionLocal
+
+    return PhotoUploadPool(
+        SessionLocal,
+        workers=int(os.getenv("PHOTO_UPLOAD_WORKERS", "4")),
+        max_queue=int(os.getenv("PHOTO_UPLOAD_MAX_QUEUE", "200")),
+        max_attempts=int(os.getenv("PHOTO_UPLOAD_MAX_ATTEMPTS", "3")),
+        retry_backoff=float(os.getenv("PHOTO_UPLOAD_RETRY_BACKOFF_SECONDS", "2")),
+    )
+
+
+photo_pool = _build_pool()
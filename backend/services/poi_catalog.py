@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import POI, Profile
+
+
+@dataclass
+class ProfileEntry:
+    id: int
+    name: str
+    rules: Dict[str, int]
+
+
+# Celda (grados) de la estratificación espacial usada por el muestreo "spread"
+SPREAD_CELL_DEG = float(os.getenv("ASSIGNMENT_SPREAD_CELL_DEG", "0.005"))
+
+
+@dataclass
+class CatalogSnapshot:
+    """Foto inmutable del catálogo: ids de POIs por categoría + perfiles."""
+    fingerprint: Tuple
+    # Arreglos globales alineados (ordenados por id)
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    lon: np.ndarray = field(default_factory=lambda: np.empty(0))
+    lat: np.ndarray = field(default_factory=lambda: np.empty(0))
+    categories: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=object))
+    names: List[str] = field(default_factory=list)
+    ids_by_category: Dict[str, np.ndarray] = field(default_factory=dict)
+    # Índice espacial precalculado: por categoría, ids agrupados por celda de grilla
+    cells_by_category: Dict[str, List[np.ndarray]] = field(default_factory=dict)
+    profiles_by_name: Dict[str, ProfileEntry] = field(default_factory=dict)
+    profile_names: Dict[int, str] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    @property
+    def version(self) -> str:
+        return "-".join(str(p) for p in self.fingerprint)
+
+    def sample(self, category: str, k: int, rng: random.Random = random) -> List[int]:
+        """``k`` POIs distintos de ``category`` al azar, en O(k) (sin copiar la categoría)."""
+        ids = self.ids_by_category.get(category)
+        if ids is None or k <= 0:
+            return []
+        k = min(k, len(ids))
+        return [int(ids[i]) for i in rng.sample(range(len(ids)), k)]
+
+    def sample_spread(self, category: str, k: int, rng: random.Random = random) -> List[int]:
+        """
+        ``k`` POIs repartidos en el espacio: se eligen celdas distintas al azar y
+        un POI al azar dentro de cada una; si hay menos celdas que ``k`` se vuelve
+        a recorrer las celdas (sin repetir POIs).
+        """
+        cells = self.cells_by_category.get(category)
+        if not cells or k <= 0:
+            return []
+        k = min(k, len(self.ids_by_category[category]))
+        # Orden aleatorio de celdas: si k < #celdas basta con k celdas distintas
+        order = rng.sample(range(len(cells)), min(k, len(cells)))
+        used: Dict[int, int] = {}
+        taken = set()
+        picked: List[int] = []
+        while len(picked) < k:
+            for c in order:
+                cell = cells[c]
+                if used.get(c, 0) == len(cell):
+                    continue
+                # Las celdas son chicas: rechazo simple de POIs ya tomados
+                poi_id = int(cell[rng.randrange(len(cell))])
+                while poi_id in taken:
+                    poi_id = int(cell[rng.randrange(len(cell))])
+                taken.add(poi_id)
+                used[c] = used.get(c, 0) + 1
+                picked.append(poi_id)
+                if len(picked) == k:
+                    break
+        return picked
+
+
+def _fingerprint(db: Session) -> Tuple:
+    """
+    Consulta barata que cambia cuando ``populate_pois.py``/``populate_profiles.py``
+    escriben: ``max(updated_at)`` cubre los POIs nuevos y los actualizados por el
+    upsert (que no cambian ni la cantidad ni los ids), la cantidad los borrados.
+    """
+    pois = db.query(func.count(POI.id), func.max(POI.id), func.max(POI.updated_at)).one()
+    profiles = db.query(Profile.id, Profile.name, Profile.rules).order_by(Profile.id).all()
+    return (
+        pois[0],
+        pois[1] or 0,
+        int(pois[2].timestamp() * 1_000_000) if pois[2] else 0,
+        # Digest estable entre procesos (lo usan también los ETags)
+        hashlib.sha1(
+            json.dumps([[p.id, p.name, p.rules or {}] for p in profiles], sort_keys=True).encode()
+        ).hexdigest()[:12],
+    )
+
+
+def _grid_cells(ids: np.ndarray, lon: np.ndarray, lat: np.ndarray) -> List[np.ndarray]:
+    """Agrupa ids por celda de ``SPREAD_CELL_DEG`` grados (vectorizado)."""
+    keys = np.floor(lon / SPREAD_CELL_DEG).astype(np.int64) * 1_000_003 + np.floor(lat / SPREAD_CELL_DEG).astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    _, starts = np.unique(keys[order], return_index=True)
+    return np.split(ids[order], starts[1:])
+
+
+def _load(db: Session, fingerprint: Tuple) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(fingerprint=fingerprint, loaded_at=time.time())
+
+    rows = db.query(POI.id, POI.name, POI.category, POI.lon, POI.lat).order_by(POI.id).all()
+    snapshot.ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    snapshot.names = [r[1] for r in rows]
+    snapshot.categories = np.array([r[2] for r in rows], dtype=object)
+    snapshot.lon = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+    snapshot.lat = np.fromiter((r[4] for r in rows), dtype=np.float64, count=len(rows))
+
+    for category in dict.fromkeys(snapshot.categories):
+        mask = snapshot.categories == category
+        ids = snapshot.ids[mask]
+        snapshot.ids_by_category[category] = ids
+        snapshot.cells_by_category[category] = _grid_cells(ids, snapshot.lon[mask], snapshot.lat[mask])
+
+    for p in db.query(Profile.id, Profile.name, Profile.rules):
+        entry = ProfileEntry(id=p.id, name=p.name, rules=dict(p.rules or {}))
+        snapshot.profiles_by_name[p.name] = entry
+        snapshot.profile_names[p.id] = p.name
+    return snapshot
+
+
+class PoiCatalog:
+    """
+    Catálogo de POIs y perfiles en memoria, compartido por todo el proceso.
+
+    Se carga una vez y se revisa como máximo cada ``check_interval`` segundos
+    con una consulta de *fingerprint*; si los scripts de población cambiaron
+    las tablas, se recarga completo. ``refresh()`` fuerza la recarga.
+    """
+
+    def __init__(self, check_interval: float = 30.0):
+        self.check_interval = check_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+            fingerprint = _fingerprint(db)
+            if self._snapshot is None or self._snapshot.fingerprint != fingerprint:
+                self._set(_load(db, fingerprint))
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def refresh(self, db: Session) -> CatalogSnapshot:
+        with self._lock:
+            self._set(_load(db, _fingerprint(db)))
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    # --- Handlers async ---
+    # ``get``/``refresh`` toman un lock de hilos: llamarlos desde el event loop con
+    # una sesión async bloquearía el loop (y a la sesión que tiene el lock). Las
+    # variantes async usan el snapshot vigente o recargan en un hilo con sesión propia.
+
+    async def get_async(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        return await asyncio.to_thread(self._with_session, self.get)
+
+    async def refresh_async(self) -> CatalogSnapshot:
+        return await asyncio.to_thread(self._with_session, self.refresh)
+
+    @staticmethod
+    def _with_session(fn) -> CatalogSnapshot:
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    def _set(self, snapshot: CatalogSnapshot) -> None:
+        # Los índices derivados (spatial_index) se reconstruyen al ver otra ``version``
+        self._snapshot = snapshot
+
+
+poi_catalog = PoiCatalog(check_interval=float(os.getenv("POI_CATALOG_CHECK_SECONDS", "30")))
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import POI
+from services.geojson import dumps
+from services.geometry import WKB_POINT_TYPE, point_wkt, wkb_geometry_type
+from services.poi_catalog import CatalogSnapshot
+
+
+@dataclass
+class PoiListing:
+    """
+    Listado de POIs serializado una sola vez por versión del catálogo: cada
+    POI ya codificado como JSON (``POIOut``) más el payload completo listo
+    para enviar. Los filtros se resuelven con máscaras sobre arreglos.
+    """
+    version: str
+    ids: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+    categories: np.ndarray
+    items: List[bytes]
+    full_payload: bytes
+
+    def etag(self, *params) -> str:
+        """ETag fuerte: versión del catálogo (+ parámetros si la respuesta está filtrada)."""
+        if not any(p is not None for p in params):
+            return f'"pois-{self.version}"'
+        digest = hashlib.sha1(repr((self.version,) + params).encode()).hexdigest()[:16]
+        return f'"pois-{digest}"'
+
+    def select(
+        self,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        category: Optional[str] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Tuple[bytes, Optional[int]]:
+        """
+        Página de POIs con paginación por keyset (``id > after_id``, orden por id).
+        Retorna ``(payload JSON, after_id de la página siguiente o None)``.
+        """
+        start = int(np.searchsorted(self.ids, after_id, side="right")) if after_id is not None else 0
+        mask = np.ones(self.ids.size - start, dtype=bool)
+        if category is not None:
+            mask &= self.categories[start:] == category
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            lon, lat = self.lon[start:], self.lat[start:]
+            mask &= (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+
+        positions = np.flatnonzero(mask) + start
+        next_after = None
+        if limit is not None and positions.size > limit:
+            positions = positions[:limit]
+            next_after = int(self.ids[positions[-1]])
+        payload = b"[" + b",".join(self.items[i] for i in positions.tolist()) + b"]"
+        return payload, next_after
+
+
+_lock = threading.Lock()
+_current: Optional[PoiListing] = None
+
+
+def _build(db: Session, snapshot: CatalogSnapshot) -> PoiListing:
+    rows = db.query(POI.id, POI.name, POI.category, POI.lon, POI.lat, POI.wkb_geometry).order_by(POI.id).all()
+    items = []
+    for poi_id, name, category, lon, lat, wkb in rows:
+        if wkb_geometry_type(wkb) == WKB_POINT_TYPE:
+            wkt_geometry = point_wkt(lon, lat)
+        else:  # POIs poligonales: shapely solo aquí, una vez por versión
+            from shapely import wkb as shapely_wkb
+            wkt_geometry = shapely_wkb.loads(wkb).wkt
+        items.append(dumps({"id": poi_id, "name": name, "category": category, "wkt_geometry": wkt_geometry}))
+
+    return PoiListing(
+        version=snapshot.version,
+        ids=np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+        lon=np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows)),
+        lat=np.fromiter((r[4] for r in rows), dtype=np.float64, count=len(rows)),
+        categories=np.array([r[2] for r in rows], dtype=object),
+        items=items,
+        full_payload=b"[" + b",".join(items) + b"]",
+    )
+
+
+def get_listing(db: Session, snapshot: CatalogSnapshot) -> PoiListing:
+    """Listado precalculado para la versión actual del catálogo (se reconstruye al cambiar)."""
+    global _current
+    listing = _current
+    if listing is not None and listing.version == snapshot.version:
+        return listing
+    with _lock:
+        if _current is None or _current.version != snapshot.version:
+            _current = _build(db, snapshot)
+        return _current
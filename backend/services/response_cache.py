@@ -0,0 +1,192 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from services import data_version
+from services.geojson import dumps
+from services.tile_cache import TileCache
+
+
+class MemoryBackend:
+    """LRU en proceso acotado por bytes (por defecto; válido con un solo worker)."""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int):
+        self._lru = TileCache(max_bytes=max_bytes)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._lru.get(key)
+
+    def put(self, key: str, body: bytes) -> None:
+        self._lru.put(key, body)
+
+    def stats(self) -> dict:
+        s = self._lru.stats()
+        return {"entries": s["entries"], "bytes": s["bytes"], "max_bytes": s["max_bytes"]}
+
+
+class RedisBackend:
+    """
+    Caché compartido entre workers. La memoria la acota redis (``maxmemory`` +
+    ``allkeys-lru``); además cada entrada expira a los ``ttl`` segundos para no
+    dejar generaciones viejas ocupando espacio.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int):
+        import redis  # opcional: sólo se necesita con RESULTS_CACHE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(key)
+        except Exception as e:
+            print(f"⚠️ Caché redis no disponible: {e}")
+            return None
+
+    def put(self, key: str, body: bytes) -> None:
+        try:
+            self.client.set(key, body, ex=self.ttl)
+        except Exception as e:
+            print(f"⚠️ Caché redis no disponible: {e}")
+
+    def stats(self) -> dict:
+        return {"ttl_seconds": self.ttl}
+
+
+class ResponseCache:
+    """
+    Caché de respuestas de ``/results``. La clave es ruta + query params +
+    generación de las tablas de las que depende el endpoint
+    (``services.data_version``): cada escritura sube la generación y las
+    entradas anteriores simplemente dejan de pedirse (salen por LRU/TTL), sin
+    invalidación explícita.
+    """
+
+    def __init__(self, backend=None, max_entry_bytes: int = 8 * 1024 * 1024):
+        self.backend = backend
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, endpoint: str, outcome: str) -> None:
+        with self._lock:
+            m = self._metrics.setdefault(endpoint, {"hits": 0, "misses": 0, "uncached": 0})
+            m[outcome] += 1
+
+    def _key(self, request: Request, tables: Sequence[str]) -> str:
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+        generations = ".".join(map(str, data_version.snapshot(*tables)))
+        return f"results:{request.url.path}:{digest}:{generations}"
+
+    def json_response(self, request: Request, tables: Sequence[str], compute: Callable[[], object]) -> Response:
+        """Respuesta JSON de ``compute()``, servida desde el caché si los datos no cambiaron."""
+        endpoint = request.url.path
+        if self.backend is None:
+            return Response(dumps(compute()), media_type="application/json")
+
+        key = self._key(request, tables)
+        body = self.backend.get(key)
+        if body is not None:
+            self._count(endpoint, "hits")
+            return Response(body, media_type="application/json", headers={"X-Cache": "HIT"})
+
+        self._count(endpoint, "misses")
+        body = dumps(compute())
+        if len(body) <= self.max_entry_bytes:
+            self.backend.put(key, body)
+        return Response(body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+    def streaming_response(
+        self,
+        request: Request,
+        tables: Sequence[str],
+        produce: Callable[[], Iterable[bytes]],
+        media_type: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """
+        Como ``json_response`` para respuestas en streaming: en un miss los
+        chunks se envían a medida que se generan y se copian al caché sólo
+        mientras el total no supere ``max_entry_bytes``, así que las respuestas
+        grandes siguen en memoria constante (y no se cachean).
+        """
+        endpoint = request.url.path
+        headers = dict(headers or {})
+        if self.backend is None:
+            return StreamingResponse(produce(), media_type=media_type, headers=headers)
+
+        key = self._key(request, tables)
+        body = self.backend.get(key)
+        if body is not None:
+            self._count(endpoint, "hits")
+            return Response(body, media_type=media_type, headers={**headers, "X-Cache": "HIT"})
+
+        self._count(endpoint, "misses")
+        return StreamingResponse(
+            self._tee(endpoint, key, produce()),
+            media_type=media_type,
+            headers={**headers, "X-Cache": "MISS"},
+        )
+
+    def _tee(self, endpoint: str, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        buffered = []
+        size = 0
+        for chunk in chunks:
+            if buffered is not None:
+                size += len(chunk)
+                if size <= self.max_entry_bytes:
+                    buffered.append(chunk)
+                else:
+                    buffered = None
+                    self._count(endpoint, "uncached")
+            yield chunk
+        # Sólo llega aquí si el cliente recibió la respuesta completa
+        if buffered is not None:
+            self.backend.put(key, b"".join(buffered))
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {k: dict(v) for k, v in self._metrics.items()}
+        hits = sum(m["hits"] for m in endpoints.values())
+        misses = sum(m["misses"] for m in endpoints.values())
+        return {
+            "backend": self.backend.name if self.backend else None,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "max_entry_bytes": self.max_entry_bytes,
+            "endpoints": endpoints,
+            **(self.backend.stats() if self.backend else {}),
+        }
+
+
+def _build_cache() -> ResponseCache:
+    kind = os.getenv("RESULTS_CACHE_BACKEND", "memory").lower()
+    max_entry = int(os.getenv("RESULTS_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))
+    if kind in ("", "none", "off", "0"):
+        return ResponseCache(None, max_entry)
+    if kind == "redis":
+        backend = RedisBackend(
+            os.getenv("RESULTS_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+            ttl=int(os.getenv("RESULTS_CACHE_TTL_SECONDS", "3600")),
+        )
+        # Generaciones compartidas: una escritura en cualquier worker invalida a todos
+        data_version.use_shared(backend.client)
+        return ResponseCache(backend, max_entry)
+    return ResponseCache(
+        MemoryBackend(int(os.getenv("RESULTS_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))),
+        max_entry,
+    )
+
+
+results_cache = _build_cache()
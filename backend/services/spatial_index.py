@@ -0,0 +1,129 @@
+import math
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:  # sin dependencia de la DB para usar GridIndex suelto
+    from services.poi_catalog import CatalogSnapshot
+
+_M_PER_DEG_LAT = 110_540.0
+_M_PER_DEG_LON = 111_320.0
+
+
+class GridIndex:
+    """
+    Índice espacial de grilla sobre puntos fijos (POIs). Las coordenadas se
+    proyectan a metros con una aproximación equirectangular centrada en el
+    catálogo (suficiente a escala de ciudad) y se ordenan por celda; cada fila
+    de celdas de una consulta es un rango contiguo que se encuentra con
+    ``searchsorted``, así que una consulta cuesta O(filas + candidatos).
+    """
+
+    def __init__(self, ids: np.ndarray, lon: np.ndarray, lat: np.ndarray, cell_m: float = 250.0):
+        self.cell_m = cell_m
+        self.lat0 = float(lat.mean()) if lat.size else 0.0
+        self.lon0 = float(lon.mean()) if lon.size else 0.0
+        self._kx = _M_PER_DEG_LON * math.cos(math.radians(self.lat0))
+
+        x, y = self._project(lon, lat)
+        cx = np.floor(x / cell_m).astype(np.int64)
+        cy = np.floor(y / cell_m).astype(np.int64)
+        self.cx_min = int(cx.min()) if cx.size else 0
+        self.cy_min = int(cy.min()) if cy.size else 0
+        self.ncols = int(cx.max() - self.cx_min + 1) if cx.size else 1
+        self.nrows = int(cy.max() - self.cy_min + 1) if cy.size else 1
+
+        keys = (cy - self.cy_min) * self.ncols + (cx - self.cx_min)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rows_idx = order          # posición en los arreglos originales
+        self.ids = ids[order]
+        self.x = x[order]
+        self.y = y[order]
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def _project(self, lon, lat):
+        return (np.asarray(lon) - self.lon0) * self._kx, (np.asarray(lat) - self.lat0) * _M_PER_DEG_LAT
+
+    def query(self, lon: float, lat: float, radius_m: float, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Puntos a menos de ``radius_m`` metros, ordenados por distancia (máx. ``k``).
+        Retorna ``(posiciones en los arreglos originales, distancias en metros)``.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0))
+        if not len(self):
+            return empty
+        qx, qy = self._project(lon, lat)
+        qx, qy = float(qx), float(qy)
+
+        cx0 = max(math.floor((qx - radius_m) / self.cell_m) - self.cx_min, 0)
+        cx1 = min(math.floor((qx + radius_m) / self.cell_m) - self.cx_min, self.ncols - 1)
+        cy0 = max(math.floor((qy - radius_m) / self.cell_m) - self.cy_min, 0)
+        cy1 = min(math.floor((qy + radius_m) / self.cell_m) - self.cy_min, self.nrows - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return empty
+
+        rows = np.arange(cy0, cy1 + 1, dtype=np.int64) * self.ncols
+        lo = np.searchsorted(self.keys, rows + cx0, side="left")
+        hi = np.searchsorted(self.keys, rows + cx1, side="right")
+        spans = [(a, b) for a, b in zip(lo.tolist(), hi.tolist()) if b > a]
+        if not spans:
+            return empty
+        cand = np.concatenate([np.arange(a, b) for a, b in spans])
+
+        dx = self.x[cand] - qx
+        dy = self.y[cand] - qy
+        dist = np.sqrt(dx * dx + dy * dy)
+        inside = dist <= radius_m
+        cand, dist = cand[inside], dist[inside]
+
+        if k is not None and k < cand.size:
+            top = np.argpartition(dist, k - 1)[:k]
+            cand, dist = cand[top], dist[top]
+        order = np.argsort(dist, kind="stable")
+        return self.rows_idx[cand[order]], dist[order]
+
+
+class CatalogSpatialIndex:
+    """
+    Índices de grilla derivados del catálogo de POIs (uno global y uno por
+    categoría, creados bajo demanda). Se reconstruyen solos cuando cambia la
+    versión del catálogo.
+    """
+
+    def __init__(self, cell_m: float = 250.0):
+        self.cell_m = cell_m
+        self._version: Optional[str] = None
+        self._indexes: Dict[Optional[str], Tuple[GridIndex, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot: "CatalogSnapshot", category: Optional[str] = None) -> Tuple[GridIndex, np.ndarray]:
+        """``(índice, posiciones en el snapshot)`` para ``category`` (o todos los POIs)."""
+        with self._lock:
+            if self._version != snapshot.version:
+                self._indexes = {}
+                self._version = snapshot.version
+            entry = self._indexes.get(category)
+            if entry is None:
+                if category is None:
+                    positions = np.arange(snapshot.ids.size)
+                else:
+                    positions = np.flatnonzero(snapshot.categories == category)
+                index = GridIndex(
+                    snapshot.ids[positions], snapshot.lon[positions], snapshot.lat[positions], self.cell_m
+                )
+                entry = self._indexes[category] = (index, positions)
+            return entry
+
+    def nearby(self, snapshot: "CatalogSnapshot", lon: float, lat: float, radius_m: float,
+               k: Optional[int] = None, category: Optional[str] = None):
+        """Posiciones en el snapshot y distancias de los POIs cercanos, del más cercano al más lejano."""
+        index, positions = self.get(snapshot, category)
+        local, dist = index.query(lon, lat, radius_m, k)
+        return positions[local], dist
+
+
+poi_spatial_index = CatalogSpatialIndex()
@@ -0,0 +1,175 @@
+from collections import Counter
+from datetime import date, datetime, time, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import DailyStat, SurveyReport, SurveyUserDay, User, UserTracking
+
+SURVEYS = "surveys"
+SURVEYS_BY_CATEGORY = "surveys_by_category"
+TRACKING_POINTS = "tracking_points"
+USERS_JOINED = "users_joined"
+
+StatKey = Tuple[date, str, str]
+
+
+def _insert(db: Session):
+    """``INSERT`` con soporte ON CONFLICT según el dialecto (Postgres o SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def increment(db: Session, counts: Dict[StatKey, int]) -> None:
+    """
+    Suma ``counts`` (``{(día, métrica, dimensión): n}``) a los contadores
+    diarios con un upsert, dentro de la transacción del que escribe. Las filas
+    van ordenadas: dos transacciones que tocan los mismos días toman los locks
+    en el mismo orden y no pueden bloquearse mutuamente (deadlock). El
+    tracking con write-behind llega aquí una vez por group commit, desde un
+    solo hilo; encuestas y joins son de baja frecuencia.
+    """
+    if not counts:
+        return
+    insert = _insert(db)
+    stmt = insert(DailyStat).values([
+        {"day": day, "metric": metric, "dimension": dimension, "count": n}
+        for (day, metric, dimension), n in sorted(counts.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["day", "metric", "dimension"],
+        set_={"count": DailyStat.count + stmt.excluded.count},
+    ))
+
+
+def record_survey(db: Session, user_id: int, category: str, day: Optional[date] = None) -> None:
+    day = day or today()
+    increment(db, {(day, SURVEYS, ""): 1, (day, SURVEYS_BY_CATEGORY, category): 1})
+    insert = _insert(db)
+    db.execute(insert(SurveyUserDay).values(day=day, user_id=user_id).on_conflict_do_nothing())
+
+
+def record_tracking(db: Session, rows: Iterable[dict]) -> None:
+    """Cuenta puntos por día del timestamp (UTC) de cada punto."""
+    per_day = Counter(r["timestamp"].astimezone(timezone.utc).date() for r in rows)
+    increment(db, {(day, TRACKING_POINTS, ""): n for day, n in per_day.items()})
+
+
+def record_users_joined(db: Session, n: int, day: Optional[date] = None) -> None:
+    if n > 0:
+        increment(db, {(day or today(), USERS_JOINED, ""): n})
+
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    """``"2024-05-01"`` o un datetime ISO -> día (los rollups tienen granularidad diaria)."""
+    if not value:
+        return None
+    return date.fromisoformat(value.strip()[:10])
+
+
+def get_stats(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """
+    Estadísticas a partir de los buckets diarios: el costo depende del número
+    de días del rango, no del tamaño de las tablas. ``start``/``end`` son
+    inclusivos y filtran encuestas, tracking, categorías y usuarios con
+    encuestas; ``unique_users`` es siempre el total de usuarios registrados.
+    """
+    def in_range(query, day_col):
+        if start:
+            query = query.filter(day_col >= start)
+        if end:
+            query = query.filter(day_col <= end)
+        return query
+
+    rows = in_range(
+        db.query(DailyStat.metric, DailyStat.dimension, func.sum(DailyStat.count))
+        .filter(DailyStat.metric.in_([SURVEYS, TRACKING_POINTS, SURVEYS_BY_CATEGORY]))
+        .group_by(DailyStat.metric, DailyStat.dimension),
+        DailyStat.day,
+    ).all()
+    totals = {(metric, dimension): int(n) for metric, dimension, n in rows}
+
+    unique_users = (
+        db.query(func.coalesce(func.sum(DailyStat.count), 0))
+        .filter(DailyStat.metric == USERS_JOINED)
+        .scalar()
+    )
+    users_with_surveys = in_range(
+        db.query(func.count(func.distinct(SurveyUserDay.user_id))), SurveyUserDay.day
+    ).scalar()
+
+    return {
+        "total_surveys": totals.get((SURVEYS, ""), 0),
+        "total_tracking_points": totals.get((TRACKING_POINTS, ""), 0),
+        "unique_users": int(unique_users),
+        "users_with_surveys": users_with_surveys,
+        "surveys_by_category": sorted(
+            (
+                {"category": dimension, "count": n}
+                for (metric, dimension), n in totals.items()
+                if metric == SURVEYS_BY_CATEGORY
+            ),
+            key=lambda c: c["category"],
+        ),
+    }
+
+
+def _as_date(value) -> date:
+    # SQLite devuelve ``date()`` como texto
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _utc_day(db: Session, column):
+    # Los incrementos en línea usan el día UTC; en Postgres ``date()`` depende de la zona de la sesión
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+def rebuild_stats(db: Session, since: Optional[date] = None) -> None:
+    """
+    Recalcula los rollups desde las tablas base (backfill inicial, reparación
+    o la reconciliación periódica de ``jobs.reconcile_stats``). Con ``since``
+    sólo los días desde esa fecha (UTC, inclusive); si no, todos. Reemplaza
+    el contenido de esos días; no hace commit.
+    """
+    start = datetime.combine(since, time.min, tzinfo=timezone.utc) if since else None
+
+    def recent(query, column):
+        return query.filter(column >= start) if start else query
+
+    db.query(DailyStat).filter(*([DailyStat.day >= since] if since else [])).delete()
+    db.query(SurveyUserDay).filter(*([SurveyUserDay.day >= since] if since else [])).delete()
+
+    counts: Dict[StatKey, int] = {}
+    survey_day = _utc_day(db, SurveyReport.created_at)
+    surveys = recent(db.query(survey_day, SurveyReport.option, func.count()), SurveyReport.created_at)
+    for day, category, n in surveys.group_by(survey_day, SurveyReport.option):
+        day = _as_date(day)
+        counts[(day, SURVEYS, "")] = counts.get((day, SURVEYS, ""), 0) + n
+        counts[(day, SURVEYS_BY_CATEGORY, category)] = n
+
+    tracking_day = _utc_day(db, UserTracking.timestamp)
+    for day, n in recent(db.query(tracking_day, func.count()), UserTracking.timestamp).group_by(tracking_day):
+        counts[(_as_date(day), TRACKING_POINTS, "")] = n
+
+    user_day = _utc_day(db, User.created_at)
+    for day, n in recent(db.query(user_day, func.count()), User.created_at).group_by(user_day):
+        counts[(_as_date(day), USERS_JOINED, "")] = n
+
+    increment(db, counts)
+
+    pairs = recent(db.query(survey_day, SurveyReport.user_id), SurveyReport.created_at).distinct().all()
+    if pairs:
+        db.execute(
+            SurveyUserDay.__table__.insert(),
+            [{"day": _as_date(day), "user_id": user_id} for day, user_id in pairs],
+        )
@@ -1,48 +1,236 @@
 import os
-import cloudinary
-import cloudinary.uploader
-from fastapi import UploadFile
+import shutil
+import tempfile
+import time
+import uuid
+from functools import lru_cache
 from typing import Optional
 
-# Configurar Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
-
-async def upload_survey_photo(photo: UploadFile, user_id: int) -> Optional[str]:
-    """
-    Sube una foto de encuesta a Cloudinary y retorna la URL pública.
-    
-    Args:
-        photo: Archivo de imagen
-        user_id: ID del usuario (para organizar en carpetas)
-    
-    Returns:
-        URL pública de la imagen o None si falla
-    """
-    if not photo:
-        return None
-    
-    try:
-        # Leer el contenido del archivo
-        contents = await photo.read()
-        
-        # Subir a Cloudinary
-        result = cloudinary.uploader.upload(
-            contents,
-            folder=f"mobility_surveys/user_{user_id}",
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+ALLOWED_FORMATS = ("jpg", "jpeg", "png", "gif", "webp")
+
+# Fotos recibidas que esperan ser subidas por el pool (sobreviven a un reinicio)
+SPOOL_DIR = os.getenv("PHOTO_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "pois_photo_spool"))
+COPY_CHUNK_BYTES = 256 * 1024
+MAX_PHOTO_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(15 * 1024 * 1024)))
+THUMBNAIL_PX = int(os.getenv("PHOTO_THUMBNAIL_PX", "320"))
+# Dueño de los archivos que este proceso deja en el spool (ver ``photo_uploads``)
+SPOOL_OWNER = uuid.uuid4().hex[:12]
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+def make_thumbnail(source_path: str, max_px: int = THUMBNAIL_PX) -> str:
+    """
+    Genera una miniatura JPEG de ``source_path`` (lado mayor ``max_px``) y
+    retorna su ruta. En JPEG usa ``draft``: el decoder escala al leer, así que
+    la memoria depende del tamaño de la miniatura y no de la foto original.
+    """
+    from PIL import Image, ImageOps  # opcional: sólo se necesita para miniaturas locales
+
+    out = f"{source_path}.thumb.jpg"
+    with Image.open(source_path) as img:
+        img.draft("RGB", (max_px, max_px))
+        thumb = ImageOps.exif_transpose(img)
+        thumb.thumbnail((max_px, max_px))
+        if thumb.mode not in ("RGB", "L"):
+            thumb = thumb.convert("RGB")
+        thumb.save(out, "JPEG", quality=80, optimize=True)
+    return out
+
+
+class StorageBackend:
+    """
+    Destino de las fotos de encuestas. ``put`` recibe la ruta de un archivo
+    (la foto ya está en disco, nunca entera en memoria) y retorna la URL pública.
+    Las llamadas son bloqueantes: se hacen desde los hilos de ``photo_uploads``.
+    """
+
+    name = "base"
+
+    def put(self, path: str, key: str) -> str:
+        raise NotImplementedError
+
+    def thumbnail(self, path: str, key: str, url: str) -> Optional[str]:
+        """URL de una miniatura de la foto; por defecto la genera localmente y la sube con ``put``."""
+        thumb = make_thumbnail(path)
+        try:
+            return self.put(thumb, f"{key}_thumb")
+        finally:
+            os.remove(thumb)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Disco local (servido en ``/media``). También hace de sustituto offline de
+    Cloudinary: ``delay`` simula la latencia de red de una subida real.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str, base_url: str, delay: float = 0.0):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        self.delay = delay
+
+    def put(self, path: str, key: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        name = f"{key}{os.path.splitext(path)[1]}"
+        target = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)  # copia por bloques
+        return f"{self.base_url}/{name}"
+
+
+@lru_cache(maxsize=1)
+def _cloudinary_uploader():
+    """Importa y configura Cloudinary recién en la primera subida (arranque liviano)."""
+    import cloudinary
+    import cloudinary.uploader
+
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET")
+    )
+    return cloudinary.uploader
+
+
+class CloudinaryStorage(StorageBackend):
+    """Cloudinary: el SDK lee el archivo desde disco; la miniatura es una transformación de URL."""
+
+    name = "cloudinary"
+
+    def put(self, path: str, key: str) -> str:
+        result = _cloudinary_uploader().upload(
+            path,
+            public_id=key,
+            folder="mobility_surveys",
             resource_type="image",
-            allowed_formats=["jpg", "jpeg", "png", "gif", "webp"],
+            allowed_formats=list(ALLOWED_FORMATS),
             transformation=[
                 {'width': 1200, 'crop': 'limit'},  # Limitar ancho máximo
                 {'quality': 'auto:good'}  # Optimización automática
             ]
         )
-        
-        return result.get('secure_url')
-        
-    except Exception as e:
-        print(f"❌ Error subiendo imagen: {e}")
-        return None
\ No newline at end of file
+        url = result.get('secure_url')
+        if not url:
+            raise RuntimeError(f"Cloudinary no retornó URL: {result}")
+        return url
+
+    def thumbnail(self, path: str, key: str, url: str) -> Optional[str]:
+        # Cloudinary genera la variante al primer pedido: no hay que subir nada más
+        if "/upload/" not in url:
+            return None
+        return url.replace("/upload/", f"/upload/c_limit,w_{THUMBNAIL_PX},h_{THUMBNAIL_PX},q_auto/", 1)
+
+
+LOCAL_MEDIA_DIR = os.getenv("PHOTO_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "pois_media"))
+
+
+def storage_kind() -> Optional[str]:
+    """
+    ``PHOTO_STORAGE=cloudinary|local`` (``PHOTO_UPLOADER`` también se acepta).
+    Por defecto Cloudinary si hay credenciales configuradas; si no, ``None``.
+    """
+    return (
+        os.getenv("PHOTO_STORAGE")
+        or os.getenv("PHOTO_UPLOADER")
+        or ("cloudinary" if os.getenv("CLOUDINARY_CLOUD_NAME") else None)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> StorageBackend:
+    """
+    Backend de fotos según ``storage_kind()``. El disco local hay que pedirlo
+    explícitamente: sin ningún backend configurado falla (la app lo llama al
+    arrancar), en vez de guardar las fotos en /tmp con URLs de localhost.
+    """
+    kind = storage_kind()
+    if kind == "cloudinary":
+        return CloudinaryStorage()
+    if kind == "local":
+        return LocalStorage(
+            LOCAL_MEDIA_DIR,
+            os.getenv("PHOTO_LOCAL_BASE_URL", "http://localhost:8080/media"),
+            delay=float(os.getenv("PHOTO_LOCAL_UPLOAD_DELAY_SECONDS", "0")),
+        )
+    raise RuntimeError(
+        f"Backend de fotos no configurado (PHOTO_STORAGE={kind!r}): define las credenciales "
+        "CLOUDINARY_* o PHOTO_STORAGE=local (solo desarrollo)"
+    )
+
+
+def photo_key(user_id: int) -> str:
+    return f"user_{user_id}/{uuid.uuid4().hex}"
+
+
+def _extension(photo: UploadFile) -> Optional[str]:
+    ext = os.path.splitext(photo.filename or "")[1].lower().lstrip(".")
+    if not ext and photo.content_type and photo.content_type.startswith("image/"):
+        ext = photo.content_type.split("/", 1)[1]
+    return ext if ext in ALLOWED_FORMATS else None
+
+
+def _copy_capped(source, path: str, max_bytes: int) -> None:
+    """Copia por chunks de ``COPY_CHUNK_BYTES``; aborta (y borra) si supera ``max_bytes``."""
+    written = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = source.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise PhotoTooLarge(f"La foto supera {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+async def spool_photo(photo: UploadFile, max_bytes: int = MAX_PHOTO_BYTES) -> Optional[str]:
+    """
+    Copia la foto recibida a un archivo del spool y retorna su ruta; ``None``
+    si el formato no es una imagen permitida, ``PhotoTooLarge`` si supera
+    ``max_bytes``. El multipart ya llega en un ``SpooledTemporaryFile`` de
+    Starlette y aquí se copia por chunks en un hilo, así que la memoria por
+    upload queda acotada sin importar el tamaño del archivo.
+    El request no espera la subida: de eso se encarga ``photo_uploads``.
+    """
+    ext = _extension(photo)
+    if not ext:
+        return None
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, f"incoming-{uuid.uuid4().hex}.{ext}")
+    await photo.seek(0)
+    await run_in_threadpool(_copy_capped, photo.file, path, max_bytes)
+    return path
+
+
+def discard_spooled(path: str) -> None:
+    """Borra un archivo del spool que ya no se va a subir (p.ej. la encuesta no se guardó)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def spool_name(survey_id: int, user_id: int, ext: str, owner: str = SPOOL_OWNER) -> str:
+    """``<survey_id>-<user_id>.<dueño>.<ext>``: permite recuperar tras reinicios sin que dos workers tomen el mismo archivo."""
+    return f"{survey_id}-{user_id}.{owner}{ext}"
+
+
+def spool_path_for(survey_id: int, user_id: int, incoming_path: str) -> str:
+    """Mueve la foto recibida a su nombre definitivo en el spool, a cargo de este proceso."""
+    ext = os.path.splitext(incoming_path)[1]
+    path = os.path.join(SPOOL_DIR, spool_name(survey_id, user_id, ext))
+    os.replace(incoming_path, path)
+    return path
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class TileCache:
+    """
+    LRU de tiles codificados, acotado por bytes totales. La clave incluye la
+    generación de datos de la capa (``services.data_version``): cuando llegan
+    datos nuevos las claves viejas dejan de pedirse y salen por LRU.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, key: Hashable, tile: bytes) -> None:
+        if len(tile) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = tile
+            self._size += len(tile)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+import models
+from services import data_version
+from services.heatmap import aggregate_grid
+from services.mvt import DEFAULT_EXTENT, encode_layer, encode_tile, project, tile_bounds
+from services.tile_cache import TileCache
+
+# Desde este zoom se sirven puntos crudos; más abajo se agregan en una grilla por tile
+RAW_MIN_ZOOM = int(os.getenv("TILES_RAW_MIN_ZOOM", "15"))
+AGGREGATE_GRID = 256           # celdas por lado del tile en zooms bajos
+MAX_FEATURES_PER_TILE = 50_000
+
+
+class SampledGeneration:
+    """
+    Generación de ``table`` leída a lo más cada ``max_stale`` segundos. El
+    tracking sube de generación en cada flush del write-behind (~1 s); con la
+    generación exacta en la clave, los tiles de tracking casi nunca se
+    servirían desde el caché. Un tile puede quedar hasta ``max_stale`` s atrás.
+    """
+
+    def __init__(self, table: str, max_stale: float):
+        self.table = table
+        self.max_stale = max_stale
+        self._value = 0
+        self._read_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        if self.max_stale <= 0:
+            return data_version.current(self.table)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._read_at >= self.max_stale:
+                self._value = data_version.current(self.table)
+                self._read_at = now
+            return self._value
+
+
+LAYERS = {
+    "tracking": {
+        "table": models.UserTracking,
+        "generation": SampledGeneration(
+            data_version.TRACKING, float(os.getenv("TILES_TRACKING_MAX_STALE_SECONDS", "30"))
+        ),
+        "properties": (models.UserTracking.user_id, models.UserTracking.timestamp),
+    },
+    "surveys": {
+        "table": models.SurveyReport,
+        "generation": SampledGeneration(data_version.SURVEYS, 0),  # pocas escrituras: siempre al día
+        "properties": (models.SurveyReport.option.label("category"), models.SurveyReport.user_id),
+    },
+}
+
+tile_cache = TileCache(max_bytes=int(os.getenv("TILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+
+
+def _raw_features(db: Session, layer: dict, z: int, x: int, y: int, bounds):
+    table = layer["table"]
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows = (
+        db.query(table.id, table.lon, table.lat, *layer["properties"])
+        .filter(
+            table.lon >= min_lon, table.lon <= max_lon,
+            table.lat >= min_lat, table.lat <= max_lat,
+        )
+        .limit(MAX_FEATURES_PER_TILE)
+    )
+    names = [c.key for c in layer["properties"]]
+    for fid, lon, lat, *props in rows:
+        px, py = project(lon, lat, z, x, y)
+        values = {
+            k: (v.isoformat() if hasattr(v, "isoformat") else v)
+            for k, v in zip(names, props)
+        }
+        yield fid, px, py, values
+
+
+def _aggregated_features(db: Session, layer: dict, z: int, x: int, y: int, bounds):
+    table = layer["table"]
+    cell = (bounds[2] - bounds[0]) / AGGREGATE_GRID
+    cells, _ = aggregate_grid(db, table.lon, table.lat, [], cell, MAX_FEATURES_PER_TILE, bounds)
+    for i, (lon, lat, count) in enumerate(cells):
+        px, py = project(lon, lat, z, x, y)
+        yield i, px, py, {"count": count}
+
+
+def render_tile(db: Session, layer_name: str, z: int, x: int, y: int) -> bytes:
+    """
+    Tile MVT de una capa. Zooms bajos: puntos agregados con ``count``;
+    zooms altos: features crudos dentro del tile. Resultado cacheado por
+    ``(capa, z, x, y, generación)`` (en tracking, la generación muestreada).
+    """
+    layer = LAYERS[layer_name]
+    key = (layer_name, z, x, y, layer["generation"].current())
+    tile = tile_cache.get(key)
+    if tile is not None:
+        return tile
+
+    bounds = tile_bounds(z, x, y)
+    if z >= RAW_MIN_ZOOM:
+        features = _raw_features(db, layer, z, x, y, bounds)
+    else:
+        features = _aggregated_features(db, layer, z, x, y, bounds)
+    tile = encode_tile([encode_layer(layer_name, features, DEFAULT_EXTENT)])
+    tile_cache.put(key, tile)
+    return tile
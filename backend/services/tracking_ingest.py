@@ -0,0 +1,107 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import UserTracking
+from services import data_version, stats
+from services.visit_detection import VISIT_DETECTION_ENABLED, assigned_poi_index, detect_visits
+
+TRACKING_COLUMNS = ("user_id", "lon", "lat", "timestamp")
+
+
+def parse_client_timestamp(value: Optional[str], default: datetime) -> datetime:
+    """
+    Convierte el timestamp ISO-8601 enviado por el cliente (``new Date().toISOString()``).
+    Si no viene o no se puede leer, se usa ``default`` (hora de recepción).
+    Los timestamps sin zona horaria se asumen UTC.
+    """
+    if not value:
+        return default
+    try:
+        ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def tracking_rows(points: Iterable) -> List[dict]:
+    """Transforma ``TrackPoint`` (ya validados a lon/lat) en filas planas, conservando el reloj del cliente."""
+    received_at = datetime.now(timezone.utc)
+    return [
+        {
+            "user_id": p.user_id,
+            "lon": p.lon,
+            "lat": p.lat,
+            "timestamp": parse_client_timestamp(p.timestamp, received_at),
+        }
+        for p in points
+    ]
+
+
+def _copy_rows(db: Session, rows: List[dict]) -> None:
+    """Inserta usando ``COPY ... FROM STDIN`` (Postgres con psycopg2 o psycopg 3)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow((r["user_id"], repr(r["lon"]), repr(r["lat"]), r["timestamp"].isoformat()))
+
+    sql = (
+        f"COPY {UserTracking.__tablename__} ({', '.join(TRACKING_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    dbapi_conn = db.connection().connection
+    with dbapi_conn.cursor() as cur:
+        if hasattr(cur, "copy_expert"):  # psycopg2
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+        else:  # psycopg 3
+            with cur.copy(sql) as copy:
+                copy.write(buf.getvalue())
+
+
+def _supports_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver in ("psycopg2", "psycopg")
+
+
+def bulk_insert_tracking(db: Session, rows: List[dict]) -> int:
+    """
+    Inserta filas de tracking en bloque dentro de la transacción actual (no hace commit).
+    - Postgres (psycopg2 / psycopg 3): COPY en formato CSV.
+    - Otras bases: un solo ``INSERT`` ejecutado como executemany (multi-row).
+    """
+    if not rows:
+        return 0
+    if _supports_copy(db):
+        _copy_rows(db, rows)
+    else:
+        db.execute(insert(UserTracking.__table__), rows)
+    return len(rows)
+
+
+def store_tracking(db: Session, rows: List[dict]) -> int:
+    """
+    Escritura completa de un lote de tracking: inserción en bloque, detección
+    automática de visitas a POIs asignados, rollups diarios y commit. Luego actualiza el índice
+    de visitas en memoria y la generación de datos de tracking.
+    """
+    count = bulk_insert_tracking(db, rows)
+    visits = detect_visits(db, rows) if VISIT_DETECTION_ENABLED else {}
+    stats.record_tracking(db, rows)
+    db.commit()
+    if visits:
+        assigned_poi_index.apply_visits(visits)
+        data_version.bump(data_version.ASSIGNMENTS)
+    data_version.bump(data_version.TRACKING)
+    return count
+
+
+def insert_tracking_points(db: Session, points: Iterable) -> int:
+    """Atajo: ``TrackPoint`` -> filas -> inserción en bloque."""
+    return bulk_insert_tracking(db, tracking_rows(points))
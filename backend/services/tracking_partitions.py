@@ -0,0 +1,278 @@
+"""
+Particionado por tiempo de ``user_tracking`` (sólo Postgres).
+
+La tabla se particiona por rango de ``timestamp`` en particiones diarias o
+semanales (``TRACKING_PARTITION_INTERVAL=day|week``) llamadas
+``user_tracking_pYYYYMMDD`` (inicio del periodo), más una partición
+``user_tracking_default`` que recibe lo que no cae en ninguna (timestamps de
+cliente muy viejos o futuros) para que la ingesta nunca falle.
+
+- ``ensure_partitions`` crea las particiones de un rango de fechas y mueve a
+  ellas las filas que hubieran caído en la partición default.
+- ``archive_partition`` separa una partición, la exporta a Parquet por record
+  batches (sin cargarla completa) y, verificado el conteo, la elimina.
+- ``apply_retention`` también saca de la default las filas de periodos
+  expirados (a su partición, que luego se archiva como las demás).
+
+Los filtros por ``timestamp`` con valores concretos (``results.py``) dejan que
+el planner descarte las particiones fuera del rango.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+
+TABLE = "user_tracking"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_PREFIX = f"{TABLE}_p"
+INTERVAL = os.getenv("TRACKING_PARTITION_INTERVAL", "week")
+PARTITIONS_AHEAD = int(os.getenv("TRACKING_PARTITIONS_AHEAD", "4"))
+
+CREATE_PARENT = f"""
+CREATE TABLE {TABLE} (
+    id integer NOT NULL DEFAULT nextval('user_tracking_id_seq'),
+    user_id integer NOT NULL REFERENCES users (id),
+    lon double precision NOT NULL,
+    lat double precision NOT NULL,
+    "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp")
+"""
+
+
+def period_start(day: date, interval: str = INTERVAL) -> date:
+    """Inicio del periodo que contiene ``day`` (el lunes, si es semanal)."""
+    return day - timedelta(days=day.weekday()) if interval == "week" else day
+
+
+def period_step(interval: str = INTERVAL) -> timedelta:
+    return timedelta(weeks=1) if interval == "week" else timedelta(days=1)
+
+
+def partition_name(start: date) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def partition_start(name: str) -> Optional[date]:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _utc(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :t"),
+        {"t": TABLE},
+    ).scalar())
+
+
+def create_partitioned_table(conn) -> None:
+    """Tabla padre particionada + índices + partición default (tabla nueva, vacía)."""
+    conn.execute(text("CREATE SEQUENCE IF NOT EXISTS user_tracking_id_seq"))
+    conn.execute(text(CREATE_PARENT))
+    conn.execute(text("ALTER SEQUENCE user_tracking_id_seq OWNED BY user_tracking.id"))
+    # Índices en la tabla padre: Postgres los crea en cada partición
+    conn.execute(text(f'CREATE INDEX idx_user_tracking_user_time ON {TABLE} (user_id, "timestamp")'))
+    conn.execute(text(f"CREATE INDEX ix_user_tracking_user_id ON {TABLE} (user_id)"))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+
+def create_schema(engine, metadata) -> None:
+    """
+    ``metadata.create_all`` salvo que en Postgres ``user_tracking`` se crea
+    particionada (``create_all`` la crearía como tabla normal).
+    """
+    if engine.dialect.name != "postgresql":
+        metadata.create_all(bind=engine)
+        return
+    with engine.begin() as conn:
+        metadata.create_all(conn, tables=[t for t in metadata.sorted_tables if t.name != TABLE])
+        if not inspect(conn).has_table(TABLE):
+            create_partitioned_table(conn)
+
+
+def list_partitions(conn) -> List[Tuple[str, date]]:
+    """Particiones por periodo ``(nombre, inicio)`` ordenadas por fecha (sin la default)."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :t"
+    ), {"t": TABLE}).scalars()
+    found = [(name, partition_start(name)) for name in names]
+    return sorted((n, d) for n, d in found if d is not None)
+
+
+def ensure_partition(conn, start: date, interval: str = INTERVAL) -> bool:
+    """
+    Crea la partición del periodo que empieza en ``start`` si no existe.
+    Las filas de ese rango que estén en la default se mueven a la nueva
+    partición antes de adjuntarla (si no, ``ATTACH`` fallaría).
+    """
+    name = partition_name(start)
+    if conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar():
+        return False
+    lo, hi = _utc(start), _utc(start + period_step(interval))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS ("
+        f"  DELETE FROM {DEFAULT_PARTITION} WHERE \"timestamp\" >= :lo AND \"timestamp\" < :hi RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved"
+    ), {"lo": lo, "hi": hi}).rowcount
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    ))
+    print(f"🧱 Partición {name} creada" + (f" ({moved} filas movidas desde la default)" if moved else ""))
+    return True
+
+
+def ensure_partitions(conn, first: date, last: date, interval: str = INTERVAL) -> int:
+    """Particiones para todos los periodos entre ``first`` y ``last`` (inclusive)."""
+    created = 0
+    day = period_start(first, interval)
+    while day <= last:
+        created += ensure_partition(conn, day, interval)
+        day += period_step(interval)
+    return created
+
+
+def ensure_upcoming(engine, ahead: int = PARTITIONS_AHEAD) -> None:
+    """Periodo actual + ``ahead`` siguientes (al arrancar y en el job de retención)."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return
+        # Varios workers de uvicorn arrancan a la vez: sólo uno crea particiones
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('user_tracking_partitions'))"))
+        today = datetime.now(timezone.utc).date()
+        ensure_partitions(conn, today, today + period_step() * ahead)
+
+
+def _record_batches(engine, name: str, batch_rows: int) -> Iterator:
+    from services.columnar import TRACKING_COLUMNS, arrow_schema, to_record_batch
+
+    schema = arrow_schema(TRACKING_COLUMNS)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(
+            text(f'SELECT id, user_id, lon, lat, "timestamp" FROM {name} ORDER BY "timestamp"')
+        )
+        for rows in result.partitions():
+            yield to_record_batch(rows, schema)
+
+
+def export_partition(engine, name: str, archive_dir: str, batch_rows: int = 100_000) -> Tuple[str, int]:
+    """
+    Escribe la partición ``name`` en ``archive_dir/user_tracking/<name>.parquet``
+    por record batches (memoria acotada a ``batch_rows`` filas). Escribe a un
+    archivo temporal y lo renombra al terminar. Retorna ``(ruta, filas)``.
+    """
+    import pyarrow.parquet as pq
+
+    folder = os.path.join(archive_dir, TABLE)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}.parquet")
+    # Un periodo ya archivado puede volver a aparecer (filas tardías): no se pisa el archivo anterior
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(folder, f"{name}-{suffix}.parquet")
+        suffix += 1
+    tmp = f"{path}.tmp"
+    rows = 0
+    writer = None
+    try:
+        for batch in _record_batches(engine, name, batch_rows):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, batch.schema, compression="zstd")
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return "", 0
+    os.replace(tmp, path)
+    return path, rows
+
+
+def detached_partitions(conn) -> List[Tuple[str, date]]:
+    """Particiones por periodo ya separadas de ``user_tracking`` (un archivado que falló a medias)."""
+    names = conn.execute(text(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition AND starts_with(relname, :p)"
+    ), {"p": PARTITION_PREFIX}).scalars()
+    found = [(name, partition_start(name)) for name in names]
+    return sorted((n, d) for n, d in found if d is not None)
+
+
+def archive_partition(engine, name: str, archive_dir: str) -> int:
+    """
+    Separa, exporta y elimina una partición. Primero el ``DETACH``: desde ahí
+    ninguna escritura llega a la tabla (las filas tardías de ese rango caen en
+    la default), así que el conteo verificado es el de lo que se borra. Sólo
+    se elimina si el Parquet tiene todas las filas; si no, queda separada y el
+    próximo ``apply_retention`` la reintenta.
+    """
+    import pyarrow.parquet as pq
+
+    with engine.begin() as conn:
+        # Con partición default Postgres no permite DETACH ... CONCURRENTLY
+        if conn.execute(
+            text("SELECT relispartition FROM pg_class WHERE oid = to_regclass(:n)"), {"n": name}
+        ).scalar():
+            conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    with engine.connect() as conn:
+        expected = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+    path, rows = export_partition(engine, name, archive_dir)
+    if expected and (rows != expected or pq.ParquetFile(path).metadata.num_rows != expected):
+        raise RuntimeError(f"Exportación incompleta de {name}: {rows}/{expected} filas; queda separada, no se elimina")
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {name}"))
+    print(f"📦 {name}: {expected} filas archivadas" + (f" en {path}" if path else "") + ", partición eliminada")
+    return expected
+
+
+def partition_expired_default(conn, cutoff: date) -> int:
+    """
+    Filas de la partición default de periodos que terminan antes de ``cutoff``
+    (timestamps viejos o tardíos, incluso de periodos ya archivados): se crea
+    la partición de cada periodo, lo que las mueve ahí, para que la retención
+    las archive y elimine como al resto. Retorna cuántas particiones se crearon.
+    """
+    days = conn.execute(text(
+        f"SELECT DISTINCT date(timezone('UTC', \"timestamp\")) FROM {DEFAULT_PARTITION} WHERE \"timestamp\" < :bound"
+    ), {"bound": _utc(period_start(cutoff))}).scalars()
+    return sum(ensure_partition(conn, start) for start in sorted({period_start(day) for day in days}))
+
+
+def apply_retention(engine, retention_days: int, archive_dir: str) -> List[str]:
+    """
+    Archiva y elimina las particiones que terminan antes de hoy - ``retention_days``,
+    incluidas las filas expiradas que hayan caído en la partición default.
+    """
+    from services import data_version
+
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            print("ℹ️ user_tracking no está particionada (¿falta la migración m0005?)")
+            return []
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('user_tracking_partitions'))"))
+        partition_expired_default(conn, cutoff)
+    with engine.connect() as conn:
+        partitions = detached_partitions(conn) + list_partitions(conn)
+        expired = [name for name, start in partitions if start + period_step() <= cutoff]
+    for name in expired:
+        archive_partition(engine, name, archive_dir)
+    if expired:
+        # Los conteos de /results/stats salen de stats_daily y no cambian; el resto de cachés sí
+        data_version.bump(data_version.TRACKING)
+    return expired
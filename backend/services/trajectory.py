@@ -0,0 +1,126 @@
+from itertools import groupby
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+def _to_meters(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Proyección equirectangular local (metros): suficiente para tolerancias de decenas de metros."""
+    lat0 = np.radians(lat.mean())
+    x = np.radians(lon) * EARTH_RADIUS_M * np.cos(lat0)
+    y = np.radians(lat) * EARTH_RADIUS_M
+    return x, y
+
+
+# Lado de la celda del pre-filtro, como fracción de la tolerancia
+GRID_CELL_FRACTION = 0.25
+
+
+def _grid_filter(x: np.ndarray, y: np.ndarray, cell: float) -> np.ndarray:
+    """
+    Pre-filtro vectorizado: de cada racha de fixes consecutivos dentro de la
+    misma celda de ``cell`` metros se deja sólo el primero (GPS detenido o
+    muy denso). Error acotado por la diagonal de la celda. Retorna índices.
+    """
+    cx = np.floor(x / cell)
+    cy = np.floor(y / cell)
+    keep = np.empty(len(x), dtype=bool)
+    keep[0] = True
+    keep[1:] = (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def _douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker vectorizado por niveles: en cada pasada se evalúan a la vez
+    todos los segmentos pendientes (puntos entre dos puntos ya conservados),
+    cada uno se parte en su punto más lejano si supera ``tolerance`` y los que
+    no, se cierran. Son tantas pasadas como niveles de recursión, sin bucles
+    Python por segmento. Retorna máscara de puntos a conservar.
+    """
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    pending = np.ones(n, dtype=bool)  # puntos aún sin decidir
+    pending[0] = pending[-1] = False
+    positions = np.arange(n)
+
+    while True:
+        idx = positions[pending]
+        if idx.size == 0:
+            return keep
+        anchors = np.flatnonzero(keep)
+        seg = np.searchsorted(anchors, idx, side="right") - 1
+        start, end = anchors[seg], anchors[seg + 1]
+
+        # Distancia al segmento (no a la recta): la proyección se acota a [0, 1], así
+        # un punto que se sale por los extremos (ida y vuelta) cuenta su distancia real
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[idx] - x[start], y[idx] - y[start]
+        norm2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / np.where(norm2 == 0.0, 1.0, norm2), 0.0, 1.0)
+        dist = np.hypot(px - t * dx, py - t * dy)
+
+        # Máximo (y su primera posición) por segmento; los puntos de un segmento son contiguos
+        first = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+        seg_max = np.maximum.reduceat(dist, first)
+        sizes = np.diff(np.r_[first, idx.size])
+        is_max = dist == np.repeat(seg_max, sizes)
+        argmax = np.minimum.reduceat(np.where(is_max, np.arange(idx.size), idx.size), first)
+
+        split = seg_max > tolerance
+        keep[idx[argmax[split]]] = True
+        pending[idx[argmax[split]]] = False
+        pending[idx[np.repeat(~split, sizes)]] = False
+
+
+def simplify(lon: np.ndarray, lat: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Índices de los puntos que sobreviven a la simplificación con tolerancia
+    ``tolerance_m`` metros (pre-filtro por grilla + Douglas-Peucker): ningún
+    punto original queda a más de ``tolerance_m`` de la línea simplificada.
+    El pre-filtro consume la diagonal de su celda y Douglas-Peucker corre con
+    el resto de la tolerancia. ``tolerance_m <= 0`` conserva todos los puntos.
+    """
+    n = len(lon)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+    x, y = _to_meters(lon, lat)
+    cell = tolerance_m * GRID_CELL_FRACTION
+    candidates = _grid_filter(x, y, cell)
+    if len(candidates) <= 2:
+        return candidates
+    mask = _douglas_peucker(x[candidates], y[candidates], tolerance_m - cell * np.sqrt(2))
+    return candidates[mask]
+
+
+def trajectory_features(rows: Iterable[tuple], tolerance_m: float) -> Iterator[dict]:
+    """
+    Filas ``(user_id, lon, lat, timestamp)`` ordenadas por usuario y tiempo ->
+    un feature LineString por usuario (Point si tiene un solo fix). Sólo se
+    mantiene en memoria la trayectoria del usuario en curso.
+    """
+    for user_id, group in groupby(rows, key=lambda r: r[0]):
+        points = list(group)
+        lon = np.fromiter((p[1] for p in points), dtype=np.float64, count=len(points))
+        lat = np.fromiter((p[2] for p in points), dtype=np.float64, count=len(points))
+        properties = {
+            "user_id": user_id,
+            "start": points[0][3],
+            "end": points[-1][3],
+            "points": len(points),
+        }
+        if len(points) == 1:
+            properties["simplified_points"] = 1
+            geometry = {"type": "Point", "coordinates": [lon[0], lat[0]]}
+        else:
+            idx = simplify(lon, lat, tolerance_m)
+            properties["simplified_points"] = len(idx)
+            geometry = {
+                "type": "LineString",
+                "coordinates": np.column_stack((lon[idx], lat[idx])).tolist(),
+            }
+        yield {"type": "Feature", "id": user_id, "properties": properties, "geometry": geometry}
@@ -0,0 +1,179 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, bindparam, update
+from sqlalchemy.orm import Session
+
+from models import POI, UserPOIAssignment
+
+VISIT_DETECTION_ENABLED = os.getenv("VISIT_DETECTION", "1") == "1"
+VISIT_RADIUS_M = float(os.getenv("VISIT_RADIUS_M", "30"))
+
+# Metros por grado (aprox. equirectangular, suficiente para radios de decenas de metros)
+_M_PER_DEG_LAT = 110_540.0
+_M_PER_DEG_LON = 111_320.0
+
+
+class _UserPois:
+    """POIs asignados y aún no visitados de un usuario, como arreglos contiguos."""
+    __slots__ = ("poi_ids", "lon", "lat", "loaded_at")
+
+    def __init__(self, poi_ids: np.ndarray, lon: np.ndarray, lat: np.ndarray):
+        self.poi_ids = poi_ids
+        self.lon = lon
+        self.lat = lat
+        self.loaded_at = time.monotonic()
+
+
+class AssignedPoiIndex:
+    """
+    Caché por usuario de los POIs asignados pendientes de visita, compartido
+    entre batches de tracking. Se invalida cuando cambian las asignaciones
+    (join, visita manual) y expira tras ``ttl`` segundos por si otro worker
+    las modificó. Acotado a ``max_users`` entradas (LRU).
+    """
+
+    def __init__(self, max_users: int = 50_000, ttl: float = 300.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, _UserPois]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, *user_ids: int) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_many(self, db: Session, user_ids: Iterable[int]) -> Dict[int, _UserPois]:
+        """Entradas de ``user_ids``; las que faltan se cargan en una sola consulta."""
+        now = time.monotonic()
+        found: Dict[int, _UserPois] = {}
+        missing: List[int] = []
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and now - entry.loaded_at < self.ttl:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry
+                else:
+                    missing.append(user_id)
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for user_id, entry in loaded.items():
+                    self._entries[user_id] = entry
+                    self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def apply_visits(self, visits: Dict[int, List[int]]) -> None:
+        """Quita de las entradas los POIs recién visitados (tras el commit; no hace falta recargar)."""
+        with self._lock:
+            for user_id, poi_ids in visits.items():
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                keep = ~np.isin(entry.poi_ids, poi_ids)
+                entry.poi_ids, entry.lon, entry.lat = entry.poi_ids[keep], entry.lon[keep], entry.lat[keep]
+
+    @staticmethod
+    def _load(db: Session, user_ids: List[int]) -> Dict[int, _UserPois]:
+        rows = (
+            db.query(UserPOIAssignment.user_id, POI.id, POI.lon, POI.lat)
+            .join(POI, POI.id == UserPOIAssignment.poi_id)
+            .filter(UserPOIAssignment.user_id.in_(user_ids), UserPOIAssignment.visited.is_(False))
+            .all()
+        )
+        grouped: Dict[int, List[Tuple[int, float, float]]] = {u: [] for u in user_ids}
+        for user_id, poi_id, lon, lat in rows:
+            grouped[user_id].append((poi_id, lon, lat))
+        result = {}
+        for user_id, pois in grouped.items():
+            data = np.asarray(pois, dtype=np.float64).reshape(-1, 3)
+            result[user_id] = _UserPois(data[:, 0].astype(np.int64), data[:, 1].copy(), data[:, 2].copy())
+        return result
+
+
+assigned_poi_index = AssignedPoiIndex()
+
+
+def _visits_for_user(entry: _UserPois, lon: np.ndarray, lat: np.ndarray, radius_m: float) -> List[Tuple[int, int]]:
+    """
+    Pares ``(poi_id, índice del primer punto dentro del radio)`` para un usuario.
+    Matriz puntos x POIs calculada de una vez (distancia equirectangular).
+    """
+    if entry.poi_ids.size == 0:
+        return []
+    cos_lat = math.cos(math.radians(float(lat.mean())))
+    dx = (lon[:, None] - entry.lon[None, :]) * (_M_PER_DEG_LON * cos_lat)
+    dy = (lat[:, None] - entry.lat[None, :]) * _M_PER_DEG_LAT
+    hits = (dx * dx + dy * dy) <= radius_m * radius_m
+    visited = hits.any(axis=0)
+    if not visited.any():
+        return []
+    first_hit = hits.argmax(axis=0)
+    return [(int(entry.poi_ids[j]), int(first_hit[j])) for j in np.flatnonzero(visited)]
+
+
+def detect_visits(db: Session, rows: List[dict], radius_m: Optional[float] = None) -> Dict[int, List[int]]:
+    """
+    Marca como visitados los POIs asignados que quedan a menos de ``radius_m``
+    de algún punto del batch (``visited_at`` = timestamp del primer punto que
+    llega). Vectorizado por usuario; un solo UPDATE executemany. No hace commit:
+    retorna ``{user_id: [poi_id, ...]}`` para pasarlo a
+    ``assigned_poi_index.apply_visits`` una vez confirmada la transacción.
+    """
+    if not rows:
+        return {}
+    radius_m = VISIT_RADIUS_M if radius_m is None else radius_m
+
+    users = np.fromiter((r["user_id"] for r in rows), dtype=np.int64, count=len(rows))
+    lon = np.fromiter((r["lon"] for r in rows), dtype=np.float64, count=len(rows))
+    lat = np.fromiter((r["lat"] for r in rows), dtype=np.float64, count=len(rows))
+
+    order = np.argsort(users, kind="stable")
+    unique_users, starts = np.unique(users[order], return_index=True)
+    entries = assigned_poi_index.get_many(db, [int(u) for u in unique_users])
+
+    updates = []
+    bounds = list(starts[1:]) + [len(order)]
+    for user_id, start, end in zip(unique_users, starts, bounds):
+        entry = entries.get(int(user_id))
+        if entry is None:
+            continue
+        idx = order[start:end]
+        for poi_id, hit in _visits_for_user(entry, lon[idx], lat[idx], radius_m):
+            updates.append({
+                "b_user_id": int(user_id),
+                "b_poi_id": poi_id,
+                "b_visited_at": rows[int(idx[hit])]["timestamp"],
+            })
+
+    if not updates:
+        return {}
+    table = UserPOIAssignment.__table__
+    db.execute(
+        update(table)
+        .where(and_(
+            table.c.user_id == bindparam("b_user_id"),
+            table.c.poi_id == bindparam("b_poi_id"),
+            table.c.visited.is_(False),
+        ))
+        .values(visited=True, visited_at=bindparam("b_visited_at")),
+        updates,
+    )
+    by_user: Dict[int, List[int]] = {}
+    for u in updates:
+        by_user.setdefault(u["b_user_id"], []).append(u["b_poi_id"])
+    return by_user
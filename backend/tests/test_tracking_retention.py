@@ -0,0 +1,85 @@
+"""
+Retención de ``user_tracking`` particionada (sólo Postgres): se salta si no hay
+``TEST_POSTGRES_URL``. Cada test usa una base temporal que crea y elimina.
+
+    TEST_POSTGRES_URL=postgresql://postgres@localhost/postgres python -m pytest tests
+"""
+import os
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_URL, reason="requiere TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def engine():
+    import database
+    import models  # noqa: F401  (registra las tablas en Base.metadata)
+    from services.tracking_partitions import create_schema
+
+    name = f"pois_test_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(TEST_POSTGRES_URL, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f"CREATE DATABASE {name}"))
+    engine = create_engine(make_url(TEST_POSTGRES_URL).set(database=name))
+    try:
+        create_schema(engine, database.Base.metadata)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO profiles (id, name, rules) VALUES (1, 'test', '{}')"))
+            conn.execute(text("INSERT INTO users (id, uuid, username, profile_id) VALUES (1, :u, 'test', 1)"), {"u": str(uuid.uuid4())})
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f"DROP DATABASE IF EXISTS {name}"))
+        admin.dispose()
+
+
+def insert_points(engine, day: date, n: int) -> None:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(
+            text('INSERT INTO user_tracking (user_id, lon, lat, "timestamp") VALUES (1, 1, 2, :t)'),
+            [{"t": start + timedelta(minutes=i)} for i in range(n)],
+        )
+
+
+def count(engine, table: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+
+def archived_rows(archive_dir) -> int:
+    import pyarrow.parquet as pq
+
+    folder = os.path.join(archive_dir, "user_tracking")
+    return sum(pq.ParquetFile(os.path.join(folder, f)).metadata.num_rows for f in os.listdir(folder))
+
+
+def test_retention_archives_expired_rows_from_default_partition(engine, tmp_path):
+    from services.tracking_partitions import DEFAULT_PARTITION, apply_retention, ensure_partitions
+
+    today = datetime.now(timezone.utc).date()
+    old = today - timedelta(days=120)
+    with engine.begin() as conn:
+        ensure_partitions(conn, old, old)
+    insert_points(engine, old, 10)
+    assert apply_retention(engine, 30, str(tmp_path))
+    assert count(engine, "user_tracking") == 0
+
+    insert_points(engine, old, 3)                          # tardías de un periodo ya archivado
+    insert_points(engine, today - timedelta(days=400), 4)  # periodo sin partición
+    insert_points(engine, today - timedelta(days=1), 2)    # dentro de la retención
+    assert count(engine, DEFAULT_PARTITION) == 9
+
+    apply_retention(engine, 30, str(tmp_path))
+
+    assert count(engine, DEFAULT_PARTITION) == 2
+    assert count(engine, "user_tracking") == 2
+    # El periodo archivado dos veces queda en dos archivos, sin pisar el primero
+    assert archived_rows(tmp_path) == 10 + 3 + 4
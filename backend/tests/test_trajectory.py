@@ -0,0 +1,58 @@
+"""
+Regresión de ``services.trajectory.simplify``: ningún fix original puede quedar
+a más de ``tolerance`` metros de la línea simplificada.
+
+    cd backend && python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from services.trajectory import _to_meters, simplify
+
+
+def random_walks(n_tracks: int, n_points: int, seed: int = 1):
+    """Caminatas aleatorias tipo peatón: giros suaves, pausas y ruido GPS de ~3 m."""
+    rng = np.random.default_rng(seed)
+    for _ in range(n_tracks):
+        heading = np.cumsum(rng.normal(0, 0.15, n_points))
+        speed = np.where(rng.random(n_points) < 0.1, 0.0, rng.uniform(1, 5, n_points))
+        x = np.cumsum(speed * np.cos(heading)) + rng.normal(0, 3, n_points)
+        y = np.cumsum(speed * np.sin(heading)) + rng.normal(0, 3, n_points)
+        lat = -36.82 + y / 111_320
+        lon = -73.05 + x / (111_320 * np.cos(np.radians(-36.82)))
+        yield lon, lat
+
+
+def max_deviation(lon, lat, kept) -> float:
+    """Mayor distancia (m) de cada punto original al segmento simplificado que lo cubre."""
+    x, y = _to_meters(lon, lat)
+    worst = 0.0
+    for start, end in zip(kept[:-1], kept[1:]):
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start:end + 1] - x[start], y[start:end + 1] - y[start]
+        norm2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / norm2, 0.0, 1.0) if norm2 else np.zeros_like(px)
+        worst = max(worst, float(np.hypot(px - t * dx, py - t * dy).max()))
+    return worst
+
+
+def test_out_and_back_keeps_turnaround():
+    # Ida y vuelta a latitud constante: el punto de giro queda fuera del segmento 0-4
+    lon = -73.05 + np.array([0, 0.001, 0.002, 0.003, 0.0015])
+    lat = np.full(5, -36.82)
+    kept = simplify(lon, lat, 5.0)
+    assert kept.tolist() == [0, 3, 4]
+    assert max_deviation(lon, lat, kept) <= 5.0
+
+
+@pytest.mark.parametrize("tolerance", [2.0, 5.0, 20.0])
+def test_random_walks_within_tolerance(tolerance):
+    for lon, lat in random_walks(300, 500):
+        kept = simplify(lon, lat, tolerance)
+        assert kept[0] == 0 and kept[-1] == len(lon) - 1
+        assert max_deviation(lon, lat, kept) <= tolerance + 1e-9
+
+
+def test_zero_tolerance_keeps_everything():
+    lon, lat = next(random_walks(1, 100))
+    assert simplify(lon, lat, 0).tolist() == list(range(100))
@@ -1,15 +1,86 @@
+"""
+Carga (o recarga) el catálogo de POIs desde el parquet categorizado.
+
+Es idempotente: cada POI tiene una clave de origen estable (``source_key``,
+el id OSM si el archivo lo trae o un hash de categoría/coordenadas) y
+la carga hace upsert sobre ella, así que correrlo de nuevo actualiza en vez de
+duplicar. Los datos pasan por ``COPY`` a una tabla temporal por chunks y de
+ahí a ``pois`` con un solo ``INSERT ... ON CONFLICT``.
+
+    python populate_pois.py [--parquet data/pois.parquet] [--chunk-size 50000]
+
+Requiere las columnas ``pois.source_key`` y ``pois.updated_at``
+(``cd backend && python -m migrations``).
+"""
+import argparse
+import io
 import os
+import time
+import warnings
+
+import geopandas as gpd
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from dotenv import load_dotenv
-import geopandas as gpd
-import warnings
+from sqlalchemy import create_engine, inspect, text
+
 warnings.filterwarnings("ignore")
 
-def main():
-    load_dotenv(dotenv_path="./.env.prod")
+PARQUET_FILE = "data/pois_categorizados_filtrados_refinados.parquet"
+COLUMNS = ["source_key", "name", "category", "lon", "lat", "wkb_geometry"]
+# Columnas con el id del elemento en el origen, en orden de preferencia
+SOURCE_ID_COLUMNS = ["osm_id", "osmid", "@id", "id"]
+SOURCE_TYPE_COLUMNS = ["osm_type", "element_type", "element"]
+
+CREATE_STAGING = """
+CREATE TEMP TABLE pois_staging (
+    source_key text,
+    name text,
+    category text,
+    lon double precision,
+    lat double precision,
+    wkb_geometry bytea
+) ON COMMIT DROP
+"""
 
-    # --- Configuración ---
+# Los POIs cargados antes de existir source_key se adoptan si coinciden exactamente
+# (la categoría sin normalizar: el loader anterior la escribía sin limpiar)
+ADOPT_LEGACY = """
+UPDATE pois SET source_key = m.source_key
+FROM (
+    SELECT DISTINCT ON (s.source_key) s.source_key, p.id
+    FROM pois_staging s
+    JOIN pois p ON p.source_key IS NULL
+        AND p.name = s.name AND btrim(p.category) = s.category AND p.wkb_geometry = s.wkb_geometry
+    WHERE NOT EXISTS (SELECT 1 FROM pois k WHERE k.source_key = s.source_key)
+    ORDER BY s.source_key, p.id
+) m
+WHERE pois.id = m.id
+"""
+
+# Sólo se reescriben las filas que cambiaron (y sólo ésas avanzan ``updated_at``, que el
+# catálogo del backend usa para recargarse); (xmax = 0) distingue insertadas de actualizadas
+UPSERT = """
+INSERT INTO pois (source_key, name, category, lon, lat, wkb_geometry)
+SELECT DISTINCT ON (source_key) source_key, name, category, lon, lat, wkb_geometry
+FROM pois_staging
+ORDER BY source_key
+ON CONFLICT (source_key) DO UPDATE SET
+    name = EXCLUDED.name,
+    category = EXCLUDED.category,
+    lon = EXCLUDED.lon,
+    lat = EXCLUDED.lat,
+    wkb_geometry = EXCLUDED.wkb_geometry,
+    updated_at = now()
+WHERE (pois.name, pois.category, pois.lon, pois.lat, pois.wkb_geometry)
+    IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.category, EXCLUDED.lon, EXCLUDED.lat, EXCLUDED.wkb_geometry)
+RETURNING (xmax = 0)
+"""
+
+
+def database_url() -> str:
     DATABASE_URL = os.getenv("DATABASE_URL", None)
     if DATABASE_URL is None:
         # Construir la URL de la base de datos desde variables individuales
@@ -21,25 +92,52 @@ def main():
         POSTGRES_DB = os.getenv("POSTGRES_DB", "poisdb")
 
         DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-    
-    PARQUET_FILE = "data/pois_categorizados_filtrados_refinados.parquet"
+    return DATABASE_URL
 
-    # --- Leer archivo ---
-    print("📥 Cargando POIs...")
-    gdf = gpd.read_parquet(PARQUET_FILE)
+
+def source_keys(gdf: gpd.GeoDataFrame) -> pd.Series:
+    """
+    Clave estable por POI: ``osm:<tipo>/<id>`` si el archivo trae el id de
+    origen; si no, ``h:<hash>`` de categoría y coordenadas (7 decimales),
+    calculado de forma vectorizada y determinista entre ejecuciones. El nombre
+    no entra en la clave: renombrar un POI lo actualiza en vez de duplicarlo.
+    POIs de la misma categoría en el mismo punto se distinguen con ``-<n>``
+    según su orden en el archivo (no por nombre: un renombre intercambiaría
+    las claves y con ellas los ``pois.id`` de asignaciones y visitas).
+    """
+    id_col = next((c for c in SOURCE_ID_COLUMNS if c in gdf.columns), None)
+    if id_col is not None and gdf[id_col].notna().all() and gdf[id_col].is_unique:
+        ids = gdf[id_col].astype(str).str.strip()
+        type_col = next((c for c in SOURCE_TYPE_COLUMNS if c in gdf.columns), None)
+        if type_col is not None:
+            ids = gdf[type_col].fillna("").astype(str).str.strip() + "/" + ids
+        return "osm:" + ids.str.slice(0, 60)
+
+    basis = pd.DataFrame({
+        "category": gdf["category"].values,
+        "lon": np.round(gdf["lon"].values, 7),
+        "lat": np.round(gdf["lat"].values, 7),
+    })
+    hashes = pd.Series(pd.util.hash_pandas_object(basis, index=False).values)
+    # Colisiones (mismo punto y categoría): ordinal por orden de aparición en el archivo
+    ordinal = hashes.groupby(hashes.values).cumcount().values
+    return pd.Series(
+        [f"h:{h:016x}-{n}" if n else f"h:{h:016x}" for h, n in zip(hashes.values, ordinal)],
+        index=gdf.index,
+    )
+
+
+def load_frame(path: str) -> pd.DataFrame:
+    """Lee el parquet y arma el frame a exportar (columnas ``COLUMNS``), ya normalizado."""
+    gdf = gpd.read_parquet(path)
     if gdf.crs is None or gdf.crs.to_epsg() != 4326:
         gdf.set_crs("EPSG:4326", inplace=True, allow_override=True)
-    gdf_ = gdf[gdf['category'].notna()].copy()
-    gdf_points = gdf_[gdf_.geometry.type == 'Point'].copy()
-    gdf_polygons = gdf_[gdf_.geometry.type.isin(['Polygon', 'MultiPolygon'])].copy()
-    gdf_polygons['geometry'] = gdf_polygons.centroid
-    gdf = pd.concat([gdf_points, gdf_polygons], ignore_index=True)
-    gdf = gpd.GeoDataFrame(gdf, geometry='geometry', crs=gdf.crs)
-    print(gdf.head())
+    gdf = gdf[gdf["category"].notna() & gdf.geometry.geom_type.isin(["Point", "Polygon", "MultiPolygon"])]
+    gdf = gdf.reset_index(drop=True)
+    # Polígonos -> centroide (vectorizado)
+    polygons = gdf.geometry.geom_type != "Point"
+    gdf.loc[polygons, "geometry"] = gdf.geometry[polygons].centroid
 
-    print("✅ Archivo leído. Primeras filas:")
-
-    gdf["geometry"] = gdf["geometry"].apply(lambda g: g.wkt)
     # --- Crear/asegurar columna name ---
     if "name" not in gdf.columns:
         # intenta usar alguna columna alternativa
@@ -48,26 +146,95 @@ def main():
                 gdf["name"] = gdf[alt]
                 break
         else:
-            # Si no hay ninguna, creamos name vacío
             gdf["name"] = None
 
-    # Reemplazar NaN/None por texto
-    gdf["name"] = gdf["name"].fillna("Unnamed POI").astype(str).str.strip()
+    # Normalizar ANTES de armar el frame de exportación (y a los largos de la tabla)
+    gdf["name"] = gdf["name"].fillna("Unnamed POI").astype(str).str.strip().str.slice(0, 120)
+    gdf["category"] = gdf["category"].fillna("unknown").astype(str).str.strip().str.slice(0, 50)
+
+    # Coordenadas numéricas + WKB en hex (formato de entrada de bytea en COPY)
+    gdf["lon"] = gdf.geometry.x
+    gdf["lat"] = gdf.geometry.y
+    gdf["wkb_geometry"] = "\\x" + gdf.geometry.to_wkb(hex=True).astype(str)
+    gdf["source_key"] = source_keys(gdf)
+    return pd.DataFrame(gdf[COLUMNS])
+
+
+def copy_chunk(dbapi_conn, table) -> None:
+    """
+    ``COPY pois_staging FROM STDIN`` (psycopg2 o psycopg 3). El CSV lo escribe
+    pyarrow en C++ (~10x más rápido que ``DataFrame.to_csv``, floats sin pérdida).
+    """
+    buf = io.BytesIO()
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(include_header=False))
+    sql = f"COPY pois_staging ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    with dbapi_conn.cursor() as cur:
+        if hasattr(cur, "copy_expert"):  # psycopg2
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+        else:  # psycopg 3
+            with cur.copy(sql) as copy:
+                copy.write(buf.getvalue())
 
 
-    export_cols = ['name', 'category', 'geometry']
-    gdf_export = gdf[export_cols]
-    gdf_export.rename(columns={'geometry': 'wkt_geometry'}, inplace=True)
-    gdf["category"] = gdf["category"].fillna("unknown").astype(str).str.strip()
-    
+def load(engine, frame: pd.DataFrame, chunk_size: int) -> dict:
+    """Todo en una transacción: si algo falla, el catálogo queda como estaba."""
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_STAGING))
+        dbapi_conn = conn.connection
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        for start in range(0, table.num_rows, chunk_size):
+            copy_chunk(dbapi_conn, table.slice(start, chunk_size))
+        adopted = 0
+        if conn.execute(text("SELECT EXISTS (SELECT 1 FROM pois WHERE source_key IS NULL)")).scalar():
+            adopted = conn.execute(text(ADOPT_LEGACY)).rowcount
+        inserted = conn.execute(text(UPSERT)).scalars().all()
+        legacy = conn.execute(text("SELECT count(*) FROM pois WHERE source_key IS NULL")).scalar()
+    return {
+        "inserted": sum(inserted),
+        "updated": len(inserted) - sum(inserted),
+        "adopted": adopted,
+        "legacy": legacy,
+    }
+
+
+def main():
+    load_dotenv(dotenv_path="./.env.prod")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parquet", default=PARQUET_FILE)
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="filas por COPY")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    print("📥 Cargando POIs...")
+    frame = load_frame(args.parquet)
+    prepared = time.perf_counter()
+    print(f"✅ {len(frame):,} POIs preparados en {prepared - started:.2f}s")
+    print(frame.head())
+
     # --- Conectar y cargar ---
     print(f"🔗 Conectando a Postgres...")
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(database_url())
+    columns = {c["name"] for c in inspect(engine).get_columns("pois")}
+    if not {"source_key", "updated_at"} <= columns:
+        raise SystemExit("❌ Faltan pois.source_key/updated_at: corre primero `cd backend && python -m migrations`")
+
+    print("🚀 Cargando en la tabla 'pois' (COPY + upsert)...")
+    result = load(engine, frame, args.chunk_size)
+    loaded = time.perf_counter()
 
-    print("🚀 Insertando datos en la tabla 'pois'...")
-    gdf_export.to_sql("pois", engine, if_exists="append", index=False)
+    unchanged = len(frame) - result["inserted"] - result["updated"]
+    print(
+        f"✅ Carga completa: {result['inserted']:,} nuevos, {result['updated']:,} actualizados, "
+        f"{unchanged:,} sin cambios ({result['adopted']:,} POIs antiguos adoptados)"
+    )
+    print(
+        f"⏱️  DB {loaded - prepared:.2f}s ({len(frame) / max(loaded - prepared, 1e-9):,.0f} filas/s), "
+        f"total {loaded - started:.2f}s ({len(frame) / max(loaded - started, 1e-9):,.0f} filas/s)"
+    )
+    if result["legacy"]:
+        print(f"ℹ️ {result['legacy']:,} POIs sin source_key (duplicados de cargas anteriores o creados a mano); no se tocan")
 
-    print("✅ Carga completa!")
 
 if __name__ == "__main__":
     main()
@@ -1,53 +1,288 @@
 #!/usr/bin/env python3
+"""
+Crea participantes de prueba y, con ``--duration``, simula un taller completo
+contra el backend (p.ej. el stack local de docker-compose, sin servicios
+externos) para encontrar el límite de capacidad antes del evento.
+
+Cada participante es una tarea asyncio que hace lo mismo que la app:
+
+1. ``POST /users/join`` (las llegadas se reparten en ``--ramp`` segundos) y
+   ``GET /users/{id}/assignments_geojson``;
+2. un fix GPS cada ``--fix-interval`` segundos caminando al azar, enviados a
+   ``/tracking/batch`` en lotes de 5 o cada 30 s (como ``trackingService.js``);
+3. de vez en cuando una encuesta (``POST /surveys/``, en promedio una cada
+   ``--survey-every`` segundos por participante).
+
+Además ``--dashboards`` tareas consultan los endpoints de ``/results`` cada
+``--poll-interval`` segundos. Al terminar (o con Ctrl+C) se reporta
+throughput y latencias p50/p95/p99 por endpoint.
+
+    docker compose up -d
+    python populate_users.py                                    # 18 usuarios (3 por perfil)
+    python populate_users.py --participants 300 --duration 300  # taller simulado
+"""
+import argparse
+import asyncio
+import json
+import math
 import os
 import random
 import string
-import requests
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
 from dotenv import load_dotenv
 
+# --- Perfiles disponibles ---
+PROFILES = [
+    "elderly",
+    "student",
+    "office_worker",
+    "tourist",
+    "families",
+    "shop_owner"
+]
+SURVEY_CATEGORIES = ["infrastructure", "user_experience", "vehicles", "regulation", "equity", "other"]
+
+# Zona del taller (Concepción) donde arrancan las caminatas simuladas
+AREA = (-73.07, -36.84, -73.02, -36.80)
+WALK_SPEED_MS = 1.4
+METERS_PER_DEGREE = 111_320.0
+
+# Igual que trackingService.js
+TRACKING_BATCH_SIZE = 5
+TRACKING_FLUSH_SECONDS = 30.0
+
+
 def random_username(prefix: str) -> str:
     """Genera un username aleatorio con un prefijo."""
     return f"{prefix}_{''.join(random.choices(string.ascii_lowercase + string.digits, k=5))}"
 
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Recorder:
+    """Latencias y errores por endpoint (nombre de ruta sin ids)."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.started = time.perf_counter()
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, name: str = None, **kwargs):
+        """Hace el request y registra su latencia; retorna la respuesta o ``None`` si falló."""
+        name = name or f"{method} {url}"
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[name][type(e).__name__] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            self.errors[name][str(resp.status_code)] += 1
+            return None
+        return resp
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            lat = sorted(self.latencies[name])
+            errors = sum(self.errors[name].values())
+            endpoints[name] = {
+                "requests": len(lat),
+                "errors": errors,
+                "error_kinds": dict(self.errors[name]),
+                "rps": len(lat) / elapsed,
+                "p50_ms": percentile(lat, 50) * 1000,
+                "p95_ms": percentile(lat, 95) * 1000,
+                "p99_ms": percentile(lat, 99) * 1000,
+                "max_ms": (lat[-1] if lat else 0.0) * 1000,
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "rps": total / elapsed if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+    def report(self) -> dict:
+        summary = self.summary()
+        print(
+            f"\n📊 {summary['requests']:,} requests en {summary['elapsed_seconds']:.1f}s "
+            f"({summary['rps']:,.1f} req/s, {summary['errors']:,} errores)"
+        )
+        print(f"  {'endpoint':<42} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'err':>5}")
+        for name, e in summary["endpoints"].items():
+            print(
+                f"  {name:<42} {e['requests']:>7,} {e['rps']:>8.1f} {e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f}"
+                f" {e['p99_ms']:>8.1f} {e['max_ms']:>8.1f} {e['errors']:>5}"
+                + (f"  {e['error_kinds']}" if e["error_kinds"] else "")
+            )
+        return summary
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class Participant:
+    def __init__(self, profile: str, args, recorder: Recorder):
+        self.profile = profile
+        self.args = args
+        self.recorder = recorder
+        self.username = random_username(profile)
+        self.user_id = None
+        self.lon = random.uniform(AREA[0], AREA[2])
+        self.lat = random.uniform(AREA[1], AREA[3])
+        self.heading = random.uniform(0, 2 * math.pi)
+        self.buffer = []
+
+    async def join(self, client: httpx.AsyncClient) -> bool:
+        resp = await self.recorder.request(
+            client, "POST", "/users/join", json={"username": self.username, "profile": self.profile}
+        )
+        if resp is None:
+            return False
+        data = resp.json()
+        self.user_id = data["id"]
+        if not self.args.quiet:
+            print(f"✅ Usuario '{data['username']}' creado con ID {data['id']} y {len(data.get('assigned_pois', []))} POIs asignados.")
+        await self.recorder.request(
+            client, "GET", f"/users/{self.user_id}/assignments_geojson", name="GET /users/{id}/assignments_geojson"
+        )
+        return True
+
+    def _walk(self, seconds: float) -> None:
+        self.heading += random.gauss(0, 0.4)
+        step = WALK_SPEED_MS * seconds / METERS_PER_DEGREE
+        self.lon += step * math.cos(self.heading) / math.cos(math.radians(self.lat))
+        self.lat += step * math.sin(self.heading)
+
+    async def flush(self, client: httpx.AsyncClient) -> None:
+        if not self.buffer:
+            return
+        points, self.buffer = self.buffer, []
+        await self.recorder.request(client, "POST", "/tracking/batch", json={"points": points})
+
+    async def survey(self, client: httpx.AsyncClient) -> None:
+        await self.recorder.request(client, "POST", "/surveys/", data={
+            "user_id": str(self.user_id),
+            "description": "Encuesta de prueba de carga",
+            "category": random.choice(SURVEY_CATEGORIES),
+            "wkt_point": f"POINT({self.lon} {self.lat})",
+        })
+
+    async def run(self, client: httpx.AsyncClient, deadline: float) -> None:
+        await asyncio.sleep(random.uniform(0, self.args.ramp))
+        if not await self.join(client):
+            return
+        fix_interval = self.args.fix_interval
+        last_flush = time.monotonic()
+        next_survey = time.monotonic() + random.expovariate(1 / self.args.survey_every)
+        # Los teléfonos no están sincronizados: desfase aleatorio del primer fix
+        await asyncio.sleep(random.uniform(0, fix_interval))
+        while time.monotonic() < deadline:
+            self._walk(fix_interval)
+            self.buffer.append({"user_id": self.user_id, "wkt_point": f"POINT({self.lon} {self.lat})", "timestamp": _now_iso()})
+            now = time.monotonic()
+            if len(self.buffer) >= TRACKING_BATCH_SIZE or now - last_flush >= TRACKING_FLUSH_SECONDS:
+                await self.flush(client)
+                last_flush = now
+            if now >= next_survey:
+                await self.survey(client)
+                next_survey = now + random.expovariate(1 / self.args.survey_every)
+            await asyncio.sleep(fix_interval)
+        await self.flush(client)
+
+
+async def dashboard(client: httpx.AsyncClient, recorder: Recorder, poll_interval: float, deadline: float) -> None:
+    """Un dashboard abierto: refresca estadísticas, mapas y heatmaps periódicamente."""
+    await asyncio.sleep(random.uniform(0, poll_interval))
+    while time.monotonic() < deadline:
+        since = (datetime.now(timezone.utc) - timedelta(minutes=15)).isoformat()
+        for name, url, params in (
+            ("GET /results/stats", "/results/stats", None),
+            ("GET /results/surveys/geojson", "/results/surveys/geojson", None),
+            ("GET /results/tracking/geojson (15 min)", "/results/tracking/geojson", {"start_date": since}),
+            ("GET /results/heatmap?type=tracking", "/results/heatmap", {"type": "tracking", "zoom": 14}),
+            ("GET /results/heatmap?type=surveys", "/results/heatmap", {"type": "surveys", "zoom": 14}),
+        ):
+            await recorder.request(client, "GET", url, name=name, params=params)
+        await asyncio.sleep(poll_interval)
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    profiles = [args.profile] if args.profile else PROFILES
+    # Mismo reparto que antes: perfiles en ronda
+    participants = [Participant(profiles[i % len(profiles)], args, recorder) for i in range(args.participants)]
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    deadline = time.monotonic() + max(args.duration, 0.0)
+    if args.duration <= 0:
+        args.ramp = 0.0
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        if args.duration <= 0:
+            # Sólo crear usuarios (comportamiento original del script)
+            tasks = [p.join(client) for p in participants]
+        else:
+            tasks = [p.run(client, deadline) for p in participants]
+            tasks += [dashboard(client, recorder, args.poll_interval, deadline) for _ in range(args.dashboards)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            summary = recorder.report()
+            if args.json:
+                with open(args.json, "w") as f:
+                    json.dump({"args": vars(args), **summary}, f, indent=2)
+                print(f"💾 Resultados en {args.json}")
+    return summary
+
+
 def main():
     # --- Configuración ---
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     ENV_PATH = os.path.join(BASE_DIR, "..", "backend", ".env_local")
     load_dotenv(ENV_PATH)
 
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     # Dirección del backend (puedes cambiarla si está desplegado en otro host)
-    BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8080")
-    USERS_JOIN_URL = f"{BACKEND_URL}/users/join"
-
-    # --- Perfiles disponibles ---
-    profiles = [
-        "elderly",
-        "student",
-        "office_worker",
-        "tourist",
-        "families",
-        "shop_owner"
-    ]
-
-    print("🚀 Creando usuarios de prueba y asignando POIs...")
-    for profile in profiles:
-        for _ in range(3):
-            username = random_username(profile)
-            payload = {
-                "username": username,
-                "profile": profile
-            }
-            try:
-                resp = requests.post(USERS_JOIN_URL, json=payload, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    print(f"✅ Usuario '{data['username']}' creado con ID {data['id']} y {len(data.get('assigned_pois', []))} POIs asignados.")
-                else:
-                    print(f"⚠️ Error creando usuario '{username}' para perfil '{profile}': {resp.status_code} - {resp.text}")
-            except requests.RequestException as e:
-                print(f"❌ Error de conexión creando usuario '{username}' para perfil '{profile}': {e}")
-
-    print("🎯 Creación de usuarios de prueba completada.")
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://localhost:8080"))
+    parser.add_argument("--participants", type=int, default=3 * len(PROFILES))
+    parser.add_argument("--profile", help="perfil único para todos (por defecto, todos en ronda)")
+    parser.add_argument("--duration", type=float, default=0.0, help="segundos de simulación (0 = sólo crear usuarios)")
+    parser.add_argument("--ramp", type=float, default=60.0, help="segundos en que se reparten los joins")
+    parser.add_argument("--fix-interval", type=float, default=3.0, help="segundos entre fixes GPS")
+    parser.add_argument("--survey-every", type=float, default=300.0, help="segundos promedio entre encuestas por participante")
+    parser.add_argument("--dashboards", type=int, default=2, help="dashboards consultando /results")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="segundos entre refrescos de cada dashboard")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", help="guardar el resumen en este archivo JSON")
+    parser.add_argument("--quiet", action="store_true", help="no imprimir cada usuario creado")
+    args = parser.parse_args()
+
+    mode = "Creando usuarios de prueba y asignando POIs" if args.duration <= 0 else (
+        f"Simulando {args.participants} participantes y {args.dashboards} dashboards durante {args.duration:.0f}s"
+    )
+    print(f"🚀 {mode} en {args.url}...")
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    print("🎯 Prueba completada.")
 
 if __name__ == "__main__":
     main()
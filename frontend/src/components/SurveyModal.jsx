@@ -84,7 +84,7 @@ export default function SurveyModal({ onClose, userId, location }) {
       const result = await response.json();
       console.log("✅ Respuesta del servidor:", result);
       
-      alert(`✅ Encuesta enviada correctamente${result.photo_uploaded ? ' con foto' : ''}`);
+      alert(`✅ Encuesta enviada correctamente${result.photo_status ? ' con foto' : ''}`);
       onClose();
     } catch (error) {
       console.error("❌ Error enviando encuesta:", error);
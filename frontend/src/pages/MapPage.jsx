@@ -21,8 +21,7 @@ export default function MapPage() {
         setLoading(true);
         const res = await fetch(`${import.meta.env.VITE_API_URL}/users/${userId}/assignments_geojson`);
         if (!res.ok) throw new Error(`Error ${res.status}`);
-        const data = await res.json();
-        setGeojson(JSON.parse(data));
+        setGeojson(await res.json());
       } catch (err) {
         console.error("❌ Error fetching GeoJSON:", err);
       } finally {